@@ -1,3 +1,4 @@
+import os
 import sys
 import secrets
 from flask import Flask
@@ -6,6 +7,7 @@ from flask_cors import CORS
 from dotenv import load_dotenv
 
 from app.response import Response
+from app import database
 
 # Creating Flask app
 app = Flask(__name__)
@@ -30,10 +32,30 @@ def handle_exception(error):
     response = Response(error_message, 401)
     return response.return_error_response()
 
-def create_app():
+def get_env_number(name, cast=float):
+    """
+    Reads an optional numeric setting from the environment (loaded from .env).
+
+    Parameters:
+        name (str): Name of the environment variable.
+        cast (type): int or float.
+
+    Returns:
+        int | float | None: The value, or None if the variable is not set.
+    """
+    value = os.getenv(name)
+    if value is None or value == "":
+        return None
+    return cast(value)
+
+def create_app(test_config=None):
     """
     Creates a Flask application by setting configuration details, registering API views, and blueprints.
 
+    Parameters:
+        test_config (dict, optional): Config values that override the defaults, ie. a separate
+            SQLALCHEMY_DATABASE_URI for tests and load tests.
+
     Returns:
         Flask: The Flask application instance.
 
@@ -49,17 +71,72 @@ def create_app():
         session_key = secrets.token_urlsafe(16)
         app.config["SECRET_KEY"] = f"{session_key}" 
         app.secret_key = session_key 
-        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_NAME}"
+
+        # Database URL, SQLite pragmas and connection pool (see app/database.py)
+        database.load_config(app, f"sqlite:///{DB_NAME}")
+
+        # Default per-request mining budgets (see app/budget.py). Unset = no limit.
+        app.config["MINING_MAX_SECONDS"] = get_env_number("MINING_MAX_SECONDS")
+        app.config["MINING_MAX_CANDIDATES"] = get_env_number("MINING_MAX_CANDIDATES", int)
+        app.config["MINING_MAX_ITEMSETS"] = get_env_number("MINING_MAX_ITEMSETS", int)
+        app.config["MINING_MAX_RSS_MB"] = get_env_number("MINING_MAX_RSS_MB")
+        app.config["MINING_ALLOW_PARTIAL"] = os.getenv("MINING_ALLOW_PARTIAL", "false").lower() == "true"
+
+        # Request timing and profiling (see app/timing.py)
+        app.config["SERVER_TIMING_HEADER"] = os.getenv("SERVER_TIMING_HEADER", "true").lower() == "true"
+        app.config["PROFILE_DIR"] = os.getenv("PROFILE_DIR")
+        app.config["PROFILER"] = os.getenv("PROFILER", "cprofile")
+
+        # Number of result rule indexes kept in memory for /recommend (see app/rule_index.py)
+        app.config["RULE_INDEX_CACHE_SIZE"] = get_env_number("RULE_INDEX_CACHE_SIZE", int) or 32
+
+        # Worker processes used by apriori-ceri 'bitmap' counting on big levels, 1 counts in the request thread (see app/bitmap_counting.py)
+        app.config["MINING_PROCESSES"] = get_env_number("MINING_PROCESSES", int) or 1
+
+        # Worker processes used by the batch recommend endpoint, 1 scores inside the request thread (see app/batch_scoring.py)
+        app.config["BATCH_SCORING_PROCESSES"] = get_env_number("BATCH_SCORING_PROCESSES", int) or 1
+
+        # Rows read from the DB per chunk by the export endpoint (see app/result_export.py)
+        app.config["EXPORT_CHUNK_SIZE"] = get_env_number("EXPORT_CHUNK_SIZE", int) or 10000
+
+        # Default storage of mined results, 'rows' or 'blob' (see app/result_codec.py), overridable per request
+        app.config["RESULT_STORAGE"] = os.getenv("RESULT_STORAGE", "rows")
+
+        # Retention policy for stored results, checked every RETENTION_INTERVAL_SECONDS (see app/retention.py). Unset = keep everything.
+        app.config["RETENTION_MAX_AGE_DAYS"] = get_env_number("RETENTION_MAX_AGE_DAYS")
+        app.config["RETENTION_MAX_RESULTS"] = get_env_number("RETENTION_MAX_RESULTS", int)
+        app.config["RETENTION_INTERVAL_SECONDS"] = get_env_number("RETENTION_INTERVAL_SECONDS") or 3600
+
+        # The schema is created and upgraded by 'python -m app.commands init-db' (run.py does it too), so
+        # workers do not touch the database while booting. Set to true to do it here instead (see app/migrations.py)
+        app.config["INIT_DB_ON_STARTUP"] = os.getenv("INIT_DB_ON_STARTUP", "false").lower() == "true"
+
+        if test_config is not None:
+            app.config.update(test_config)
+
         db.init_app(app)
+        database.init_app(app, db)
 
         # Register API routes and blueprints - FINISH THIS
         from app.views.mining import mining
+        from app.views.monitoring import monitoring
+        from app import metrics
+        from app import rule_index
+        from app import commands
+        from app import retention
 
         from app.models.db_daos import Result, Itemset, Rule, LHS, RHS
-        with app.app_context():
-            db.create_all()
+        from app import migrations
+        if app.config["INIT_DB_ON_STARTUP"]:
+            with app.app_context():
+                migrations.init_db(db)
 
         app.register_blueprint(mining, url_prefix='/arm/api')
+        app.register_blueprint(monitoring, url_prefix='/arm/api')
+        metrics.init_app(app)
+        rule_index.init_app(app)
+        commands.init_app(app)
+        app.extensions["arm_retention"] = retention.init_app(app)
         
         return app
     except Exception as e:
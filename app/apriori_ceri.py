@@ -1,9 +1,28 @@
 
+import time
+
+from app.budget import BudgetExceededError
+from app.candidate_trie import CandidateTrie
+
 class AprioriCeri:
-    def __init__(self, transactions, support_threshold, confidence_threshold):
+    # 'subset' checks every candidate against every transaction, 'trie' walks a prefix trie of the candidates,
+    # 'bitmap' ANDs per-item transaction bitmaps held in shared memory, optionally across worker processes
+    COUNTING_METHODS = ('subset', 'trie', 'bitmap')
+
+    def __init__(self, transactions, support_threshold, confidence_threshold, budget=None, weights=None, counting='trie', processes=1):
         self.transactions = transactions
+        # Number of rows each transaction stands for (see app/preprocessing.py). Defaults to 1 per transaction.
+        self.weights = weights if weights is not None else [1] * len(transactions)
         self.support_threshold = support_threshold
         self.confidence_threshold = confidence_threshold
+        self.budget = budget # optional MiningBudget checked inside the mining loops
+        self.truncated = False # set to True when the budget was hit and partial levels were returned
+        self.level_stats = [] # candidate/frequent counts and duration of each level, used for profiling
+        if counting not in self.COUNTING_METHODS:
+            raise ValueError(f"Counting method should be one of: {', '.join(self.COUNTING_METHODS)}.")
+        self.counting = counting
+        self.processes = processes # worker processes used by 'bitmap' counting on big levels
+        self.bitmap_counter = None # BitmapCounter of the current run, 'bitmap' counting only
     
     def mine(self):
         """
@@ -17,36 +36,25 @@ class AprioriCeri:
 
         Returns:
             results (dict): containing the itemsets mined.
-        """
-        frontier_itemsets_candidates = self.get_initial_frontier_itemsets_candidates(self.transactions)
-        itemsets_large = self.get_itemsets_large(self.transactions, self.support_threshold, frontier_itemsets_candidates)
-        return itemsets_large
-    
-    def count_itemsets(self, itemsets_large):
-        """
-        method that counts the number of times an itemset occurs in the transaction attribute. 
-        The itemset becomes the key in the dictionary and the value becomes the 'count'.
 
-        Parameters:
-            transactions (class attribute)
-            itemsets_large (list)
-
-        Returns:
-            results (dict): containing 'itemset' and 'count' produced by the method.
+        Error handling:
+            Raises a BudgetExceededError if the budget is hit and partial results are not allowed.
+            Otherwise the levels mined so far are returned and the 'truncated' attribute is set.
         """
-        # Initialising itemsets with a default count of 0
-        itemset_count = {}
-        for itemset in itemsets_large:
-            itemset_count[itemset] = 0
-
-        # loop through each itemset and count number of times it occurs in transaction
-        for transaction in self.transactions:
-            for itemset in itemsets_large:
-                if itemset.issubset(transaction):
-                    itemset_count[itemset] += 1
+        if self.budget is not None and self.budget.started_at is None:
+            self.budget.start()
 
-        return itemset_count      
+        try:
+            frontier_itemsets_candidates = self.get_initial_frontier_itemsets_candidates(self.transactions)
+            itemsets_large = self.get_itemsets_large(self.transactions, self.support_threshold, frontier_itemsets_candidates)
+        except BudgetExceededError as error:
+            if not self.budget.allow_partial:
+                raise
+            self.truncated = True
+            itemsets_large = error.partial_itemsets or {}
 
+        return itemsets_large
+    
     """ 
     Method initialises itemset candidates set (frontier set).
     this function will return the unique items withing a list of transactions. 
@@ -71,13 +79,23 @@ class AprioriCeri:
     """
     def get_frontier_itemsets_candidates(self, itemsets_large):
         new_itemsets_candidates = []
+
+        # Candidates are collected in a set as A ∪ B can be produced by more than one pair of itemsets
+        seen_candidates = set()
+        frequent_itemsets = set(itemsets_large)
         
         # If set A ∪ B is equal to the length of item set ‘x+1’ then the union set is appended to the new frontier candidate sets
         for x in range(len(itemsets_large)):
+            if self.budget is not None:
+                self.budget.tick()
+                self.budget.check_candidates(len(new_itemsets_candidates))
             for y in range(x+1, len(itemsets_large)):
                 union_set = itemsets_large[x] | itemsets_large[y] # A ∪ B
-                if len(union_set) == len(itemsets_large[x]) + 1: 
-                    new_itemsets_candidates.append(union_set)
+                if len(union_set) == len(itemsets_large[x]) + 1 and union_set not in seen_candidates: 
+                    seen_candidates.add(union_set)
+                    # A candidate can only be large if every one of its subsets one item smaller is large
+                    if all(union_set - {item} in frequent_itemsets for item in union_set):
+                        new_itemsets_candidates.append(union_set)
 
         # If no itemsets are returned another transaction scan does not occur          
         return new_itemsets_candidates 
@@ -88,38 +106,180 @@ class AprioriCeri:
     """
     def get_itemsets_large(self, transactions, minimum_support, frontier_itemsets_candidates):
 
-        itemsets_large = []
-        
-        # If the itemsets returned by 'get_frontier_itemsets_candidates' = [] then the transactions are not scanned further
-        while frontier_itemsets_candidates:
-            
-            # itemset_count keeps track of candidates that are subsets in transactions and how frequently they occur
-            itemset_count = {}
-            for itemset in frontier_itemsets_candidates: 
-                itemset_count[frozenset(itemset)] = 0    
-            
-            # Iterate through and increase itemset_count 'count' by 1 each time a subset occurs
-            for transaction in transactions:
-                for candidate in frontier_itemsets_candidates:
-                    if candidate.issubset(transaction):
-                        itemset_count[frozenset(candidate)] += 1
-
-            # Only keep itemsets that meet the minimum support threshold based on comparing against itemset_count 'count'      
-            new_frontier_itemsets_candidates = []
-            for itemset, count in itemset_count.items():
-                if count >= minimum_support:
-                    new_frontier_itemsets_candidates.append(itemset)
-
-            frontier_itemsets_candidates = new_frontier_itemsets_candidates
-
-            # Add the found itemsets to the large itemsets
-            itemsets_large.extend(frontier_itemsets_candidates)
+        # Counts of the large itemsets of every level, kept from the scans so no final recount is needed
+        itemsets_count = {}
+        weights = self.weights
+        frontier_itemsets_candidates = [frozenset(candidate) for candidate in frontier_itemsets_candidates]
+
+        try:
+            # If the itemsets returned by 'get_frontier_itemsets_candidates' = [] then the transactions are not scanned further
+            while frontier_itemsets_candidates:
+                frontier_itemsets_candidates, transactions, weights = self.scan_level(transactions, weights, minimum_support, frontier_itemsets_candidates, itemsets_count)
+        except BudgetExceededError as error:
+            # Levels fully mined before the budget was hit are kept so the caller can return them as a partial result
+            error.partial_itemsets = self.format_itemsets_count(itemsets_count)
+            raise
+        finally:
+            if self.bitmap_counter is not None:
+                self.bitmap_counter.close()
+                self.bitmap_counter = None
+
+        return self.format_itemsets_count(itemsets_count)
+
+    def scan_level(self, transactions, weights, minimum_support, frontier_itemsets_candidates, itemsets_count):
+        """
+        Method that performs a single pass on the transactions for one level (k) of candidates. The
+        candidates that meet the minimum support are added to 'itemsets_count'. The transactions are
+        then trimmed for the next level (DHP/AprioriTid style) so each pass is cheaper than the last:
+
+        - items that are not in at least k large k-itemsets of the transaction are dropped, as they
+          cannot be part of a large (k+1)-itemset of that transaction (after level 1 this drops every
+          infrequent item).
+        - transactions that contain no large k-itemset, or have fewer than k+1 items left, are dropped.
+        - transactions that become identical after trimming are merged and their weights added.
+
+        With 'bitmap' counting level 1 is counted with the trie, then the bitmaps are built once
+        from the transactions trimmed by level 1, so only frequent items get a bitmap. They are
+        used for every later level and the transactions are not trimmed again.
+
+        Parameters:
+            transactions (list): transactions (frozensets) still able to contain a large itemset.
+            weights (list): number of rows each transaction stands for.
+            minimum_support (float)
+            frontier_itemsets_candidates (list): candidates (frozensets) of the current level.
+            itemsets_count (dict): large itemsets found so far and their count, extended in place.
+
+        Returns:
+            tuple: candidates for the next level (empty when the algorithm is complete), and the
+            trimmed transactions and weights to scan for the next level.
+
+        Error handling:
+            Raises a BudgetExceededError if the budget attribute is set and one of its limits is hit.
+        """
+        budget = self.budget
+        if budget is not None:
+            budget.check_candidates(len(frontier_itemsets_candidates))
+            budget.check()
+
+        level_start = time.perf_counter()
+        level = len(frontier_itemsets_candidates[0])
+        scanned = len(transactions)
             
-            # Get new frontier set on each scan. When None is returned the loop is ended and algorithm complete. 
-            frontier_itemsets_candidates = self.get_frontier_itemsets_candidates(frontier_itemsets_candidates)
+        # itemset_count keeps track of candidates that are subsets in transactions and how frequently they occur.
+        # transaction_candidates keeps the candidates contained in each transaction to trim the transactions after the pass.
+        if self.counting == 'bitmap' and level > 1:
+            if self.bitmap_counter is None:
+                from app.bitmap_counting import BitmapCounter
+                self.bitmap_counter = BitmapCounter(transactions, weights, processes=self.processes, budget=budget)
+            counts = self.bitmap_counter.count(frontier_itemsets_candidates, budget)
+            itemset_count, transaction_candidates = dict(zip(frontier_itemsets_candidates, counts)), None
+        elif self.counting in ('trie', 'bitmap'):
+            itemset_count, transaction_candidates = self.count_candidates_trie(transactions, weights, frontier_itemsets_candidates)
+        else:
+            itemset_count, transaction_candidates = self.count_candidates_subset(transactions, weights, frontier_itemsets_candidates)
+
+        # Only keep itemsets that meet the minimum support threshold based on comparing against itemset_count 'count'      
+        new_frontier_itemsets_candidates = []
+        for itemset, count in itemset_count.items():
+            if count >= minimum_support:
+                new_frontier_itemsets_candidates.append(itemset)
+                itemsets_count[itemset] = count
+
+        # Trim the transactions for the next level, merging transactions that become identical.
+        # The bitmaps are built once, so with 'bitmap' counting the transactions are passed on as they are.
+        if transaction_candidates is not None:
+            large_itemsets = set(new_frontier_itemsets_candidates)
+            trimmed = {}
+            for contained, weight in zip(transaction_candidates, weights):
+                item_occurrences = {}
+                for candidate in contained:
+                    if candidate in large_itemsets:
+                        for item in candidate:
+                            item_occurrences[item] = item_occurrences.get(item, 0) + 1
+                kept_items = frozenset(item for item, occurrences in item_occurrences.items() if occurrences >= level)
+                if len(kept_items) > level:
+                    trimmed[kept_items] = trimmed.get(kept_items, 0) + weight
+            transactions, weights = list(trimmed), list(trimmed.values())
+
+        self.level_stats.append({
+            "level": level,
+            "transactions": scanned,
+            "candidates": len(frontier_itemsets_candidates),
+            "frequent": len(new_frontier_itemsets_candidates),
+            "ms": round((time.perf_counter() - level_start) * 1000, 3),
+        })
+
+        if budget is not None:
+            budget.check_itemsets(len(itemsets_count))
+        
+        # Get new frontier set on each scan. When None is returned the loop is ended and algorithm complete. 
+        return self.get_frontier_itemsets_candidates(new_frontier_itemsets_candidates), transactions, weights
+
+    def count_candidates_subset(self, transactions, weights, candidates):
+        """
+        Method that counts the candidates by checking every candidate against every transaction.
+
+        Parameters:
+            transactions (list)
+            weights (list)
+            candidates (list)
+
+        Returns:
+            tuple: candidate -> count dict, and the list of candidates contained in each transaction.
+        """
+        itemset_count = {}
+        for itemset in candidates: 
+            itemset_count[itemset] = 0    
+
+        transaction_candidates = []
         
-        itemsets_count = self.count_itemsets(itemsets_large)
+        # Iterate through and increase itemset_count 'count' by the transaction weight each time a subset occurs
+        for transaction, weight in zip(transactions, weights):
+            if self.budget is not None:
+                self.budget.tick()
+            contained = []
+            for candidate in candidates:
+                if candidate.issubset(transaction):
+                    itemset_count[candidate] += weight
+                    contained.append(candidate)
+            transaction_candidates.append(contained)
+
+        return itemset_count, transaction_candidates
+
+    def count_candidates_trie(self, transactions, weights, candidates):
+        """
+        Method that counts the candidates with a prefix trie (see app/candidate_trie.py) so each
+        transaction only visits the candidates its subsets can reach.
 
+        Parameters:
+            transactions (list)
+            weights (list)
+            candidates (list)
+
+        Returns:
+            tuple: candidate -> count dict, and the list of candidates contained in each transaction.
+        """
+        trie = CandidateTrie(candidates)
+
+        transaction_candidates = []
+        for transaction, weight in zip(transactions, weights):
+            if self.budget is not None:
+                self.budget.tick()
+            matched = trie.count(tuple(sorted(transaction)), weight)
+            transaction_candidates.append([candidates[index] for index in matched])
+
+        return trie.get_counts(), transaction_candidates
+
+    def format_itemsets_count(self, itemsets_count):
+        """
+        Method that converts the frozenset keys of an itemset count dict to sorted tuples.
+
+        Parameters:
+            itemsets_count (dict)
+
+        Returns:
+            dict: itemset (tuple) -> count.
+        """
         # Formatting correctly - converting from frozensets to tuples
         itemsets_count_updated = {}
         for key, value in itemsets_count.items(): 
@@ -127,6 +287,3 @@ class AprioriCeri:
             itemsets_count_updated[temp_key] = value 
 
         return itemsets_count_updated
-
-
-
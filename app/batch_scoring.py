@@ -0,0 +1,314 @@
+import atexit
+import json
+import os
+import multiprocessing
+import pickle
+import threading
+import uuid
+from collections import OrderedDict, deque
+from itertools import islice
+
+import numpy as np
+
+# Upper bound on the basket x rule x word cells compared at once, keeps a chunk around 32 MB
+MAX_CELLS_PER_STEP = 4_000_000
+WORD_MASK = (1 << 64) - 1
+
+class BasketScorer:
+    def __init__(self, index, top_n=5, sort_by='lift'):
+        """
+        Constructor method to initialise a BasketScorer. The rule antecedents of a RuleIndex (see
+        app/rule_index.py) are encoded as bitsets over the antecedent items, one row of 64 bit words
+        per rule. Baskets are encoded the same way, so a rule fires for a basket when
+        basket & antecedent == antecedent, which numpy checks for a whole chunk of baskets against
+        every rule at once. The rule rows are stored best rank first so the fired rules of a basket
+        come out of np.nonzero already in the order RuleIndex.collect expects.
+
+        Parameters:
+            index (RuleIndex): rules of the result.
+            top_n (int): maximum number of items recommended per basket.
+            sort_by (str): 'lift' or 'confidence'.
+
+        Example:
+            scorer = BasketScorer(RuleIndex.from_result(result_id), top_n=3)
+            scorer.score([['Bread'], ['Beer', 'Cola']]) // [[{'item': 'Butter', ...}], []]
+        """
+        self.index = index
+        self.top_n = top_n
+        self.sort_by = sort_by
+        # Identifies the scorer in the worker processes, which keep it after it was sent once
+        self.key = uuid.uuid4().hex
+        self.payload = None # pickled scorer, made on the first batch scored by the worker pool
+
+        ranks = index.get_ranks(sort_by)
+        self.order = np.argsort(np.array(ranks, dtype=np.int64)) if ranks else np.zeros(0, dtype=np.int64)
+
+        # Bit position of every antecedent item, other basket items cannot fire a rule
+        self.item_bits = {}
+        for rule in index.rules:
+            for item in rule['lhs']:
+                self.item_bits.setdefault(item, len(self.item_bits))
+        self.item_masks = {item: 1 << bit for item, bit in self.item_bits.items()}
+        self.words = max(1, (len(self.item_bits) + 63) // 64)
+
+        self.antecedents = np.zeros((len(index.rules), self.words), dtype=np.uint64)
+        for row, position in enumerate(self.order):
+            for item in index.rules[position]['lhs']:
+                bit = self.item_bits[item]
+                self.antecedents[row, bit // 64] |= np.uint64(1 << (bit % 64))
+
+    def encode(self, baskets):
+        """
+        Method that encodes baskets as bitsets over the antecedent items.
+
+        Parameters:
+            baskets (list): baskets (sets of items).
+
+        Returns:
+            numpy.ndarray: uint64 array of shape (number of baskets, words).
+        """
+        # Each basket is built as a Python int mask first, then split into 64 bit words
+        item_masks = self.item_masks
+        masks = []
+        for basket in baskets:
+            mask = 0
+            for item in basket:
+                mask |= item_masks.get(item, 0)
+            masks.append(mask)
+
+        if self.words == 1:
+            return np.array(masks, dtype=np.uint64).reshape(len(baskets), 1)
+        return np.array([[(mask >> (64 * word)) & WORD_MASK for word in range(self.words)] for mask in masks], dtype=np.uint64).reshape(len(baskets), self.words)
+
+    def score(self, baskets):
+        """
+        Method that returns the top-N recommendations of every basket.
+
+        Parameters:
+            baskets (list): baskets (lists of items).
+
+        Returns:
+            list: one list of recommendations (see RuleIndex.recommend) per basket, in input order.
+        """
+        baskets = [set(basket) for basket in baskets]
+        if not baskets:
+            return []
+        if not len(self.antecedents):
+            return [[] for _ in baskets]
+
+        encoded = self.encode(baskets)
+        antecedents = self.antecedents
+        step = max(1, MAX_CELLS_PER_STEP // (len(antecedents) * self.words))
+
+        results = []
+        for start in range(0, len(baskets), step):
+            block = encoded[start:start + step]
+            # (baskets, 1, words) & (rules, words) -> (baskets, rules, words), a rule fires if no antecedent bit is missing
+            fired = ((block[:, None, :] & antecedents) == antecedents).all(axis=2)
+            # Fired rules of every basket in one call, rows come out in order so each basket is a slice
+            rows, columns = np.nonzero(fired)
+            positions = self.order[columns].tolist()
+            bounds = np.searchsorted(rows, np.arange(len(block) + 1)).tolist()
+            for offset in range(len(block)):
+                fired_positions = positions[bounds[offset]:bounds[offset + 1]]
+                results.append(self.index.collect(fired_positions, baskets[start + offset], self.top_n, self.sort_by))
+        return results
+
+def read_baskets(lines, start=1):
+    """
+    Function that parses newline delimited JSON baskets. A line is either a list of items or an
+    object with a 'basket' list and an optional 'id'. Lines without an id are numbered from 'start'.
+    Blank lines are skipped.
+
+    Parameters:
+        lines (iterable): lines of text (str or bytes).
+        start (int): line number of the first line.
+
+    Returns:
+        generator: (id, basket, error) tuples. 'basket' is None and 'error' is set for invalid lines.
+    """
+    for number, line in enumerate(lines, start=start):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError:
+                yield number, None, "Line is not valid UTF-8."
+                continue
+        if not line.strip():
+            continue
+
+        try:
+            value = json.loads(line)
+        except ValueError:
+            yield number, None, "Line is not valid JSON."
+            continue
+
+        basket_id = number
+        if isinstance(value, dict):
+            basket_id = value.get("id", number)
+            value = value.get("basket")
+
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            yield basket_id, None, "The basket should be a list of items of data type string."
+            continue
+
+        yield basket_id, value, None
+
+def score_baskets(scorer, lines, processes=1, chunk_size=2048):
+    """
+    Function that scores a stream of newline delimited JSON baskets (see read_baskets) in chunks of
+    lines and yields the NDJSON output of each chunk, one record per basket in input order. With
+    more than one process the chunks are parsed, scored and serialised by the process-wide worker
+    pool (see get_pool). The scorer is pickled once and a worker only receives it for the first
+    chunk it scores with it. At most two chunks per worker are in flight, so memory does not grow
+    with the size of the input.
+
+    Parameters:
+        scorer (BasketScorer)
+        lines (iterable): lines of text (str or bytes).
+        processes (int | None): number of worker processes. None uses every core, 1 scores in-process.
+        chunk_size (int): number of lines per chunk.
+
+    Returns:
+        generator: str, NDJSON lines containing 'id' and either 'recommendations' or 'error'.
+    """
+    lines = iter(lines)
+    chunks = iter(lambda: list(islice(lines, chunk_size)), [])
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1:
+        for number, chunk in enumerate(chunks):
+            yield score_lines(scorer, chunk, number * chunk_size + 1)
+        return
+
+    pool = get_pool(processes)
+
+    def collect(chunk, start, result):
+        output = result.get()
+        if output is None:
+            # The worker did not have the scorer yet, the chunk is scored again with the scorer sent along
+            if scorer.payload is None:
+                scorer.payload = pickle.dumps(scorer)
+            output = pool.apply(score_worker_lines, (scorer.key, scorer.payload, chunk, start))
+        return output
+
+    pending = deque()
+    for number, chunk in enumerate(chunks):
+        start = number * chunk_size + 1
+        pending.append((chunk, start, pool.apply_async(score_worker_lines, (scorer.key, None, chunk, start))))
+        if len(pending) >= processes * 2:
+            yield collect(*pending.popleft())
+    while pending:
+        yield collect(*pending.popleft())
+
+def score_lines(scorer, lines, start=1):
+    """
+    Function that parses, scores and serialises one chunk of lines.
+
+    Parameters:
+        scorer (BasketScorer)
+        lines (list): lines of text (str or bytes).
+        start (int): line number of the first line.
+
+    Returns:
+        str: NDJSON output of the chunk.
+    """
+    baskets = list(read_baskets(lines, start))
+    scored = iter(scorer.score([basket for _, basket, error in baskets if error is None]))
+
+    output = []
+    for basket_id, basket, error in baskets:
+        if error is None:
+            record = {"id": basket_id, "recommendations": next(scored)}
+        else:
+            record = {"id": basket_id, "error": error}
+        output.append(json.dumps(record) + "\n")
+    return "".join(output)
+
+# Scorers of recent (index, top_n, sort_by), so batches against the same result reuse the scorer and its payload
+scorers = OrderedDict()
+scorers_lock = threading.Lock()
+MAX_SCORERS = 8
+
+def get_scorer(index, top_n=5, sort_by='lift'):
+    """
+    Function that returns the BasketScorer of a RuleIndex, building it on first use. The last
+    MAX_SCORERS scorers are kept, a new index (ie. after the result was reloaded) gets a new scorer.
+
+    Parameters:
+        index (RuleIndex)
+        top_n (int)
+        sort_by (str)
+
+    Returns:
+        BasketScorer
+    """
+    key = (id(index), top_n, sort_by)
+    with scorers_lock:
+        scorer = scorers.get(key)
+        if scorer is not None and scorer.index is index:
+            scorers.move_to_end(key)
+            return scorer
+
+    scorer = BasketScorer(index, top_n=top_n, sort_by=sort_by)
+    with scorers_lock:
+        scorers[key] = scorer
+        while len(scorers) > MAX_SCORERS:
+            scorers.popitem(last=False)
+    return scorer
+
+# Worker pool shared by every batch of the process, started on first use
+pool = None
+pool_processes = 0
+pool_lock = threading.Lock()
+
+def get_pool(processes):
+    """
+    Function that returns the persistent worker pool, starting it on first use. The pool is kept
+    for the life of the process so a batch request does not pay for starting workers.
+
+    Parameters:
+        processes (int): number of worker processes. A pool of another size is replaced.
+
+    Returns:
+        multiprocessing.Pool
+    """
+    global pool, pool_processes
+    with pool_lock:
+        if pool is None or pool_processes != processes:
+            if pool is None:
+                atexit.register(shutdown_pool)
+            else:
+                pool.terminate()
+            pool = multiprocessing.Pool(processes)
+            pool_processes = processes
+        return pool
+
+def shutdown_pool():
+    global pool
+    with pool_lock:
+        if pool is not None:
+            pool.terminate()
+            pool = None
+
+# Scorers unpickled by this worker process: key -> BasketScorer. The last few are kept.
+worker_scorers = OrderedDict()
+MAX_WORKER_SCORERS = 4
+
+def score_worker_lines(key, payload, lines, start):
+    """
+    Worker process entry point. Scores a chunk of lines with the scorer 'key', unpickled from
+    'payload' the first time this worker sees it.
+
+    Returns:
+        str | None: NDJSON output of the chunk, or None if the scorer is unknown and no payload was sent.
+    """
+    scorer = worker_scorers.get(key)
+    if scorer is None:
+        if payload is None:
+            return None
+        scorer = worker_scorers[key] = pickle.loads(payload)
+        while len(worker_scorers) > MAX_WORKER_SCORERS:
+            worker_scorers.popitem(last=False)
+    worker_scorers.move_to_end(key)
+    return score_lines(scorer, lines, start)
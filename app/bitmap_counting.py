@@ -0,0 +1,252 @@
+import atexit
+import math
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Masks of the SWAR popcount, numpy 1.x has no popcount ufunc
+M1, M2, M4, H01 = (np.uint64(mask) for mask in (0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F, 0x0101010101010101))
+
+# uint64 words ANDed per block of candidates, bounds the temporary arrays of a block to a few MB
+BLOCK_WORDS = 1 << 18
+
+# Candidates are only sent to the pool if a level ANDs at least this many words, smaller levels are counted in-process
+PARALLEL_MIN_WORDS = 1 << 20
+
+class BitmapCounter:
+    def __init__(self, transactions, weights, processes=1, budget=None):
+        """
+        Constructor method to initialise a BitmapCounter. The transactions are stored once in a
+        multiprocessing.shared_memory block as one bitmap per item (bit t is set if transaction t
+        contains the item), followed by the bit planes of the transaction weights (plane b has bit
+        t set if bit b of weight t is set). The support of a candidate is the popcount of the AND
+        of its item bitmaps, each plane counted with its power of two.
+
+        A level's candidates are split into blocks that the worker processes of a persistent pool
+        count in parallel. Workers attach to the shared block by name, so only the candidate item
+        rows are sent per level and the dataset is never pickled.
+
+        The block takes (items + weight planes) x transactions bits, so it should be built from
+        transactions that only hold frequent items (AprioriCeri builds it after level 1).
+
+        Parameters:
+            transactions (list): transactions (sets of items of one comparable type, ie. item ids).
+            weights (list): number of rows each transaction stands for.
+            processes (int): worker processes used for big levels, 1 counts in-process.
+            budget (MiningBudget, optional): the size of the block is checked against its memory limit
+                before the block is created.
+
+        Error handling:
+            Raises a BudgetExceededError if creating the block would go over the memory limit of the budget.
+
+        Example:
+            with BitmapCounter([frozenset({1, 2}), frozenset({2, 3})], [2, 1]) as counter:
+                counter.count([frozenset({2}), frozenset({1, 2})]) // [3, 2]
+        """
+        items = sorted({item for transaction in transactions for item in transaction})
+        self.rows = {item: row for row, item in enumerate(items)}
+        self.processes = processes
+
+        number_of_transactions = len(transactions)
+        words = max(1, math.ceil(number_of_transactions / 64))
+        weights = np.asarray(weights, dtype=np.int64)
+        planes = max(1, int(weights.max(initial=1)).bit_length())
+        shape = (len(items) + planes, words)
+
+        if budget is not None:
+            budget.check_allocation(shape[0] * words * 8)
+        self.shm = shared_memory.SharedMemory(create=True, size=shape[0] * words * 8)
+        # Everything a worker needs to read the block: name, shape, number of items and number of weight planes
+        self.layout = (self.shm.name, shape, len(items), planes)
+        self.bitmaps = np.ndarray(shape, dtype=np.uint64, buffer=self.shm.buf)
+        self.bitmaps[:] = 0
+
+        # Item bitmaps, one (item row, transaction) pair per item of every transaction
+        lengths = np.fromiter((len(transaction) for transaction in transactions), dtype=np.int64, count=number_of_transactions)
+        positions = np.repeat(np.arange(number_of_transactions, dtype=np.uint64), lengths)
+        item_rows = np.fromiter((self.rows[item] for transaction in transactions for item in transaction), dtype=np.int64, count=int(lengths.sum()))
+        np.bitwise_or.at(self.bitmaps, (item_rows, (positions >> np.uint64(6)).astype(np.int64)), np.left_shift(np.uint64(1), positions & np.uint64(63)))
+
+        # Weight bit planes, packed the same way (little bit order within each uint64 word)
+        padded = np.zeros(words * 64, dtype=np.int64)
+        padded[:number_of_transactions] = weights
+        for plane in range(planes):
+            bits = ((padded >> plane) & 1).astype(np.uint8)
+            self.bitmaps[len(items) + plane] = np.packbits(bits, bitorder="little").view(np.uint64)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Method that frees the shared memory block. Workers drop their attachment on a later task.
+        """
+        if self.shm is None:
+            return
+        self.bitmaps = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def count(self, candidates, budget=None):
+        """
+        Method that counts the support of candidates of the same length.
+
+        Parameters:
+            candidates (list): candidates (sets of items).
+            budget (MiningBudget, optional): time/memory limits checked after every block.
+
+        Returns:
+            list: weighted count of every candidate, in the order of 'candidates'.
+
+        Error handling:
+            Raises a BudgetExceededError if the budget is hit between two blocks.
+        """
+        if not candidates:
+            return []
+        rows = self.rows
+        candidate_rows = np.array([[rows[item] for item in candidate] for candidate in candidates], dtype=np.int32)
+
+        words = self.layout[1][1]
+        block_size = max(1, BLOCK_WORDS // words)
+        parallel = self.processes > 1 and candidate_rows.size * words >= PARALLEL_MIN_WORDS
+        if parallel:
+            # Several blocks per worker so a slow block does not leave the other workers idle
+            block_size = max(1, min(block_size, math.ceil(len(candidates) / (self.processes * 4))))
+        blocks = [candidate_rows[start:start + block_size] for start in range(0, len(candidates), block_size)]
+
+        if parallel:
+            results = get_pool(self.processes).imap(count_worker_block, [(self.layout, block) for block in blocks])
+        else:
+            results = (count_block(self.bitmaps, self.layout, block) for block in blocks)
+
+        counts = []
+        for block_counts in results:
+            if budget is not None:
+                budget.check()
+            counts.extend(block_counts.tolist())
+        return counts
+
+def count_block(bitmaps, layout, candidate_rows):
+    """
+    Function that counts one block of candidates: the item bitmaps of each candidate are ANDed
+    and the set bits are counted against every weight plane.
+
+    Parameters:
+        bitmaps (ndarray): item bitmaps followed by the weight planes.
+        layout (tuple): shared memory name, shape, number of items and number of weight planes.
+        candidate_rows (ndarray): item rows of each candidate, shape (candidates, length).
+
+    Returns:
+        ndarray: int64 count of each candidate.
+    """
+    _, _, number_of_items, planes = layout
+    contained = bitmaps[candidate_rows[:, 0]]
+    for column in range(1, candidate_rows.shape[1]):
+        contained &= bitmaps[candidate_rows[:, column]]
+
+    # With every weight 1 the single plane covers all transactions, so the AND with it can be skipped
+    if planes == 1:
+        return popcount_rows(contained)
+    counts = np.zeros(len(candidate_rows), dtype=np.int64)
+    for plane in range(planes):
+        counts += popcount_rows(contained & bitmaps[number_of_items + plane]) << plane
+    return counts
+
+def popcount_rows(words):
+    """
+    Function that counts the set bits of each row of a 2d uint64 array with the SWAR bit count,
+    about twice as fast as a byte lookup table. 'words' is overwritten.
+
+    Parameters:
+        words (ndarray): uint64 array of shape (rows, words).
+
+    Returns:
+        ndarray: int64 number of set bits of each row.
+    """
+    shifted = np.empty_like(words)
+    np.right_shift(words, np.uint64(1), out=shifted)
+    shifted &= M1
+    words -= shifted
+    np.right_shift(words, np.uint64(2), out=shifted)
+    shifted &= M2
+    words &= M2
+    words += shifted
+    np.right_shift(words, np.uint64(4), out=shifted)
+    words += shifted
+    words &= M4
+    # The byte counts are summed into the top byte of each word
+    words *= H01
+    words >>= np.uint64(56)
+    return words.sum(axis=1, dtype=np.int64)
+
+# Shared memory block attached by this worker process: name -> (SharedMemory, ndarray)
+attached = {}
+
+def detach(keep=None):
+    """
+    Function that closes the shared memory blocks attached by this process, except 'keep'.
+
+    Parameters:
+        keep (str, optional): name of the block to keep attached.
+    """
+    for name in [name for name in attached if name != keep]:
+        # The ndarray is dropped with the tuple before the block is closed, a live view would make close() fail
+        shm = attached.pop(name)[0]
+        shm.close()
+
+def count_worker_block(task):
+    """
+    Worker process entry point. Attaches to the shared memory block of the counter on its first
+    block and counts the candidates of 'task' with count_block. The blocks of earlier counters are
+    detached then, so a worker keeps at most one freed block mapped after a mining run ends.
+
+    Parameters:
+        task (tuple): layout of the counter and the candidate rows of one block.
+    """
+    layout, candidate_rows = task
+    name, shape = layout[0], layout[1]
+    if name not in attached:
+        detach()
+        shm = shared_memory.SharedMemory(name=name)
+        attached[name] = (shm, np.ndarray(shape, dtype=np.uint64, buffer=shm.buf))
+    return count_block(attached[name][1], layout, candidate_rows)
+
+# Worker pool shared by every BitmapCounter of the process, started on first use
+pool = None
+pool_processes = 0
+pool_lock = threading.Lock()
+
+def get_pool(processes):
+    """
+    Function that returns the persistent worker pool, starting it on first use. The pool is kept
+    for the life of the process so mining runs and levels do not pay for starting workers.
+
+    Parameters:
+        processes (int): number of worker processes. A pool of another size is replaced.
+
+    Returns:
+        multiprocessing.Pool
+    """
+    global pool, pool_processes
+    with pool_lock:
+        if pool is None or pool_processes != processes:
+            if pool is None:
+                atexit.register(shutdown_pool)
+            else:
+                pool.terminate()
+            pool = multiprocessing.Pool(processes)
+            pool_processes = processes
+        return pool
+
+def shutdown_pool():
+    global pool
+    with pool_lock:
+        if pool is not None:
+            pool.terminate()
+            pool = None
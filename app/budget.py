@@ -0,0 +1,275 @@
+import os
+import sys
+import time
+
+class BudgetExceededError(Exception):
+    def __init__(self, message, partial_itemsets=None):
+        """
+        Exception raised when a mining run goes over one of the limits set in its 'MiningBudget'.
+        The itemsets of every level that was fully counted before the limit was hit are kept on
+        the exception so the caller can decide whether to return a partial result.
+
+        Parameters:
+            message (str): Message explaining which limit was hit.
+            partial_itemsets (dict, optional): itemsets (tuple -> count) mined before the limit was hit.
+        """
+        super().__init__(message)
+        self.partial_itemsets = partial_itemsets
+
+class MiningBudget:
+    # Share of max_seconds given to generating the rules of a truncated run, see 'start_partial'
+    PARTIAL_TIME_FRACTION = 0.25
+
+    def __init__(self, max_seconds=None, max_candidates=None, max_itemsets=None, max_rss_mb=None, allow_partial=False, check_interval=1000):
+        """
+        Constructor method to initialise a MiningBudget object. A budget sets per-request limits
+        on a mining run which are checked cooperatively inside the mining loops. When a limit is
+        hit a 'BudgetExceededError' is raised so the run stops cleanly instead of taking down the
+        whole Flask process. A limit set to None is not checked.
+
+        Parameters:
+            max_seconds (float, optional): maximum wall time the mining run can take.
+            max_candidates (int, optional): maximum number of candidate itemsets generated for a single level.
+            max_itemsets (int, optional): maximum number of frequent itemsets mined in total.
+            max_rss_mb (float, optional): maximum resident memory (MB) of the process while mining.
+            allow_partial (bool): return the levels mined so far instead of an error when a limit is hit.
+                Only 'apriori-ceri' mines level by level, the other engines always raise the error.
+            check_interval (int): number of loop iterations between time and memory checks.
+
+        Example:
+            budget = MiningBudget(max_seconds=5, max_candidates=50000, allow_partial=True)
+            budget.start()
+            budget.tick() # called inside a mining loop
+        """
+        self.max_seconds = max_seconds
+        self.max_candidates = max_candidates
+        self.max_itemsets = max_itemsets
+        self.max_rss_mb = max_rss_mb
+        self.allow_partial = allow_partial
+        self.check_interval = check_interval
+        self.started_at = None
+        self._ticks = 0
+
+    @classmethod
+    def from_dict(cls, data, defaults=None):
+        """
+        Method that creates a MiningBudget from the optional 'budget' object of a request body.
+        Values that are not sent in the request fall back to the defaults (usually from app config).
+        A request can only tighten a default limit, never loosen it.
+
+        Parameters:
+            data (dict): budget values sent in the request, may be None.
+            defaults (dict, optional): default budget values.
+
+        Returns:
+            MiningBudget: The budget built from the request and defaults.
+
+        Error handling:
+            Raises a ValueError if a budget value is not a positive number, or 'allow_partial' is not a boolean.
+        """
+        data = data or {}
+        defaults = defaults or {}
+        if not isinstance(data, dict):
+            raise ValueError("Budget sent in the request is not of the correct format.")
+
+        limits = {}
+        for key in ("max_seconds", "max_candidates", "max_itemsets", "max_rss_mb"):
+            value = data.get(key)
+            default = defaults.get(key)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+                raise ValueError(f"Budget value '{key}' should be a positive number.")
+            if value is None:
+                value = default
+            elif default is not None:
+                value = min(value, default)
+            limits[key] = value
+
+        allow_partial = data.get("allow_partial")
+        if allow_partial is not None and not isinstance(allow_partial, bool):
+            raise ValueError("Budget value 'allow_partial' should be true or false.")
+        if allow_partial is None:
+            allow_partial = bool(defaults.get("allow_partial", False))
+        return cls(allow_partial=allow_partial, **limits)
+
+    @staticmethod
+    def limits_from_config(config):
+        """
+        Method that reads the default budget values from a Flask config mapping. It returns the
+        values, not a MiningBudget, see 'from_dict' for building the budget of a request.
+
+        Parameters:
+            config (dict): Flask app config.
+
+        Returns:
+            dict: default budget values to be passed to 'from_dict'.
+        """
+        return {
+            "max_seconds": config.get("MINING_MAX_SECONDS"),
+            "max_candidates": config.get("MINING_MAX_CANDIDATES"),
+            "max_itemsets": config.get("MINING_MAX_ITEMSETS"),
+            "max_rss_mb": config.get("MINING_MAX_RSS_MB"),
+            "allow_partial": config.get("MINING_ALLOW_PARTIAL", False),
+        }
+
+    def start(self):
+        """
+        Method that starts the wall clock for the budget. Called once at the beginning of a mining run.
+        """
+        self.started_at = time.perf_counter()
+        self._ticks = 0
+
+    def start_partial(self):
+        """
+        Method called once a run was truncated, before the rules of the levels mined so far are
+        generated. The time and memory limits are used up at that point, so checking them would
+        fail the partial result. Rule generation gets its own bound instead: the clock is restarted
+        with PARTIAL_TIME_FRACTION of 'max_seconds' and memory is no longer checked.
+        """
+        if self.max_seconds is not None:
+            self.max_seconds *= self.PARTIAL_TIME_FRACTION
+        self.max_rss_mb = None
+        self.start()
+
+    def elapsed(self):
+        """
+        Method that returns the number of seconds since 'start' was called.
+        """
+        if self.started_at is None:
+            return 0.0
+        return time.perf_counter() - self.started_at
+
+    def tick(self, partial_itemsets=None):
+        """
+        Method called on every iteration of a mining loop. Time and memory are only checked
+        every 'check_interval' ticks so the check stays cheap in hot loops.
+
+        Parameters:
+            partial_itemsets (dict, optional): itemsets mined so far, kept on the error if a limit is hit.
+        """
+        self._ticks += 1
+        if self._ticks >= self.check_interval:
+            self._ticks = 0
+            self.check(partial_itemsets)
+
+    def check(self, partial_itemsets=None):
+        """
+        Method that checks the time and memory limits of the budget.
+
+        Parameters:
+            partial_itemsets (dict, optional): itemsets mined so far, kept on the error if a limit is hit.
+
+        Error handling:
+            Raises a BudgetExceededError if the time or memory limit has been hit.
+        """
+        if self.max_seconds is not None and self.elapsed() > self.max_seconds:
+            raise BudgetExceededError(f"Mining stopped after exceeding the time budget of {self.max_seconds} seconds.", partial_itemsets)
+
+        if self.max_rss_mb is not None:
+            rss_mb = current_rss_mb()
+            if rss_mb is not None and rss_mb > self.max_rss_mb:
+                raise BudgetExceededError(f"Mining stopped after exceeding the memory budget of {self.max_rss_mb} MB.", partial_itemsets)
+
+    def check_allocation(self, size_bytes, partial_itemsets=None):
+        """
+        Method that checks a large allocation against the memory limit before it is made, so a
+        single allocation cannot go far over the limit between two checks.
+
+        Parameters:
+            size_bytes (int): number of bytes about to be allocated.
+            partial_itemsets (dict, optional): itemsets mined so far, kept on the error if a limit is hit.
+
+        Error handling:
+            Raises a BudgetExceededError if the current memory plus 'size_bytes' is over the memory limit.
+        """
+        if self.max_rss_mb is None:
+            return
+        rss_mb = current_rss_mb()
+        if rss_mb is not None and rss_mb + size_bytes / (1024 * 1024) > self.max_rss_mb:
+            raise BudgetExceededError(f"Mining stopped as allocating {size_bytes / (1024 * 1024):.1f} MB would exceed the memory budget of {self.max_rss_mb} MB.", partial_itemsets)
+
+    def check_candidates(self, number_of_candidates, partial_itemsets=None):
+        """
+        Method that checks the number of candidates generated for a single level.
+
+        Parameters:
+            number_of_candidates (int)
+            partial_itemsets (dict, optional): itemsets mined so far, kept on the error if a limit is hit.
+
+        Error handling:
+            Raises a BudgetExceededError if the candidate limit has been hit.
+        """
+        if self.max_candidates is not None and number_of_candidates > self.max_candidates:
+            raise BudgetExceededError(f"Mining stopped after exceeding the budget of {self.max_candidates} candidates per level.", partial_itemsets)
+
+    def check_itemsets(self, number_of_itemsets, partial_itemsets=None):
+        """
+        Method that checks the total number of frequent itemsets mined.
+
+        Parameters:
+            number_of_itemsets (int)
+            partial_itemsets (dict, optional): itemsets mined so far, kept on the error if a limit is hit.
+
+        Error handling:
+            Raises a BudgetExceededError if the itemset limit has been hit.
+        """
+        if self.max_itemsets is not None and number_of_itemsets > self.max_itemsets:
+            raise BudgetExceededError(f"Mining stopped after exceeding the budget of {self.max_itemsets} itemsets.", partial_itemsets)
+
+    def guard(self, transactions):
+        """
+        Method that wraps a list of transactions so the budget is ticked for every transaction
+        read. Used for third-party engines that only expose their transaction scans to us.
+
+        Parameters:
+            transactions (list)
+
+        Returns:
+            GuardedTransactions: re-iterable view over the same transactions.
+        """
+        return GuardedTransactions(self, transactions)
+
+class GuardedTransactions:
+    def __init__(self, budget, transactions):
+        """
+        Re-iterable wrapper around a list of transactions that ticks a MiningBudget for every
+        transaction read. Engines such as pyfpgrowth scan the transactions more than once so a
+        plain generator cannot be used.
+
+        Parameters:
+            budget (MiningBudget)
+            transactions (list)
+        """
+        self.budget = budget
+        self.transactions = transactions
+
+    def __iter__(self):
+        for transaction in self.transactions:
+            self.budget.tick()
+            yield transaction
+
+    def __len__(self):
+        return len(self.transactions)
+
+def current_rss_mb():
+    """
+    Function that returns the current resident memory of the process in MB. Reads
+    '/proc/self/statm' on Linux and falls back to the peak RSS from 'resource' elsewhere.
+    Returns None if neither is available (ie. Windows).
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak_rss / (1024 * 1024)
+    return peak_rss / 1024
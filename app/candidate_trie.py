@@ -0,0 +1,71 @@
+class CandidateTrie:
+    def __init__(self, candidates):
+        """
+        Constructor method to initialise a CandidateTrie. The candidates of one Apriori level
+        (itemsets of the same length k) are stored in a prefix trie keyed by their sorted items.
+        Counting a transaction walks the trie with the transaction's sorted items, so only the
+        candidates that its k-subsets can reach are visited. Per-transaction work is proportional
+        to the matching candidates instead of the total number of candidates.
+
+        Parameters:
+            candidates (list): candidates (frozensets) of the same length.
+
+        Example:
+            trie = CandidateTrie([frozenset({'Bread', 'Milk'}), frozenset({'Beer', 'Diapers'})])
+            matched = trie.count(('Bread', 'Butter', 'Milk'), 1) // [0]
+            trie.counts // [1, 0]
+        """
+        self.candidates = candidates
+        self.counts = [0] * len(candidates)
+        self.length = len(candidates[0]) if candidates else 0
+        self.root = {}
+
+        # Inner nodes map an item to the next node. The last node of a path maps the item to the candidate index.
+        for index, candidate in enumerate(candidates):
+            items = sorted(candidate)
+            node = self.root
+            for item in items[:-1]:
+                node = node.setdefault(item, {})
+            node[items[-1]] = index
+
+    def count(self, items, weight=1):
+        """
+        Method that adds 'weight' to the count of every candidate contained in a transaction.
+
+        Parameters:
+            items (tuple): sorted items of the transaction.
+            weight (int): number of rows the transaction stands for.
+
+        Returns:
+            list: indexes of the candidates contained in the transaction.
+        """
+        length = self.length
+        number_of_items = len(items)
+        if number_of_items < length or length == 0:
+            return []
+
+        counts = self.counts
+        matched = []
+        stack = [(self.root, 0, 1)]
+        while stack:
+            node, start, depth = stack.pop()
+            # Only items that leave enough items after them to complete a candidate are tried
+            for position in range(start, number_of_items - (length - depth)):
+                child = node.get(items[position])
+                if child is None:
+                    continue
+                if depth == length:
+                    counts[child] += weight
+                    matched.append(child)
+                else:
+                    stack.append((child, position + 1, depth + 1))
+        return matched
+
+    def get_counts(self):
+        """
+        Method that returns the count of every candidate.
+
+        Returns:
+            dict: candidate (frozenset) -> count.
+        """
+        return dict(zip(self.candidates, self.counts))
@@ -0,0 +1,122 @@
+import sys
+
+import click
+from flask import current_app
+from flask.cli import FlaskGroup, with_appcontext
+
+from app import db
+from app import migrations
+from app.rule_index import RuleIndex
+from app.retention import purge_results
+
+@click.command("score-baskets")
+@click.argument("result_id")
+@click.argument("input_file", type=click.File("r"), default="-")
+@click.argument("output_file", type=click.File("w"), default="-")
+@click.option("--top-n", default=5, show_default=True, type=click.IntRange(min=1), help="Items recommended per basket.")
+@click.option("--sort-by", default="lift", show_default=True, type=click.Choice(RuleIndex.SORT_KEYS), help="Rule metric items are ranked by.")
+@click.option("--processes", default=None, type=click.IntRange(min=1), help="Worker processes (default: every core).")
+@click.option("--chunk-size", default=2048, show_default=True, type=click.IntRange(min=1), help="Baskets scored per chunk.")
+@with_appcontext
+def score_baskets_command(result_id, input_file, output_file, top_n, sort_by, processes, chunk_size):
+    """
+    Scores newline delimited JSON baskets against the rules of a stored result and writes one
+    JSON line of recommendations per basket. INPUT_FILE and OUTPUT_FILE default to stdin/stdout.
+
+    Example:
+        python -m app.commands score-baskets <result_id> baskets.ndjson recommendations.ndjson --top-n 3
+    """
+    from app.batch_scoring import BasketScorer, score_baskets
+
+    index = RuleIndex.from_result(result_id)
+    if index is None:
+        click.echo("Could not find result based on that id.", err=True)
+        sys.exit(1)
+
+    scorer = BasketScorer(index, top_n=top_n, sort_by=sort_by)
+    count = 0
+    for output in score_baskets(scorer, input_file, processes=processes, chunk_size=chunk_size):
+        output_file.write(output)
+        count += output.count("\n")
+
+    click.echo(f"Scored {count} baskets against {len(index)} rules.", err=True)
+
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """
+    Creates the database schema, or upgrades an existing database to the latest version. Run it
+    once per deploy before the app serves requests, the app itself does not create tables on
+    startup unless INIT_DB_ON_STARTUP is set.
+    """
+    applied = migrations.init_db(db)
+    click.echo(f"Database schema at version {migrations.SCHEMA_VERSION}, applied {len(applied)} migration(s).")
+
+@click.command("migrate-db")
+@click.option("--dry-run", is_flag=True, help="Only list the pending migrations.")
+@with_appcontext
+def migrate_db_command(dry_run):
+    """
+    Upgrades the database schema to the latest version without creating missing tables. This
+    command makes it possible to preview the pending migrations (--dry-run) before running init-db.
+    """
+    with db.engine.connect() as connection:
+        version = migrations.get_schema_version(connection)
+        pending = migrations.get_pending_migrations(connection)
+
+    click.echo(f"Schema version {version}, latest {migrations.SCHEMA_VERSION}.")
+    for number, description, _ in pending:
+        click.echo(f"  pending {number}: {description}")
+    if dry_run or not pending:
+        return
+
+    applied = migrations.upgrade(db.engine)
+    click.echo(f"Applied {len(applied)} migration(s).")
+
+@click.command("purge-results")
+@click.option("--max-age-days", type=click.FloatRange(min=0), default=None, help="Delete results older than this (default: RETENTION_MAX_AGE_DAYS).")
+@click.option("--max-results", type=click.IntRange(min=0), default=None, help="Keep only the newest results (default: RETENTION_MAX_RESULTS).")
+@click.option("--dry-run", is_flag=True, help="Only count the results that would be deleted.")
+@with_appcontext
+def purge_results_command(max_age_days, max_results, dry_run):
+    """
+    Deletes the results that fall outside the retention policy.
+    """
+    if max_age_days is None and max_results is None:
+        max_age_days = current_app.config.get("RETENTION_MAX_AGE_DAYS")
+        max_results = current_app.config.get("RETENTION_MAX_RESULTS")
+    if max_age_days is None and max_results is None:
+        click.echo("No retention policy, set --max-age-days and/or --max-results.", err=True)
+        sys.exit(1)
+
+    summary = purge_results(max_age_days, max_results, dry_run=dry_run)
+    if dry_run:
+        click.echo(f"{summary['results']} result(s) would be deleted.")
+    else:
+        rows = ", ".join(f"{table}: {count}" for table, count in summary["deleted"].items())
+        click.echo(f"Deleted {summary['results']} result(s). {rows}")
+
+def init_app(app):
+    """
+    Registers the flask CLI commands of the app.
+
+    Parameters:
+        app (Flask): The Flask application instance.
+    """
+    app.cli.add_command(score_baskets_command)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_db_command)
+    app.cli.add_command(purge_results_command)
+
+def main():
+    """
+    Runs the flask CLI with the app of create_app. The repository root is itself a package, so
+    'flask --app' would import the app under a different module name. Use 'python -m app.commands'
+    from the repository root instead. The schema is left to the init-db and migrate-db commands and
+    no retention thread is started.
+    """
+    from app import create_app
+    FlaskGroup(create_app=lambda: create_app({"INIT_DB_ON_STARTUP": False, "RETENTION_INTERVAL_SECONDS": None}))()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+from collections import defaultdict
+from itertools import count
+
+from app.preprocessing import compress_transactions
+
+class TransactionValidationError(ValueError):
+    def __init__(self, index):
+        """
+        Error raised when a transaction is not a list of strings.
+
+        Parameters:
+            index (int): position of the first invalid transaction in the request.
+        """
+        super().__init__(f"All transactions in the list should be of data type string. Invalid transaction at index {index}.")
+        self.index = index
+
+class EncodedDataset:
+    def __init__(self, items, transactions):
+        """
+        Constructor method to initialise an EncodedDataset: transactions whose items have been
+        interned to integer ids. Every engine mines the integer transactions and the ids are only
+        turned back into strings when the results are formatted, so each item string is validated
+        and hashed once per request instead of once per scan. Use 'from_transactions' to build one.
+
+        Item ids follow the sort order of the item strings, so sorting ids gives the same order as
+        sorting the strings and the engines return itemsets and rules in the same order as before.
+
+        Parameters:
+            items (list): item id -> item string.
+            transactions (list): one tuple of item ids per transaction, without duplicate items.
+
+        Example:
+            dataset = EncodedDataset.from_transactions([['Milk', 'Bread'], ['Beer', 'Milk', 'Milk']])
+            dataset.items // ['Beer', 'Bread', 'Milk']
+            dataset.transactions // [(2, 1), (0, 2)]
+            dataset.decode((0, 2)) // ['Beer', 'Milk']
+        """
+        self.items = items
+        self.transactions = transactions
+        self._compressed = None
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        """
+        Class method that validates, deduplicates and interns a list of transactions in a single
+        pass. Duplicate items are dropped from each transaction, keeping the first occurrence.
+
+        Parameters:
+            transactions (2d list): transactions of item strings, ie. from a /mine request.
+
+        Returns:
+            EncodedDataset
+
+        Error handling:
+            Raises a TransactionValidationError with the index of the first transaction that is not
+            a list or contains an item that is not a string.
+        """
+        # A missing item gets the next id, so the lookups below run without a Python level branch per item
+        ids = defaultdict(count().__next__)
+        lookup = ids.__getitem__
+        encoded = []
+        for index, transaction in enumerate(transactions):
+            if not isinstance(transaction, list):
+                raise TransactionValidationError(index)
+            try:
+                encoded.append(tuple(map(lookup, dict.fromkeys(transaction))))
+            except TypeError:
+                raise TransactionValidationError(index) from None # unhashable item, ie. a list or dict
+
+        # Item types are checked once per distinct item instead of once per occurrence
+        items = list(ids)
+        if not all(isinstance(item, str) for item in items):
+            invalid = {item for item in items if not isinstance(item, str)}
+            raise TransactionValidationError(next(index for index, transaction in enumerate(transactions) if not invalid.isdisjoint(transaction)))
+
+        # Renumbering the ids in the sort order of the strings
+        order = sorted(range(len(items)), key=items.__getitem__)
+        rank = [0] * len(items)
+        for new_id, old_id in enumerate(order):
+            rank[old_id] = new_id
+        renumber = rank.__getitem__
+
+        return cls([items[old_id] for old_id in order], [tuple(map(renumber, transaction)) for transaction in encoded])
+
+    def __len__(self):
+        return len(self.transactions)
+
+    def decode(self, ids):
+        """
+        Method that returns the item strings of a sequence of item ids, in the same order.
+
+        Parameters:
+            ids (iterable): item ids.
+
+        Returns:
+            list: item strings.
+        """
+        items = self.items
+        return [items[item_id] for item_id in ids]
+
+    def compress(self):
+        """
+        Method that returns the unique transactions (frozensets of item ids) and their weights (see
+        compress_transactions). Computed once and shared by every engine that mines this dataset.
+
+        Returns:
+            tuple: list of unique transactions and a list of their weights.
+        """
+        if self._compressed is None:
+            self._compressed = compress_transactions(self.transactions)
+        return self._compressed
@@ -0,0 +1,268 @@
+import bisect
+import threading
+import time
+
+from flask import request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MINING_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+COUNT_BUCKETS = (0, 10, 100, 1000, 10000, 100000, 1000000)
+
+class Metric:
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Base class for in-process metrics rendered in the Prometheus text exposition format.
+        Each metric keeps one value per combination of label values. Updates take a lock so
+        the metrics are safe to use from threaded Flask workers.
+
+        Parameters:
+            name (str): Metric name ie. 'arm_http_requests_total'.
+            documentation (str): Help text rendered in the '# HELP' line.
+            labelnames (tuple): Names of the labels the metric is partitioned by.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.labelnames}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs)
+        return "{" + escaped + "}"
+
+    def render(self):
+        """
+        Method that renders the metric in the Prometheus text exposition format.
+
+        Returns:
+            list: lines of the rendered metric.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self.render_samples(items))
+        return lines
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        """
+        Method that increases the counter for the given label values by 'amount'.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render_samples(self, items):
+        return [f"{self.name}{self._format_labels(key)} {format_value(value)}" for key, value in items]
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        """
+        Method that increases the gauge for the given label values by 'amount'.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        """
+        Method that decreases the gauge for the given label values by 'amount'.
+        """
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        """
+        Method that sets the gauge for the given label values to 'value'.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def track_inprogress(self, **labels):
+        """
+        Method that returns a context manager increasing the gauge while the code inside it runs.
+        """
+        return _InProgress(self, labels)
+
+    def render_samples(self, items):
+        return [f"{self.name}{self._format_labels(key)} {format_value(value)}" for key, value in items]
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Histogram with cumulative buckets. Observing a value is a bisect on the bucket bounds
+        so it is cheap enough to leave on in production.
+
+        Parameters:
+            name (str)
+            documentation (str)
+            labelnames (tuple)
+            buckets (tuple): sorted upper bounds of the buckets, '+Inf' is added automatically.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """
+        Method that records a single observation (ie. a duration in seconds) for the given label values.
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = state
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """
+        Method that returns a context manager observing the number of seconds the code inside it takes.
+        """
+        return _Timer(self, labels)
+
+    def render_samples(self, items):
+        lines = []
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+class _InProgress:
+    def __init__(self, gauge, labels):
+        self.gauge = gauge
+        self.labels = labels
+
+    def __enter__(self):
+        self.gauge.inc(**self.labels)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.gauge.dec(**self.labels)
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Collection of metrics rendered together by the '/metrics' endpoint.
+        """
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Method that renders every registered metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition body, ending with a newline.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_value(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+# Default registry and the metrics recorded by the API
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter("arm_http_requests_total", "Total HTTP requests by route, method and status code.", ("route", "method", "status"))
+http_request_duration_seconds = registry.histogram("arm_http_request_duration_seconds", "HTTP request latency in seconds by route and method.", ("route", "method"))
+http_requests_in_flight = registry.gauge("arm_http_requests_in_flight", "HTTP requests currently being served.")
+
+mine_requests_total = registry.counter("arm_mine_requests_total", "Mining requests by algorithm and outcome.", ("algorithm", "outcome"))
+mine_request_duration_seconds = registry.histogram("arm_mine_request_duration_seconds", "End to end /mine latency in seconds by algorithm.", ("algorithm",), MINING_BUCKETS)
+mining_duration_seconds = registry.histogram("arm_mining_duration_seconds", "Time spent mining itemsets and rules in seconds by algorithm.", ("algorithm",), MINING_BUCKETS)
+mining_jobs_in_flight = registry.gauge("arm_mining_jobs_in_flight", "Mining jobs currently running.")
+itemsets_produced = registry.histogram("arm_itemsets_produced", "Number of itemsets produced per mining run by algorithm.", ("algorithm",), COUNT_BUCKETS)
+rules_produced = registry.histogram("arm_rules_produced", "Number of rules produced per mining run by algorithm.", ("algorithm",), COUNT_BUCKETS)
+
+db_write_duration_seconds = registry.histogram("arm_db_write_duration_seconds", "Time spent writing results to the database in seconds.", ("operation",))
+db_rows_written_total = registry.counter("arm_db_rows_written_total", "Rows written to the database by table.", ("table",))
+db_rows_deleted_total = registry.counter("arm_db_rows_deleted_total", "Rows deleted from the database by table.", ("table",))
+
+cache_requests_total = registry.counter("arm_cache_requests_total", "Cache lookups by cache name and result (hit or miss).", ("cache", "result"))
+
+# Gauges without labels are exported as 0 before the first request
+http_requests_in_flight.set(0)
+mining_jobs_in_flight.set(0)
+
+def init_app(app):
+    """
+    Function that registers request hooks on the Flask app recording the per-route request
+    count, latency and in-flight requests.
+
+    Parameters:
+        app (Flask): The Flask application instance.
+    """
+    @app.before_request
+    def start_request_timer():
+        request.environ["arm.metrics.start"] = time.perf_counter()
+        request.environ["arm.metrics.in_flight"] = True
+        http_requests_in_flight.inc()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = request.environ.pop("arm.metrics.start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            http_requests_total.inc(route=route, method=request.method, status=response.status_code)
+            http_request_duration_seconds.observe(time.perf_counter() - start, route=route, method=request.method)
+        return response
+
+    @app.teardown_request
+    def finish_request(error=None):
+        if request.environ.pop("arm.metrics.in_flight", False):
+            http_requests_in_flight.dec()
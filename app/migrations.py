@@ -0,0 +1,227 @@
+from sqlalchemy import inspect, text
+
+from app.result_codec import hash_rule_key
+
+# Schema version stored in the SQLite 'user_version' pragma, or in a one row 'schema_version' table on
+# other backends. Fresh databases are created at the latest version by db.create_all(), which stamps
+# SCHEMA_VERSION when it creates the 'result' table (see app/models/db_daos.py), existing ones are
+# upgraded by the MIGRATIONS below in order.
+SCHEMA_VERSION = 3
+
+def migrate_integer_keys(connection):
+    """
+    Migration 1: replaces the 36 character uuid primary keys of every result table with integer
+    keys. The uuid of a result is kept in the new 'result.uuid' column as its public id, the uuids
+    of the other rows are dropped. The foreign keys are rewritten to the new integer ids and
+    indexed. Rows whose parent no longer exists are not copied. Row order (rowid) is preserved.
+
+    Parameters:
+        connection (Connection): SQLAlchemy connection inside a transaction.
+    """
+    statements = [
+        # New tables, same DDL as the models at version 1
+        """CREATE TABLE result_new (
+            id INTEGER NOT NULL, uuid VARCHAR(36) NOT NULL, count INTEGER NOT NULL,
+            algorithm VARCHAR(100) NOT NULL, date_added VARCHAR(100) NOT NULL,
+            PRIMARY KEY (id), UNIQUE (uuid))""",
+        """CREATE TABLE itemset_new (
+            id INTEGER NOT NULL, items VARCHAR(1000) NOT NULL, count INTEGER NOT NULL, result_id INTEGER NOT NULL,
+            PRIMARY KEY (id), FOREIGN KEY(result_id) REFERENCES result (id))""",
+        """CREATE TABLE rule_new (
+            id INTEGER NOT NULL, confidence FLOAT NOT NULL, conviction FLOAT NOT NULL, lift FLOAT NOT NULL,
+            support FLOAT NOT NULL, rule VARCHAR(1000) NOT NULL, result_id INTEGER NOT NULL,
+            PRIMARY KEY (id), FOREIGN KEY(result_id) REFERENCES result (id))""",
+        """CREATE TABLE lhs_new (
+            id INTEGER NOT NULL, item VARCHAR(200) NOT NULL, rule_id INTEGER NOT NULL,
+            PRIMARY KEY (id), FOREIGN KEY(rule_id) REFERENCES rule (id))""",
+        """CREATE TABLE rhs_new (
+            id INTEGER NOT NULL, item VARCHAR(200) NOT NULL, rule_id INTEGER NOT NULL,
+            PRIMARY KEY (id), FOREIGN KEY(rule_id) REFERENCES rule (id))""",
+
+        # Results keep their uuid as the public id
+        """INSERT INTO result_new (uuid, count, algorithm, date_added)
+            SELECT id, count, algorithm, date_added FROM result ORDER BY rowid""",
+        """INSERT INTO itemset_new (items, count, result_id)
+            SELECT itemset.items, itemset.count, result_new.id FROM itemset
+            JOIN result_new ON result_new.uuid = itemset.result_id ORDER BY itemset.rowid""",
+
+        # Old rule uuid -> new integer id, needed to rewrite the lhs/rhs foreign keys
+        """CREATE TEMP TABLE rule_id_map (old_id VARCHAR(36) PRIMARY KEY, new_id INTEGER NOT NULL)""",
+        """INSERT INTO rule_id_map (old_id, new_id)
+            SELECT rule.id, ROW_NUMBER() OVER (ORDER BY rule.rowid) FROM rule
+            JOIN result_new ON result_new.uuid = rule.result_id""",
+        """INSERT INTO rule_new (id, confidence, conviction, lift, support, rule, result_id)
+            SELECT rule_id_map.new_id, rule.confidence, rule.conviction, rule.lift, rule.support, rule.rule, result_new.id FROM rule
+            JOIN rule_id_map ON rule_id_map.old_id = rule.id
+            JOIN result_new ON result_new.uuid = rule.result_id ORDER BY rule_id_map.new_id""",
+        """INSERT INTO lhs_new (item, rule_id)
+            SELECT lhs.item, rule_id_map.new_id FROM lhs JOIN rule_id_map ON rule_id_map.old_id = lhs.rule_id ORDER BY lhs.rowid""",
+        """INSERT INTO rhs_new (item, rule_id)
+            SELECT rhs.item, rule_id_map.new_id FROM rhs JOIN rule_id_map ON rule_id_map.old_id = rhs.rule_id ORDER BY rhs.rowid""",
+        """DROP TABLE rule_id_map""",
+    ]
+
+    # Old tables are replaced children first, then the foreign key indexes are created
+    for table in ("lhs", "rhs", "itemset", "rule", "result"):
+        statements.append(f"DROP TABLE {table}")
+    for table in ("result", "itemset", "rule", "lhs", "rhs"):
+        statements.append(f"ALTER TABLE {table}_new RENAME TO {table}")
+    statements += [
+        "CREATE INDEX ix_itemset_result_id ON itemset (result_id)",
+        "CREATE INDEX ix_rule_result_id ON rule (result_id)",
+        "CREATE INDEX ix_lhs_rule_id ON lhs (rule_id)",
+        "CREATE INDEX ix_rhs_rule_id ON rhs (rule_id)",
+    ]
+
+    for statement in statements:
+        connection.execute(text(statement))
+
+def add_result_blob_storage(connection):
+    """
+    Migration 2: adds the 'result.storage' column (existing results are 'rows') and the
+    'result_blob' table used by the compressed blob storage mode (see app/result_codec.py).
+
+    Parameters:
+        connection (Connection): SQLAlchemy connection inside a transaction.
+    """
+    statements = [
+        "ALTER TABLE result ADD COLUMN storage VARCHAR(10) NOT NULL DEFAULT 'rows'",
+        # IF NOT EXISTS as db.create_all() may have created the table on a database that was not upgraded yet
+        """CREATE TABLE IF NOT EXISTS result_blob (
+            id INTEGER NOT NULL, data BLOB NOT NULL, result_id INTEGER NOT NULL,
+            PRIMARY KEY (id), FOREIGN KEY(result_id) REFERENCES result (id))""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_result_blob_result_id ON result_blob (result_id)",
+    ]
+
+    for statement in statements:
+        connection.execute(text(statement))
+
+def add_rule_keys(connection):
+    """
+    Migration 3: adds the 'rule.rule_key' column used to compare results (see app/result_diff.py)
+    and fills it in for the existing rules from their lhs/rhs rows. Blobs are not rewritten, the
+    keys of version 1 blobs are computed when they are read.
+
+    Parameters:
+        connection (Connection): SQLAlchemy connection inside a transaction.
+    """
+    connection.execute(text("ALTER TABLE rule ADD COLUMN rule_key BIGINT"))
+
+    sides = {}
+    for position, table in enumerate(("lhs", "rhs")):
+        for rule_id, item in connection.execute(text(f"SELECT rule_id, item FROM {table} ORDER BY id")):
+            sides.setdefault(rule_id, ([], []))[position].append(item)
+
+    rule_ids = connection.execute(text("SELECT id FROM rule")).scalars()
+    keys = [{"id": rule_id, "rule_key": hash_rule_key(*sides.get(rule_id, ([], [])))} for rule_id in rule_ids]
+    if keys:
+        connection.execute(text("UPDATE rule SET rule_key = :rule_key WHERE id = :id"), keys)
+
+# (version, description, function) in the order they are applied
+MIGRATIONS = [
+    (1, "Integer primary keys and indexed foreign keys for the result tables", migrate_integer_keys),
+    (2, "Storage column and result_blob table for compressed results", add_result_blob_storage),
+    (3, "Rule key column used to compare results", add_rule_keys),
+]
+
+def get_schema_version(connection):
+    """
+    Function that returns the schema version of a database. Databases created before versioning
+    was added have version 0.
+
+    Returns:
+        int: version stored in the 'user_version' pragma (SQLite) or the 'schema_version' table.
+    """
+    if connection.dialect.name == "sqlite":
+        return connection.execute(text("PRAGMA user_version")).scalar()
+    if not inspect(connection).has_table("schema_version"):
+        return 0
+    return connection.execute(text("SELECT version FROM schema_version")).scalar() or 0
+
+def set_schema_version(connection, version):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"PRAGMA user_version = {int(version)}"))
+        return
+    connection.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    connection.execute(text("DELETE FROM schema_version"))
+    connection.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": int(version)})
+
+def get_pending_migrations(connection):
+    """
+    Function that returns the migrations a database still needs. A database without a 'result'
+    table is empty and is created at the latest version, so it needs none.
+
+    Returns:
+        list: (version, description, function) tuples.
+    """
+    if not inspect(connection).has_table("result"):
+        return []
+    version = get_schema_version(connection)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+def upgrade(engine):
+    """
+    Function that applies the pending migrations of a database, each in its own transaction, and
+    stamps empty databases with the latest version. Must run before db.create_all() so the tables
+    of an old database are not mistaken for the current ones.
+
+    Parameters:
+        engine (Engine): SQLAlchemy engine of the database.
+
+    Returns:
+        list: versions that were applied.
+
+    Error handling:
+        A failing migration is rolled back and the error is raised, leaving the database at the
+        last version that was applied.
+
+    Note:
+        Migrations 1 and 2 only apply to SQLite databases created before other backends were
+        supported, databases of other backends start at version 2 or later.
+    """
+    sqlite = engine.dialect.name == "sqlite"
+    applied = []
+    with engine.begin() as connection:
+        pending = get_pending_migrations(connection)
+        if not pending and not inspect(connection).has_table("result"):
+            set_schema_version(connection, SCHEMA_VERSION)
+
+    for version, description, function in pending:
+        if sqlite:
+            # pysqlite does not put DDL in a transaction by itself, so BEGIN/COMMIT are sent explicitly
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                connection.exec_driver_sql("BEGIN")
+                try:
+                    function(connection)
+                    set_schema_version(connection, version)
+                except Exception:
+                    connection.exec_driver_sql("ROLLBACK")
+                    raise
+                connection.exec_driver_sql("COMMIT")
+        else:
+            with engine.begin() as connection:
+                function(connection)
+                set_schema_version(connection, version)
+        applied.append(version)
+
+    # Migrations rebuild tables, VACUUM gives the pages of the old tables back to the file system
+    if applied and sqlite:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM"))
+
+    return applied
+
+def init_db(db):
+    """
+    Function that brings a database to the latest schema: pending migrations are applied first,
+    then the missing tables are created with db.create_all(). Safe to run on every deploy.
+
+    Parameters:
+        db (SQLAlchemy): The Flask-SQLAlchemy extension, used inside an app context.
+
+    Returns:
+        list: migration versions that were applied.
+    """
+    applied = upgrade(db.engine)
+    db.create_all()
+    return applied
@@ -1,20 +1,47 @@
-import pyfpgrowth
-
-from efficient_apriori import apriori
+from contextlib import nullcontext
+from itertools import combinations
 
 from app.apriori_ceri import AprioriCeri
+from app.budget import BudgetExceededError
+from app.ingestion import EncodedDataset
 
 class Miner:
-    def __init__(self, algorithm, data, support_threshold, confidence_threshold=0.8):
+    # Algorithm name -> function(miner) that mines with it, filled by 'register_algorithm'. The
+    # mining libraries are imported inside these functions, on the first request that uses them.
+    ENGINES = {}
+    # Algorithms supported by 'mine_association_rules', in registration order
+    ALGORITHMS = ()
+
+    @classmethod
+    def register_algorithm(cls, name, engine):
+        """
+        Class method that makes an algorithm available to 'mine_association_rules'. Registering
+        an existing name replaces its engine.
+
+        Parameters:
+            name (str): algorithm name used in /mine requests.
+            engine (function): called with the Miner object, returns a results dict containing
+                'itemsets' and 'rules' (see 'mine_apriori').
+        """
+        cls.ENGINES[name] = engine
+        cls.ALGORITHMS = tuple(cls.ENGINES)
+
+    def __init__(self, algorithm, data, support_threshold, confidence_threshold=0.8, budget=None, timer=None, counting='trie', processes=1):
         """
         Constructor method to initialise a Miner object that can be used for mining association
         rules. sets a default confidence of 0.8 is none is supplied.
 
         Parameters:
             algorithm (str): algorithm to mine association rules ie. Apriori or FP-Growth. 
-            data (2d list): 2 dimensional list containing transactional data. 
+            data (2d list or EncodedDataset): 2 dimensional list containing transactional data, or the same data
+                already validated and encoded by 'EncodedDataset.from_transactions' (see app/ingestion.py).
             support_threshold (float): support measures how frequently the items in the rule appear together. Set a threshold for this. 
+                It is a fraction of the number of transactions for every algorithm, ie. 0.2 keeps itemsets found in 20% of the transactions.
             confidence_threshold (float): confidence measures the reliability of a rule. It is the proportion of transactions containing A that also contains B. Set a threshold for this.
+            budget (MiningBudget, optional): time/memory/size limits checked while mining. See 'app.budget'.
+            timer (StageTimer, optional): records the duration of each mining stage. See 'app.timing'.
+            counting (str): candidate counting method used by 'apriori-ceri', 'trie' (default), 'subset' or 'bitmap'.
+            processes (int): worker processes used by 'bitmap' counting, 1 (default) counts in-process.
 
         Example: 
             transactions = [
@@ -42,8 +69,15 @@ class Miner:
         """
         self.algorithm=algorithm 
         self.data=data #2d list containing transactional data
+        # Items interned to integer ids, shared by every engine. Raises a TransactionValidationError for invalid data.
+        self.dataset=data if isinstance(data, EncodedDataset) else EncodedDataset.from_transactions(data)
         self.support_threshold=support_threshold
         self.confidence_threshold=confidence_threshold
+        self.budget=budget
+        self.timer=timer
+        self.counting=counting
+        self.processes=processes
+        self.truncated=False # True when the budget was hit and only the levels mined so far are returned
 
     def mine_association_rules(self):
         """
@@ -58,15 +92,15 @@ class Miner:
 
         Error handling: 
             Raises a ValueError if algorithm not specified correctly on object creation. 
+            Raises a BudgetExceededError if the budget attribute is set and one of its limits is hit.
         """
-        if self.algorithm == 'apriori':
-            return self.mine_apriori()
-        elif self.algorithm == 'fpgrowth': 
-            return self.mine_fpgrowth()
-        elif self.algorithm == 'apriori-ceri':
-            return self.mine_apriori_ceri()
-        else:
+        if self.budget is not None:
+            self.budget.start()
+
+        engine = self.ENGINES.get(self.algorithm)
+        if engine is None:
             raise ValueError("Algorithm not specified correctly.")
+        return engine(self)
 
     def mine_apriori(self):
         """
@@ -90,13 +124,22 @@ class Miner:
         Returns:
             results (dict): containing 'itemsets' and 'rules' produced by the apriori mining process.
         """
-        itemsets, rules = apriori(self.data, min_support=self.support_threshold,  min_confidence=self.confidence_threshold)
+        from efficient_apriori import apriori
+
+        with self.stage("mining.engine"):
+            itemsets, rules = apriori(self.get_budgeted_data(), min_support=self.support_threshold,  min_confidence=self.confidence_threshold)
+
+        if self.budget is not None:
+            self.budget.check_itemsets(sum(len(value) for value in itemsets.values()))
+            self.budget.check()
 
         # Need to ensure 'itemset' python dict returned by apriori()function is JSON conpatible by jsonify() function
-        itemsets_json_compatible = self.convert_itemsets_to_json_compatible(itemsets)
+        with self.stage("mining.format_itemsets"):
+            itemsets_json_compatible = self.convert_itemsets_to_json_compatible(itemsets)
         
         # Convert rule results to python dict that is JSON compatible by jsonify() function
-        rule_results = self.convert_rules_to_json_format(itemsets, rules)
+        with self.stage("mining.format_rules"):
+            rule_results = self.convert_rules_to_json_format(itemsets, rules)
         
         result = {
             "itemsets": itemsets_json_compatible, 
@@ -123,21 +166,32 @@ class Miner:
         
         External functions: 
             find_frequent_patterns() from 'pyfpgrowth' library
-            generate_association_rules() from 'pyfpgrowth' library
 
         Returns:
             results(dict): containing 'itemsets' and 'rules' produced by the fpgrowth mining process.
         """
-        # For the method 'find_frequent_patterns' support parameter is taken in as multiple of 10 (2 instead of 0.2)
-        support_threshold_fpgrowth = self.support_threshold * 10 
-        itemsets = pyfpgrowth.find_frequent_patterns(self.data, support_threshold_fpgrowth)
-        rules = pyfpgrowth.generate_association_rules(itemsets, self.confidence_threshold)
+        import pyfpgrowth
+
+        # For the method 'find_frequent_patterns' support parameter is taken in as an absolute count (2 instead of 0.2 for 10 transactions)
+        support_threshold_fpgrowth = self.support_threshold * len(self.dataset)
+        with self.stage("mining.engine"):
+            itemsets = pyfpgrowth.find_frequent_patterns(self.get_budgeted_data(), support_threshold_fpgrowth)
+
+        # Rule generation grows with 2^k for each itemset so the budget is checked before it starts
+        if self.budget is not None:
+            self.budget.check_itemsets(len(itemsets))
+            self.budget.check()
+
+        with self.stage("mining.rules"):
+            rules = self.generate_association_rules(itemsets)
 
         # Convert rule results to python dict that is JSON compatible by jsonify() function
-        rule_results = self.convert_rules_to_json_format(itemsets, rules)
+        with self.stage("mining.format_rules"):
+            rule_results = self.convert_rules_to_json_format(itemsets, rules)
 
         # Need to ensure 'itemset' python dict returned by frpgrowth()function is JSON conpatible by jsonify() function
-        itemsets_json_compatible = self.convert_itemsets_to_json_compatible(itemsets)
+        with self.stage("mining.format_itemsets"):
+            itemsets_json_compatible = self.convert_itemsets_to_json_compatible(itemsets)
 
 
         result = {
@@ -160,26 +214,46 @@ class Miner:
             confidence_threshold (class attribute)
 
         Methods: 
+            self.generate_association_rules(itemsets): generates the rules of the itemsets returned by apriori-ceri.
             self.convert_itemsets_to_json_compatible(itemsets)
             self.convert_rules_to_json_format(itemsets, rules)
-        
-        External functions: 
-            generate_association_rules() from 'pyfpgrowth' library. This is used to generate
-            rules using the itemsets returned by apriori-ceri.
 
         Returns:
             results(dict): containing 'itemsets' and 'rules' produced by the apriori-ceri mining process.
+            When the budget allows partial results and a limit is hit, the rules of the levels mined
+            so far are returned and the 'truncated' attribute is set.
         """
-        support_threshold_apriori_ceri = self.support_threshold * 10
-        apriori_ceri = AprioriCeri(self.data, support_threshold_apriori_ceri, self.confidence_threshold)
-        itemsets = apriori_ceri.mine()
-        rules = pyfpgrowth.generate_association_rules(itemsets, self.confidence_threshold)
+        # AprioriCeri also takes the support as an absolute count of transactions
+        support_threshold_apriori_ceri = self.support_threshold * len(self.dataset)
+
+        # Identical transactions are collapsed into (transaction, weight) pairs so each is only scanned once per level
+        with self.stage("mining.preprocess"):
+            transactions, weights = self.dataset.compress()
+        if self.timer is not None:
+            self.timer.record("transactions", {"rows": len(self.dataset), "unique": len(transactions)})
+
+        apriori_ceri = AprioriCeri(transactions, support_threshold_apriori_ceri, self.confidence_threshold, budget=self.budget, weights=weights, counting=self.counting, processes=self.processes)
+        try:
+            with self.stage("mining.engine"):
+                itemsets = apriori_ceri.mine()
+        finally:
+            if self.timer is not None:
+                self.timer.record("levels", apriori_ceri.level_stats)
+        self.truncated = apriori_ceri.truncated
+        if self.truncated:
+            # The limits are used up, the rules of the partial result get their own time allowance
+            self.budget.start_partial()
+
+        with self.stage("mining.rules"):
+            rules = self.generate_association_rules(itemsets)
 
         # Convert rule results to python dict that is JSON compatible by jsonify() function
-        rule_results = self.convert_rules_to_json_format(itemsets, rules)
+        with self.stage("mining.format_rules"):
+            rule_results = self.convert_rules_to_json_format(itemsets, rules)
 
         # Need to ensure 'itemset' python dict returned by mine() function is JSON compatible by jsonify() function
-        itemsets_json_compatible = self.convert_itemsets_to_json_compatible(itemsets)
+        with self.stage("mining.format_itemsets"):
+            itemsets_json_compatible = self.convert_itemsets_to_json_compatible(itemsets)
 
         result = {
             "itemsets": itemsets_json_compatible, 
@@ -188,6 +262,74 @@ class Miner:
 
         return result
     
+    def stage(self, name):
+        """
+        Method that returns a context manager timing the stage 'name' on the timer attribute.
+        A no-op context manager is returned if no timer is set.
+
+        Parameters:
+            name (str): Name of the stage ie. 'mining.engine'.
+            timer (class attribute)
+        """
+        if self.timer is None:
+            return nullcontext()
+        return self.timer.stage(name)
+
+    def get_budgeted_data(self):
+        """
+        Method that returns the transactional data wrapped so the budget is checked while a
+        third-party engine scans it. The data is returned unchanged if no budget is set.
+
+        Parameters:
+            dataset (class attribute)
+            budget (class attribute)
+
+        Returns:
+            list or GuardedTransactions: encoded transactions (without duplicate items) to pass to the mining engine.
+        """
+        # Third-party engines cannot add transaction weights so they get the encoded rows as they are
+        data = self.dataset.transactions
+        if self.budget is None:
+            return data
+        return self.budget.guard(data)
+
+    def generate_association_rules(self, itemsets):
+        """
+        Method that generates the rules of a dict of itemsets, the same way as pyfpgrowth's
+        generate_association_rules() but with the budget ticked for every antecedent checked.
+        Used by 'fpgrowth' and 'apriori-ceri'.
+
+        Parameters:
+            itemsets (dict): itemset (sorted tuple of item ids) -> count.
+            confidence_threshold (class attribute)
+            budget (class attribute)
+
+        Returns:
+            rules (dict): antecedent tuple -> (consequent tuple, confidence).
+
+        Error handling:
+            Raises a BudgetExceededError if a limit of the budget is hit. On a truncated run the
+            rules generated so far are returned instead, the result is partial already.
+        """
+        rules = {}
+        try:
+            for itemset, upper_support in itemsets.items():
+                for length in range(1, len(itemset)):
+                    for antecedent in combinations(itemset, length):
+                        if self.budget is not None:
+                            self.budget.tick()
+                        antecedent = tuple(sorted(antecedent))
+                        consequent = tuple(sorted(set(itemset) - set(antecedent)))
+
+                        if antecedent in itemsets:
+                            confidence = float(upper_support) / itemsets[antecedent]
+                            if confidence >= self.confidence_threshold:
+                                rules[antecedent] = (consequent, confidence)
+        except BudgetExceededError:
+            if not self.truncated:
+                raise
+        return rules
+
     def convert_itemsets_to_json_compatible(self, itemsets): 
         """
         Method to convert a dict of itemsets to a format that is JSON compatible. 
@@ -197,32 +339,34 @@ class Miner:
         each algorithm accordingly. 
 
         Parameters:
-            itemsets (dict)
+            itemsets (dict): itemsets of item ids as returned by the engine.
             algorithm (class attribute)
+            dataset (class attribute): used to decode the item ids.
 
         Returns:
             itemsets_json_compatible(dict): Containing the new itemsets dict that is now json compatible.
         """
         itemsets_json_compatible = {}
+        decode = self.dataset.decode
 
         if self.algorithm == 'apriori': 
             new_dict = {}
             for key, value in itemsets.items():
                 for itemset, count in value.items():
                     # Join the tuple elements with a comma to create a string key instead of tuple which is returned by default by apriori()
-                    itemset_key = ','.join(itemset)
+                    itemset_key = ','.join(decode(itemset))
                     new_dict[itemset_key] = count
             itemsets_json_compatible = new_dict
         elif self.algorithm == 'fpgrowth': 
             new_dict = {}
             for key, value in itemsets.items():
-                itemset_key = ','.join(key)
+                itemset_key = ','.join(decode(key))
                 new_dict[itemset_key] = value
             itemsets_json_compatible = new_dict
         elif self.algorithm == 'apriori-ceri':
             new_dict = {}
             for key, value in itemsets.items():
-                itemset_key = ', '.join(sorted(key))
+                itemset_key = ', '.join(decode(sorted(key)))
                 new_dict[itemset_key] = value
             itemsets_json_compatible = new_dict
 
@@ -239,9 +383,10 @@ class Miner:
         algorithms in the same format.
 
         Parameters:
-            itemsets (dict)
-            rules (dict)
+            itemsets (dict): itemsets of item ids as returned by the engine.
+            rules (dict): rules of item ids as returned by the engine.
             algorithm (class attribute)
+            dataset (class attribute): used to decode the item ids.
 
         Methods: 
             self.calculate_lift(): external libraries such as pyfpgrowth do not produce this metric. Must be calculated using class method.
@@ -251,18 +396,26 @@ class Miner:
             rule_results(dict): Containing the new itemsets dict that is now json compatible.
         """
         rule_results = []
+        decode = self.dataset.decode
 
         if self.algorithm == 'apriori': 
             for rule in rules: 
+                if self.budget is not None:
+                    self.budget.tick()
                 confidence = rule.confidence
                 support = rule.support
                 lift = rule.lift
                 conviction = 1 if rule.conviction == float('inf') else rule.conviction
+                lhs_list = decode(rule.lhs)
+                rhs_list = decode(rule.rhs)
+
+                # Same format as str(rule), which would print the item ids
+                rule_str = f"{{{', '.join(lhs_list)}}} -> {{{', '.join(rhs_list)}}} (conf: {confidence:.3f}, supp: {support:.3f}, lift: {lift:.3f}, conv: {rule.conviction:.3f})"
 
                 result = {
-                    "rule": str(rule), # Rule will be in the format Beer -> Wine. If Beer is bought, then it is likely that Wine is also bought.
-                    "lhs": rule.lhs, # Antecedent (IF part of the rule) = Beer in the above case
-                    "rhs": rule.rhs, # Consequent (THEN part of the rule) = Wine in the above case
+                    "rule": rule_str, # Rule will be in the format Beer -> Wine. If Beer is bought, then it is likely that Wine is also bought.
+                    "lhs": lhs_list, # Antecedent (IF part of the rule) = Beer in the above case
+                    "rhs": rhs_list, # Consequent (THEN part of the rule) = Wine in the above case
                     "confidence": confidence, # confidence measures the reliability of a rule. It is the proportion of transactions containing A that also contains B. Set a threshold for this.
                     "support": support, # how often the items occur in the rule together in the set of data. Higher support = relevant
                     "lift": lift, # Shows strength of association. Lift < 1 = B is less likely to be bought with A, Lift > 1 = B more likely to be bought with A, Lift of 1 = independent
@@ -273,16 +426,19 @@ class Miner:
                 
         elif self.algorithm == 'fpgrowth' or self.algorithm == 'apriori-ceri':
             for lhs, (rhs, confidence) in rules.items():
+                # The rules of a truncated run were already generated within the budget
+                if self.budget is not None and not self.truncated:
+                    self.budget.tick()
                 # Calculate support for the rule (you might need to adjust this calculation based on your specific needs)
                 support, lhs_support, rhs_support = self.calculate_support_values(itemsets, lhs, rhs)
 
-                # Convert tuple to list for easier formatting of the rule string.
-                lhs_list = list(lhs)
+                # Decode the item id tuples to lists of items for easier formatting of the rule string.
+                lhs_list = decode(lhs)
                 rhs_list = []
                 if isinstance(rhs, tuple):
-                    rhs_list = list(rhs) 
+                    rhs_list = decode(rhs) 
                 else:
-                    rhs_list = [rhs]                
+                    rhs_list = decode([rhs])                
 
                 # Calculating conviction and lift metrics using class method
                 lift = self.calculate_lift(support, lhs_support, rhs_support)
@@ -371,10 +527,13 @@ class Miner:
 
         FYI if an itemset/rule occurs 10 times out of 100 transactions the support would be 0.1
 
+        Every engine keys its itemsets by sorted tuples, so each count is a single dict lookup
+        instead of a scan over all itemsets.
+
         Parameters:
-            itemsets (dict)
-            lhs (tuple)
-            rhs (tuple)
+            itemsets (dict): sorted itemset tuple -> count.
+            lhs (tuple): sorted items.
+            rhs (tuple): sorted items.
 
         Returns:
             support float: The calculated 'support' value for support(A -> B). 
@@ -387,23 +546,15 @@ class Miner:
             support(B) = transactions(B) / total number of transactions
         """     
         # Calculating total number of transactions first
-        number_of_transactions = len(self.data)
-
-        # combining lhs and rhs to tuple. This is used for calculating 'support(A -> B)'
-        set_union = set(lhs + rhs)
-
-        # Calulating number of times lhs(A), rhs(B) and lhs_rhs(A -> B) occur in itemsets
-        support_count = 0
-        lhs_count = 0
-        rhs_count = 0
-        for itemset in itemsets: 
-            set_itemset = set(itemset)
-            if set_union == set_itemset: 
-                support_count += itemsets[itemset]
-            if lhs == itemset: 
-                lhs_count += itemsets[itemset]
-            if rhs == itemset: 
-                rhs_count += itemsets[itemset]
+        number_of_transactions = len(self.dataset)
+
+        # combining lhs and rhs to a sorted tuple. This is used for calculating 'support(A -> B)'
+        union = tuple(sorted(lhs + rhs))
+
+        # Looking up the number of times lhs(A), rhs(B) and lhs_rhs(A -> B) occur in itemsets, 0 if not frequent
+        support_count = itemsets.get(union, 0)
+        lhs_count = itemsets.get(lhs, 0)
+        rhs_count = itemsets.get(rhs, 0)
         
         # Perform relevelant calculations to get correct support values
         support = support_count / number_of_transactions
@@ -415,8 +566,7 @@ class Miner:
         
             
 
-
-
-
-
-
+# Built-in algorithms, other modules can add their own the same way
+Miner.register_algorithm('apriori', Miner.mine_apriori)
+Miner.register_algorithm('fpgrowth', Miner.mine_fpgrowth)
+Miner.register_algorithm('apriori-ceri', Miner.mine_apriori_ceri)
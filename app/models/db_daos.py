@@ -1,30 +1,45 @@
 import pytz
 import uuid
 from datetime import datetime
+from sqlalchemy import event
 
 from app import db
+from app import migrations
+from app.result_codec import decode_result
 
 class Result(db.Model):
     __tablename__ = 'result'
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Compact integer key used by the foreign keys, the uuid is the public id used by the API
+    id = db.Column(db.Integer, primary_key=True)
+    uuid = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
     count = db.Column(db.Integer, nullable=False, default=1) 
     algorithm = db.Column(db.String(100), nullable=False)
     date_added = db.Column(db.String(100), default=lambda: datetime.now(pytz.timezone('Europe/London')).strftime("%d/%m/%Y, %H:%M:%S"), nullable=False)
 
+    # 'rows' stores itemsets/rules as Itemset, Rule, LHS and RHS rows, 'blob' as one compressed ResultBlob
+    storage = db.Column(db.String(10), nullable=False, default='rows')
+
     # Relationships
     itemsets = db.relationship('Itemset', backref='result', lazy=True, cascade="all, delete-orphan")
     rules = db.relationship('Rule', backref='result', lazy=True, cascade="all, delete-orphan")
+    blob = db.relationship('ResultBlob', backref='result', lazy=True, uselist=False, cascade="all, delete-orphan")
 
     def to_dict(self): 
-        # Convert each LHS object to a dictionary and add it to the lhs list
-        itemsets_list = [item.to_dict() for item in self.itemsets]
-        
-        # Convert each RHS object to a dictionary and add it to the rhs list
-        rules_list = [item.to_dict() for item in self.rules]
+        if self.storage == 'blob':
+            # Blob results are only decoded when they are read, the dict has the same shape as rows results
+            decoded = self.blob.decode()
+            itemsets_list = decoded['itemsets']
+            rules_list = decoded['rules']
+        else:
+            # Convert each LHS object to a dictionary and add it to the lhs list
+            itemsets_list = [item.to_dict() for item in self.itemsets]
+            
+            # Convert each RHS object to a dictionary and add it to the rhs list
+            rules_list = [item.to_dict() for item in self.rules]
 
         return {
-            'id': self.id, 
+            'id': self.uuid, 
             'count': self.count, 
             'algorithm': self.algorithm, 
             'date_added': self.date_added,
@@ -32,15 +47,20 @@ class Result(db.Model):
             'rules': rules_list,
         }
 
+@event.listens_for(Result.__table__, "after_create")
+def stamp_schema_version(target, connection, **kwargs):
+    # A 'result' table created by db.create_all() has the latest schema, whether or not migrations.upgrade() ran first
+    migrations.set_schema_version(connection, migrations.SCHEMA_VERSION)
+
 class Itemset(db.Model):
     __tablename__ = 'itemset'
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.Integer, primary_key=True)
     items = db.Column(db.String(1000), nullable=False)
     count = db.Column(db.Integer, nullable=False)
 
     # Relationships
-    result_id = db.Column(db.Integer, db.ForeignKey('result.id'), nullable=False)
+    result_id = db.Column(db.Integer, db.ForeignKey('result.id'), nullable=False, index=True)
 
     def to_dict(self):
         return {
@@ -52,15 +72,17 @@ class Itemset(db.Model):
 class Rule(db.Model):
     __tablename__ = 'rule'
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.Integer, primary_key=True)
     confidence = db.Column(db.Float, nullable=False)
     conviction = db.Column(db.Float, nullable=False)
     lift = db.Column(db.Float, nullable=False)
     support = db.Column(db.Float, nullable=False)
     rule = db.Column(db.String(1000), nullable=False)
+    # hash_rule_key of the sorted lhs/rhs items (see app/result_codec.py), used to compare results
+    rule_key = db.Column(db.BigInteger)
 
     # Relationships
-    result_id = db.Column(db.Integer, db.ForeignKey('result.id'), nullable=False)
+    result_id = db.Column(db.Integer, db.ForeignKey('result.id'), nullable=False, index=True)
 
     lhs = db.relationship('LHS', backref='rule', lazy=True, cascade="all, delete-orphan")
     rhs = db.relationship('RHS', backref='rule', lazy=True, cascade="all, delete-orphan")
@@ -86,11 +108,11 @@ class Rule(db.Model):
 class LHS(db.Model):
     __tablename__ = 'lhs'
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.Integer, primary_key=True)
     item = db.Column(db.String(200), nullable=False)
 
     # Relationships
-    rule_id = db.Column(db.Integer, db.ForeignKey('rule.id'), nullable=False)
+    rule_id = db.Column(db.Integer, db.ForeignKey('rule.id'), nullable=False, index=True)
 
     def to_dict(self):
         return {
@@ -101,11 +123,11 @@ class LHS(db.Model):
 class RHS(db.Model):
     __tablename__ = 'rhs'
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.Integer, primary_key=True)
     item = db.Column(db.String(200), nullable=False)
 
     # Relationships
-    rule_id = db.Column(db.Integer, db.ForeignKey('rule.id'), nullable=False)
+    rule_id = db.Column(db.Integer, db.ForeignKey('rule.id'), nullable=False, index=True)
 
     def to_dict(self):
         return {
@@ -113,7 +135,18 @@ class RHS(db.Model):
             'item': self.item,
         }
 
+class ResultBlob(db.Model):
+    __tablename__ = 'result_blob'
 
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False) # see app/result_codec.py for the layout
 
-
-
+    # Relationships
+    result_id = db.Column(db.Integer, db.ForeignKey('result.id'), nullable=False, unique=True, index=True)
+
+    def decode(self):
+        # Decoded once per instance, a result read twice in a request is not decompressed twice
+        decoded = getattr(self, '_decoded', None)
+        if decoded is None:
+            decoded = self._decoded = decode_result(self.data)
+        return decoded
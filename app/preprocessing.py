@@ -0,0 +1,41 @@
+def drop_duplicate_items(transactions):
+    """
+    Function that drops duplicate items from each transaction while keeping the original item
+    order. Used for third-party engines whose output order depends on the order items are scanned
+    in. The transactions are returned as they are (not copied) if no transaction has duplicates.
+
+    Parameters:
+        transactions (2d list)
+
+    Returns:
+        list: the transactions without duplicate items.
+    """
+    if all(len(set(transaction)) == len(transaction) for transaction in transactions):
+        return transactions
+    return [list(dict.fromkeys(transaction)) for transaction in transactions]
+
+def compress_transactions(transactions):
+    """
+    Function that collapses identical transactions into (transaction, weight) pairs. Each
+    transaction is canonicalised as a frozenset first so baskets with the same items in a
+    different order (or with repeated items) are counted as the same transaction. The weight is
+    the number of rows the pair stands for, so every counting loop can add the weight once instead
+    of scanning each identical row separately. Pairs are returned in the order they were first seen.
+
+    Parameters:
+        transactions (2d list)
+
+    Returns:
+        tuple: list of unique transactions (frozensets) and a list of their weights (int).
+
+    Example:
+        transactions, weights = compress_transactions([['Beer', 'Diapers'], ['Diapers', 'Beer'], ['Milk']])
+        transactions // [frozenset({'Beer', 'Diapers'}), frozenset({'Milk'})]
+        weights // [2, 1]
+    """
+    counts = {}
+    for transaction in transactions:
+        key = frozenset(transaction)
+        counts[key] = counts.get(key, 0) + 1
+
+    return list(counts), list(counts.values())
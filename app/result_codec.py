@@ -0,0 +1,179 @@
+import hashlib
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+# Version of the blob layout, stored in the header so older blobs can still be decoded
+BLOB_VERSION = 2
+
+# Columns of a blob: name -> array typecode ('I' = uint32 string/offset indexes, 'q' = int64, 'd' = float64)
+COLUMNS = (
+    ("itemset_items", "I"),
+    ("itemset_counts", "q"),
+    ("lhs_offsets", "I"),
+    ("lhs_items", "I"),
+    ("rhs_offsets", "I"),
+    ("rhs_items", "I"),
+    ("confidence", "d"),
+    ("conviction", "d"),
+    ("lift", "d"),
+    ("support", "d"),
+    ("rule_keys", "q"), # version 2
+)
+
+def hash_rule_key(lhs, rhs):
+    """
+    Function that hashes the canonical key of a rule, its sorted antecedent and consequent items,
+    to a signed 64 bit integer. The key is stored with every rule when a result is written so rules
+    of two results can be joined without comparing item lists (see app/result_diff.py). Item order
+    does not change the key.
+
+    Parameters:
+        lhs (list): items of the antecedent.
+        rhs (list): items of the consequent.
+
+    Returns:
+        int: key in the range of an SQLite INTEGER.
+
+    Example:
+        hash_rule_key(['Milk', 'Bread'], ['Butter']) == hash_rule_key(['Bread', 'Milk'], ['Butter']) // True
+    """
+    canonical = json.dumps([sorted(lhs), sorted(rhs)], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(canonical, digest_size=8).digest(), "little", signed=True)
+
+def encode_result(itemsets, rules, level=6):
+    """
+    Function that encodes the itemsets and rules of a mining result as one compressed columnar
+    blob. Every distinct string (items and itemset strings) is stored once in a string dictionary
+    and referenced by index. Rule antecedents/consequents are stored as offsets into flat index
+    arrays, counts and metrics as typed arrays. The rule strings are kept as they are so a decoded
+    result is identical to the rows storage.
+
+    Layout (before zlib): 4 byte header length, JSON header (version, byte order, column lengths,
+    string dictionary, rule strings), then the raw bytes of every column in COLUMNS order. Each rule
+    also stores its hash_rule_key.
+
+    Parameters:
+        itemsets (dict): itemset string -> count, as produced by the Miner class.
+        rules (list): rule dicts containing 'lhs', 'rhs', 'rule', 'confidence', 'conviction', 'lift' and 'support'.
+        level (int): zlib compression level.
+
+    Returns:
+        bytes: the compressed blob.
+
+    Example:
+        data = encode_result({'Beer': 3}, [])
+        decode_result(data) // {'itemsets': [{'id': 1, 'items': 'Beer', 'count': 3}], 'rules': []}
+    """
+    strings = {}
+    def intern(value):
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    columns = {name: array(typecode) for name, typecode in COLUMNS}
+    for items, count in itemsets.items():
+        columns["itemset_items"].append(intern(items))
+        columns["itemset_counts"].append(count)
+
+    columns["lhs_offsets"].append(0)
+    columns["rhs_offsets"].append(0)
+    for rule in rules:
+        for side in ("lhs", "rhs"):
+            columns[f"{side}_items"].extend(intern(item) for item in rule[side])
+            columns[f"{side}_offsets"].append(len(columns[f"{side}_items"]))
+        for metric in ("confidence", "conviction", "lift", "support"):
+            columns[metric].append(rule[metric])
+        columns["rule_keys"].append(hash_rule_key(rule["lhs"], rule["rhs"]))
+
+    header = json.dumps({
+        "version": BLOB_VERSION,
+        "byteorder": sys.byteorder,
+        "lengths": [len(columns[name]) for name, _ in COLUMNS],
+        "strings": list(strings),
+        "rules": [rule["rule"] for rule in rules],
+    }).encode("utf-8")
+
+    body = b"".join(columns[name].tobytes() for name, _ in COLUMNS)
+    return zlib.compress(struct.pack("<I", len(header)) + header + body, level)
+
+def decode_columns(data):
+    """
+    Function that decompresses a blob into its header and columns.
+
+    Parameters:
+        data (bytes): blob produced by encode_result.
+
+    Returns:
+        tuple: header (dict) and columns (dict of name -> array). Columns added by a later version
+        of the layout are empty for older blobs.
+
+    Error handling:
+        Raises a ValueError if the blob was written by a newer version of the layout.
+    """
+    raw = zlib.decompress(data)
+    header_length = struct.unpack_from("<I", raw)[0]
+    header = json.loads(raw[4:4 + header_length])
+    if header["version"] > BLOB_VERSION:
+        raise ValueError(f"Result blob version {header['version']} is not supported.")
+
+    columns = {}
+    position = 4 + header_length
+    for (name, typecode), length in zip(COLUMNS, header["lengths"]):
+        column = array(typecode)
+        size = length * column.itemsize
+        column.frombytes(raw[position:position + size])
+        if header["byteorder"] != sys.byteorder:
+            column.byteswap()
+        columns[name] = column
+        position += size
+    for name, typecode in COLUMNS[len(header["lengths"]):]:
+        columns[name] = array(typecode)
+
+    return header, columns
+
+def decode_result(data):
+    """
+    Function that decodes a blob into the 'itemsets' and 'rules' lists of Result.to_dict(). Rows
+    of a blob have no database ids, so the ids are their 1-based position within the result
+    (lhs/rhs ids count across all rules of the result).
+
+    Parameters:
+        data (bytes): blob produced by encode_result.
+
+    Returns:
+        dict: containing 'itemsets' and 'rules' in the to_dict format.
+    """
+    header, columns = decode_columns(data)
+    strings = header["strings"]
+
+    itemsets = [
+        {'id': position, 'items': strings[items], 'count': count}
+        for position, (items, count) in enumerate(zip(columns["itemset_items"], columns["itemset_counts"]), start=1)
+    ]
+
+    rules = []
+    side_ids = {"lhs": 0, "rhs": 0}
+    for position, rule in enumerate(header["rules"]):
+        sides = {}
+        for side in ("lhs", "rhs"):
+            offsets = columns[f"{side}_offsets"]
+            items = columns[f"{side}_items"][offsets[position]:offsets[position + 1]]
+            sides[side] = [{'id': side_ids[side] + number, 'item': strings[item]} for number, item in enumerate(items, start=1)]
+            side_ids[side] += len(items)
+
+        rules.append({
+            'id': position + 1,
+            'confidence': columns["confidence"][position],
+            'conviction': columns["conviction"][position],
+            'lift': columns["lift"][position],
+            'support': columns["support"][position],
+            'rule': rule,
+            'lhs': sides["lhs"],
+            'rhs': sides["rhs"],
+        })
+
+    return {'itemsets': itemsets, 'rules': rules}
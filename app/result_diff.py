@@ -0,0 +1,167 @@
+from app import db
+from app.result_codec import decode_columns, hash_rule_key
+
+# Rule metrics compared between two results
+DIFF_METRICS = ("confidence", "conviction", "lift", "support")
+
+# Rule ids per query when the lhs/rhs items of rows results are read
+SIDES_QUERY_SIZE = 500
+
+class RuleTable:
+    def __init__(self, rules, read_sides):
+        """
+        Constructor method to initialise a RuleTable: the rules of one result keyed by their
+        hash_rule_key, with only the columns needed to compare them. The rule strings and lhs/rhs
+        items are only read for the rules that end up in a diff. Use 'from_result' to build one.
+
+        Parameters:
+            rules (dict): rule key -> (position, confidence, conviction, lift, support). The position
+                is the rule id for rows storage and the index of the rule for blob storage.
+            read_sides (function): takes a list of positions and returns a dict of position -> (rule
+                string, lhs, rhs).
+        """
+        self.rules = rules
+        self.read_sides = read_sides
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Class method that reads the rules of a result stored as rows or as a blob. Rows are read
+        with one query on the indexed result_id, blobs are decoded once. Keys missing from rules
+        written before keys were stored are computed from their items.
+
+        Parameters:
+            result (Result)
+
+        Returns:
+            RuleTable
+        """
+        if result.storage == "blob":
+            return cls.from_blob(result.blob.data)
+        return cls.from_rows(result.id)
+
+    @classmethod
+    def from_rows(cls, result_id):
+        """
+        Class method that reads the rules of a result stored as rows, see from_result.
+        """
+        from app.models.db_daos import Rule, LHS, RHS
+
+        # Run on the Core connection of the session, ORM row processing would take most of the time
+        connection = db.session.connection()
+        rows = connection.execute(
+            db.select(Rule.rule_key, Rule.id, Rule.confidence, Rule.conviction, Rule.lift, Rule.support)
+            .where(Rule.result_id == result_id).order_by(Rule.id)
+        ).all()
+
+        def read_sides(rule_ids):
+            # Rule strings and items are read by id, only for the rules of the diff
+            sides = {rule_id: ([], []) for rule_id in rule_ids}
+            strings = {}
+            rule_ids = sorted(rule_ids)
+            for start in range(0, len(rule_ids), SIDES_QUERY_SIZE):
+                chunk = rule_ids[start:start + SIDES_QUERY_SIZE]
+                strings.update(connection.execute(db.select(Rule.id, Rule.rule).where(Rule.id.in_(chunk))).all())
+                for position, side in enumerate((LHS, RHS)):
+                    for rule_id, item in connection.execute(db.select(side.rule_id, side.item).where(side.rule_id.in_(chunk)).order_by(side.id)):
+                        sides[rule_id][position].append(item)
+            return {rule_id: (strings[rule_id], lhs, rhs) for rule_id, (lhs, rhs) in sides.items()}
+
+        missing = [row[1] for row in rows if row[0] is None]
+        computed = {rule_id: hash_rule_key(lhs, rhs) for rule_id, (_, lhs, rhs) in read_sides(missing).items()} if missing else {}
+        rules = {computed[row[1]] if row[0] is None else row[0]: tuple(row[1:]) for row in rows}
+        return cls(rules, read_sides)
+
+    @classmethod
+    def from_blob(cls, data):
+        """
+        Class method that reads the rules of a result stored as a blob, see from_result.
+        """
+        header, columns = decode_columns(data)
+        strings = header["strings"]
+        rule_strings = header["rules"]
+
+        def side_items(side, position):
+            offsets = columns[f"{side}_offsets"]
+            return [strings[index] for index in columns[f"{side}_items"][offsets[position]:offsets[position + 1]]]
+
+        def read_sides(positions):
+            return {position: (rule_strings[position], side_items("lhs", position), side_items("rhs", position)) for position in positions}
+
+        keys = columns["rule_keys"]
+        if len(keys) != len(rule_strings):
+            # Version 1 blobs have no keys
+            keys = [hash_rule_key(side_items("lhs", position), side_items("rhs", position)) for position in range(len(rule_strings))]
+
+        metrics = zip(*(columns[metric] for metric in DIFF_METRICS))
+        rules = {key: (position, *values) for position, (key, values) in enumerate(zip(keys, metrics))}
+        return cls(rules, read_sides)
+
+def diff_results(result_a, result_b, thresholds=None):
+    """
+    Function that compares the rules of two results. Rules are joined on their hash_rule_key (sorted
+    lhs and sorted rhs items), so rules with the same items match whatever their order or storage.
+    Only the delta is returned: rules only in 'b' (added), rules only in 'a' (removed) and rules in
+    both whose metrics changed.
+
+    Parameters:
+        result_a (Result): the older result.
+        result_b (Result): the newer result.
+        thresholds (dict, optional): metric -> minimum absolute change. A rule in both results is
+            'changed' if any of these metrics changed by at least its threshold. Without thresholds
+            any change of any metric counts.
+
+    Returns:
+        dict: 'summary' (number of added, removed, changed and unchanged rules), and the 'added',
+        'removed' and 'changed' rules. Added and removed rules have their items and metrics, changed
+        rules have the metrics of both results in 'before' and 'after' and the difference in 'change'.
+        Rules are in the order of the result they come from ('b' for changed rules).
+
+    Example:
+        diff_results(last_week, this_week, thresholds={'lift': 0.5})
+    """
+    table_a, table_b = RuleTable.from_result(result_a), RuleTable.from_result(result_b)
+    rules_a, rules_b = table_a.rules, table_b.rules
+
+    # Positions of DIFF_METRICS in the rule tuples
+    columns = {metric: index for index, metric in enumerate(DIFF_METRICS, start=1)}
+    checked = [(columns[metric], threshold) for metric, threshold in thresholds.items()] if thresholds else None
+
+    changed = []
+    unchanged = 0
+    for key in rules_a.keys() & rules_b.keys():
+        before, after = rules_a[key], rules_b[key]
+        if checked is None:
+            is_changed = before[1:] != after[1:]
+        else:
+            is_changed = any(abs(after[column] - before[column]) >= threshold for column, threshold in checked)
+        if is_changed:
+            changed.append(key)
+        else:
+            unchanged += 1
+
+    added = sorted(rules_b.keys() - rules_a.keys(), key=lambda key: rules_b[key][0])
+    removed = sorted(rules_a.keys() - rules_b.keys(), key=lambda key: rules_a[key][0])
+    changed.sort(key=lambda key: rules_b[key][0])
+
+    def format_rules(table, keys):
+        sides = table.read_sides([table.rules[key][0] for key in keys])
+        formatted = []
+        for key in keys:
+            position, *values = table.rules[key]
+            rule, lhs, rhs = sides[position]
+            formatted.append({'rule': rule, 'lhs': lhs, 'rhs': rhs, **dict(zip(DIFF_METRICS, values))})
+        return formatted
+
+    changed_rules = format_rules(table_b, changed)
+    for key, formatted in zip(changed, changed_rules):
+        before = dict(zip(DIFF_METRICS, rules_a[key][1:]))
+        after = {metric: formatted.pop(metric) for metric in DIFF_METRICS}
+        formatted.update({'before': before, 'after': after, 'change': {metric: after[metric] - before[metric] for metric in DIFF_METRICS}})
+
+    return {
+        'summary': {'added': len(added), 'removed': len(removed), 'changed': len(changed), 'unchanged': unchanged},
+        'added': format_rules(table_b, added),
+        'removed': format_rules(table_a, removed),
+        'changed': changed_rules,
+    }
@@ -0,0 +1,229 @@
+import csv
+import io
+import json
+
+from app import db
+from app.result_codec import decode_columns
+
+# Export formats -> (mimetype, file extension). 'arrow' is the Arrow IPC streaming format.
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Columns of each exported table: (name, type). 'list' columns hold the items of a rule side.
+EXPORT_TABLES = {
+    "rules": (
+        ("id", "int64"), ("rule", "string"), ("lhs", "list"), ("rhs", "list"),
+        ("confidence", "float64"), ("conviction", "float64"), ("lift", "float64"), ("support", "float64"),
+    ),
+    "itemsets": (("id", "int64"), ("items", "string"), ("count", "int64")),
+}
+
+def get_pyarrow():
+    """
+    Function that imports the optional pyarrow package, needed for the 'arrow' and 'parquet' formats.
+
+    Returns:
+        module | None: pyarrow, or None if it is not installed.
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+def iter_column_chunks(result, table, chunk_size):
+    """
+    Function that reads the itemsets or rules of a result in chunks of 'chunk_size' rows. Each chunk
+    is a tuple of columns in the order of EXPORT_TABLES[table], so no per-row dicts are built. Rows
+    storage is paged by id (keyset pagination), each page is one query per table. Blob storage is
+    decoded once and sliced. Ids are the same as in Result.to_dict().
+
+    Parameters:
+        result (Result): result to export.
+        table (str): 'rules' or 'itemsets'.
+        chunk_size (int)
+
+    Returns:
+        generator: tuples of columns (lists).
+    """
+    if result.storage == "blob":
+        return iter_blob_chunks(result.blob.data, table, chunk_size)
+    return iter_row_chunks(result.id, table, chunk_size)
+
+def iter_row_chunks(result_id, table, chunk_size):
+    """
+    Function that pages through the rows of a result stored as rows, see iter_column_chunks.
+    """
+    from app.models.db_daos import Itemset, Rule, LHS, RHS
+
+    model = Rule if table == "rules" else Itemset
+    columns = [Rule.id, Rule.rule, Rule.confidence, Rule.conviction, Rule.lift, Rule.support] if table == "rules" else [Itemset.id, Itemset.items, Itemset.count]
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(*columns).where(model.result_id == result_id, model.id > last_id).order_by(model.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        chunk = [list(column) for column in zip(*rows)]
+        last_id = chunk[0][-1]
+
+        if table == "rules":
+            ids = chunk[0]
+            position = {rule_id: index for index, rule_id in enumerate(ids)}
+            sides = []
+            for side in (LHS, RHS):
+                # Read by the id range of the page, the join skips rules of other results inside the range
+                items = [[] for _ in ids]
+                side_rows = db.session.execute(
+                    db.select(side.rule_id, side.item).join(Rule, Rule.id == side.rule_id)
+                    .where(Rule.result_id == result_id, side.rule_id.between(ids[0], ids[-1]))
+                    .order_by(side.rule_id, side.id)
+                )
+                for rule_id, item in side_rows:
+                    items[position[rule_id]].append(item)
+                sides.append(items)
+            chunk = [chunk[0], chunk[1], sides[0], sides[1]] + chunk[2:]
+
+        yield tuple(chunk)
+        if len(rows) < chunk_size:
+            return
+
+def iter_blob_chunks(data, table, chunk_size):
+    """
+    Function that slices the columns of a result stored as a blob, see iter_column_chunks.
+    """
+    header, columns = decode_columns(data)
+    strings = header["strings"]
+
+    if table == "itemsets":
+        items, counts = columns["itemset_items"], columns["itemset_counts"]
+        for start in range(0, len(items), chunk_size):
+            end = min(start + chunk_size, len(items))
+            yield (list(range(start + 1, end + 1)), [strings[index] for index in items[start:end]], counts[start:end].tolist())
+        return
+
+    rule_strings = header["rules"]
+    for start in range(0, len(rule_strings), chunk_size):
+        end = min(start + chunk_size, len(rule_strings))
+        sides = []
+        for side in ("lhs", "rhs"):
+            offsets, side_items = columns[f"{side}_offsets"], columns[f"{side}_items"]
+            sides.append([[strings[index] for index in side_items[offsets[position]:offsets[position + 1]]] for position in range(start, end)])
+        metrics = [columns[metric][start:end].tolist() for metric in ("confidence", "conviction", "lift", "support")]
+        yield tuple([list(range(start + 1, end + 1)), rule_strings[start:end], sides[0], sides[1]] + metrics)
+
+class ChunkSink:
+    def __init__(self):
+        """
+        Write-only file object that keeps what is written until it is drained, so the output of a
+        pyarrow writer can be streamed out chunk by chunk instead of being built in memory.
+        """
+        self.buffers = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.buffers.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self):
+        data = b"".join(self.buffers)
+        self.buffers = []
+        return data
+
+def export_csv(chunks, table):
+    """
+    Function that writes column chunks as CSV text, starting with a header row.
+    """
+    columns = EXPORT_TABLES[table]
+    lists = [index for index, (_, kind) in enumerate(columns) if kind == "list"]
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(name for name, _ in columns)
+    yield output.getvalue()
+
+    for chunk in chunks:
+        output.seek(0)
+        output.truncate()
+        # List columns are written as JSON arrays as items can contain commas
+        chunk = list(chunk)
+        for index in lists:
+            chunk[index] = [json.dumps(items) for items in chunk[index]]
+        writer.writerows(zip(*chunk))
+        yield output.getvalue()
+
+def export_pyarrow(chunks, table, file_format):
+    """
+    Function that writes column chunks as an Arrow IPC stream or a Parquet file with pyarrow.
+    """
+    pyarrow = get_pyarrow()
+    types = {"int64": pyarrow.int64(), "float64": pyarrow.float64(), "string": pyarrow.string(), "list": pyarrow.list_(pyarrow.string())}
+    schema = pyarrow.schema([(name, types[kind]) for name, kind in EXPORT_TABLES[table]])
+
+    sink = ChunkSink()
+    # Each chunk becomes one Arrow record batch or one Parquet row group
+    if file_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    try:
+        for chunk in chunks:
+            writer.write_batch(pyarrow.record_batch([pyarrow.array(column, type=field.type) for column, field in zip(chunk, schema)], schema=schema))
+            yield sink.drain()
+    finally:
+        # Also runs when the client disconnects and the generator is closed mid-stream
+        writer.close()
+    yield sink.drain()
+
+def export_result(result, table="rules", file_format="csv", chunk_size=10000):
+    """
+    Function that exports the itemsets or rules of a result as a table in CSV, Arrow IPC stream or
+    Parquet format. The rows are read from the DB and written one chunk at a time, so the output can
+    be streamed without holding the table in memory. Rules have 'lhs' and 'rhs' list columns,
+    written as JSON arrays in CSV.
+
+    Parameters:
+        result (Result): result to export.
+        table (str): 'rules' or 'itemsets'.
+        file_format (str): 'csv', 'arrow' or 'parquet'. 'arrow' and 'parquet' need pyarrow.
+        chunk_size (int): rows per chunk (Arrow record batch / Parquet row group).
+
+    Returns:
+        generator: str (csv) or bytes chunks of the file.
+
+    Error handling:
+        Raises a ValueError for an unknown table or format and an ImportError if pyarrow is needed
+        and not installed.
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Table should be one of: {', '.join(EXPORT_TABLES)}.")
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format should be one of: {', '.join(EXPORT_FORMATS)}.")
+    if file_format != "csv" and get_pyarrow() is None:
+        raise ImportError(f"Exporting to {file_format} requires the optional pyarrow package.")
+
+    chunks = iter_column_chunks(result, table, chunk_size)
+    if file_format == "csv":
+        return export_csv(chunks, table)
+    return export_pyarrow(chunks, table, file_format)
@@ -0,0 +1,193 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from app import db
+from app import metrics
+from app.rule_index import rule_index_cache
+
+# Format and timezone of Result.date_added
+DATE_FORMAT = "%d/%m/%Y, %H:%M:%S"
+TIMEZONE = pytz.timezone('Europe/London')
+
+# Results deleted per transaction, keeps the write lock short and the IN lists under SQLite's variable limit
+DELETE_BATCH_SIZE = 500
+
+def delete_results(result_ids):
+    """
+    Function that deletes results and all of their rows with set-based DELETE ... WHERE ... IN
+    statements, children first, instead of loading every child row into the ORM session and
+    deleting it one at a time. Each batch of results is deleted in its own transaction. The rule
+    indexes of the deleted results are dropped from the cache.
+
+    Parameters:
+        result_ids (list): integer ids (Result.id) of the results to delete.
+
+    Returns:
+        dict: number of rows deleted per table.
+
+    Error handling:
+        A failing batch is rolled back and the error is raised. Batches deleted before it stay deleted.
+    """
+    from app.models.db_daos import Result, ResultBlob, Itemset, Rule, LHS, RHS
+
+    deleted = {"lhs": 0, "rhs": 0, "rule": 0, "itemset": 0, "result_blob": 0, "result": 0}
+    result_ids = list(result_ids)
+    for start in range(0, len(result_ids), DELETE_BATCH_SIZE):
+        batch = result_ids[start:start + DELETE_BATCH_SIZE]
+        uuids = db.session.execute(db.select(Result.uuid).where(Result.id.in_(batch))).scalars().all()
+        rule_ids = db.select(Rule.id).where(Rule.result_id.in_(batch))
+
+        statements = (
+            ("lhs", db.delete(LHS).where(LHS.rule_id.in_(rule_ids))),
+            ("rhs", db.delete(RHS).where(RHS.rule_id.in_(rule_ids))),
+            ("rule", db.delete(Rule).where(Rule.result_id.in_(batch))),
+            ("itemset", db.delete(Itemset).where(Itemset.result_id.in_(batch))),
+            ("result_blob", db.delete(ResultBlob).where(ResultBlob.result_id.in_(batch))),
+            ("result", db.delete(Result).where(Result.id.in_(batch))),
+        )
+        try:
+            with metrics.db_write_duration_seconds.time(operation="delete_results"):
+                counts = {}
+                for table, statement in statements:
+                    counts[table] = db.session.execute(statement, execution_options={"synchronize_session": False}).rowcount
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for table, count in counts.items():
+            deleted[table] += count
+            metrics.db_rows_deleted_total.inc(count, table=table)
+        for uuid in uuids:
+            rule_index_cache.invalidate(uuid)
+
+    return deleted
+
+def find_expired_results(max_age_days=None, max_results=None, now=None):
+    """
+    Function that returns the results a retention policy would delete: results older than
+    'max_age_days' and, counting from the newest result, every result beyond 'max_results'.
+
+    Parameters:
+        max_age_days (float, optional): maximum age of a result in days.
+        max_results (int, optional): maximum number of results kept.
+        now (datetime, optional): current time in the Europe/London timezone (naive). Defaults to now.
+
+    Returns:
+        list: integer ids of the expired results, newest first.
+    """
+    from app.models.db_daos import Result
+
+    if max_age_days is None and max_results is None:
+        return []
+
+    # Only the narrow (id, date_added) columns are read. Ids increase with insertion, so newest first is id descending.
+    rows = db.session.execute(db.select(Result.id, Result.date_added).order_by(Result.id.desc())).all()
+
+    expired = set()
+    if max_results is not None:
+        expired.update(result_id for result_id, _ in rows[max_results:])
+
+    if max_age_days is not None:
+        now = now or datetime.now(TIMEZONE).replace(tzinfo=None)
+        cutoff = now - timedelta(days=max_age_days)
+        for result_id, date_added in rows:
+            try:
+                if datetime.strptime(date_added, DATE_FORMAT) < cutoff:
+                    expired.add(result_id)
+            except (TypeError, ValueError):
+                continue # a result with an unreadable date is never expired by age
+
+    return [result_id for result_id, _ in rows if result_id in expired]
+
+def purge_results(max_age_days=None, max_results=None, dry_run=False):
+    """
+    Function that applies a retention policy (see find_expired_results) by deleting the expired
+    results with delete_results.
+
+    Parameters:
+        max_age_days (float, optional)
+        max_results (int, optional)
+        dry_run (bool): only count the expired results.
+
+    Returns:
+        dict: containing 'results' (number of expired results) and 'deleted' (rows deleted per table).
+    """
+    expired = find_expired_results(max_age_days, max_results)
+    deleted = {} if dry_run or not expired else delete_results(expired)
+    # Ends the read transaction of find_expired_results when nothing was deleted
+    db.session.commit()
+    return {"results": len(expired), "deleted": deleted}
+
+class RetentionWorker:
+    def __init__(self, app, interval_seconds, max_age_days=None, max_results=None):
+        """
+        Constructor method to initialise a RetentionWorker. A daemon thread runs purge_results
+        inside an app context every 'interval_seconds' until 'stop' is called. Every process of a
+        multi-worker deployment runs its own worker, which is safe as deletes are idempotent.
+
+        Parameters:
+            app (Flask): The Flask application instance.
+            interval_seconds (float): time between two purges.
+            max_age_days (float, optional)
+            max_results (int, optional)
+        """
+        self.app = app
+        self.interval_seconds = interval_seconds
+        self.max_age_days = max_age_days
+        self.max_results = max_results
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="arm-retention", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        self.thread.join(timeout)
+
+    def run(self):
+        # Waiting first so app startup is not slowed down by a purge
+        while not self.stop_event.wait(self.interval_seconds):
+            self.run_once()
+
+    def run_once(self):
+        """
+        Method that runs one purge. Errors are logged and the worker keeps running.
+
+        Returns:
+            dict | None: the summary of purge_results, or None if it failed.
+        """
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                summary = purge_results(self.max_age_days, self.max_results)
+        except Exception:
+            self.app.logger.exception("Retention purge failed")
+            return None
+
+        if summary["results"]:
+            self.app.logger.info("Retention purge deleted %d results in %.2fs", summary["results"], time.perf_counter() - start)
+        return summary
+
+def init_app(app):
+    """
+    Starts a RetentionWorker if RETENTION_INTERVAL_SECONDS is set and at least one of
+    RETENTION_MAX_AGE_DAYS and RETENTION_MAX_RESULTS is set.
+
+    Parameters:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        RetentionWorker | None: the started worker.
+    """
+    interval = app.config.get("RETENTION_INTERVAL_SECONDS")
+    max_age_days = app.config.get("RETENTION_MAX_AGE_DAYS")
+    max_results = app.config.get("RETENTION_MAX_RESULTS")
+    if not interval or (max_age_days is None and max_results is None):
+        return None
+    return RetentionWorker(app, interval, max_age_days, max_results).start()
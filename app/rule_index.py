@@ -0,0 +1,248 @@
+import threading
+from collections import OrderedDict
+
+from app import db
+from app import metrics
+from app.result_codec import decode_result
+
+class RuleIndex:
+    # Rule metrics recommendations can be ranked by
+    SORT_KEYS = ('lift', 'confidence')
+
+    def __init__(self, rules):
+        """
+        Constructor method to initialise a RuleIndex. The rules of one result are kept in flat lists
+        and an inverted index maps every antecedent (LHS) item to the rules it appears in. A basket
+        lookup only touches the rules of the items in the basket: a rule fires when every one of its
+        antecedent items was hit.
+
+        Parameters:
+            rules (list): dicts with the keys 'lhs', 'rhs' (lists of items), 'confidence', 'lift',
+                'support', 'conviction' and 'rule'.
+
+        Example:
+            index = RuleIndex([{'lhs': ['Beer'], 'rhs': ['Diapers'], 'confidence': 1.0, 'lift': 2.5, ...}])
+            index.recommend(['Beer'], top_n=3) // [{'item': 'Diapers', 'score': 2.5, ...}]
+        """
+        self.rules = rules
+        self.antecedent_sizes = [len(rule['lhs']) for rule in rules]
+        self.consequents = [frozenset(rule['rhs']) for rule in rules]
+        self.ranks = {} # rule ranks per sort metric, see get_ranks
+        self.item_rules = {}
+        for position, rule in enumerate(rules):
+            for item in set(rule['lhs']):
+                self.item_rules.setdefault(item, []).append(position)
+
+    def __len__(self):
+        return len(self.rules)
+
+    @classmethod
+    def from_result(cls, result_id):
+        """
+        Method that builds the index of a result from its Rule, LHS and RHS rows (or its blob). The
+        rows are read with one query per table instead of loading the relationships rule by rule.
+
+        Parameters:
+            result_id (str): public id (uuid) of the result.
+
+        Returns:
+            RuleIndex | None: the index, or None if the result does not exist.
+        """
+        from app.models.db_daos import Result, ResultBlob, Rule, LHS, RHS
+
+        result = db.session.execute(db.select(Result.id, Result.storage).where(Result.uuid == result_id)).first()
+        if result is None:
+            return None
+        result_id, storage = result
+
+        # Blob results hold their rules in one compressed row
+        if storage == 'blob':
+            blob = db.session.execute(db.select(ResultBlob.data).where(ResultBlob.result_id == result_id)).scalar()
+            rules = decode_result(blob)['rules']
+            for rule in rules:
+                rule['lhs'] = [item['item'] for item in rule['lhs']]
+                rule['rhs'] = [item['item'] for item in rule['rhs']]
+            return cls(rules)
+
+        rows = db.session.execute(
+            db.select(Rule.id, Rule.confidence, Rule.conviction, Rule.lift, Rule.support, Rule.rule)
+            .where(Rule.result_id == result_id)
+        ).all()
+
+        rules = {}
+        for rule_id, confidence, conviction, lift, support, rule in rows:
+            rules[rule_id] = {'lhs': [], 'rhs': [], 'confidence': confidence, 'conviction': conviction, 'lift': lift, 'support': support, 'rule': rule}
+
+        for side, model in (('lhs', LHS), ('rhs', RHS)):
+            items = db.session.execute(
+                db.select(model.rule_id, model.item).join(Rule, model.rule_id == Rule.id).where(Rule.result_id == result_id)
+            ).all()
+            for rule_id, item in items:
+                rules[rule_id][side].append(item)
+
+        return cls(list(rules.values()))
+
+    def recommend(self, basket, top_n=5, sort_by='lift'):
+        """
+        Method that returns the top-N consequent items for a basket. Every rule whose antecedent is
+        contained in the basket recommends its consequent items that are not already in the basket.
+        An item recommended by several rules keeps the score of its best rule.
+
+        Parameters:
+            basket (list): items in the basket.
+            top_n (int): maximum number of items returned.
+            sort_by (str): 'lift' or 'confidence'.
+
+        Returns:
+            list: dicts containing 'item', 'score', 'confidence', 'lift', 'support' and 'rule', best first.
+        """
+        basket = set(basket)
+        item_rules = self.item_rules
+
+        # Number of antecedent items of each rule found in the basket
+        hits = {}
+        for item in basket:
+            for position in item_rules.get(item, ()):
+                hits[position] = hits.get(position, 0) + 1
+
+        antecedent_sizes = self.antecedent_sizes
+        fired = [position for position, count in hits.items() if count == antecedent_sizes[position]]
+
+        # Fired rules are walked best first, so the first rule recommending an item holds its best score
+        ranks = self.get_ranks(sort_by)
+        fired.sort(key=ranks.__getitem__)
+        return self.collect(fired, basket, top_n, sort_by)
+
+    def get_ranks(self, sort_by):
+        """
+        Method that returns the rank of every rule when the rules are ordered by 'sort_by' (best
+        first, ties broken by rule order). The ranks are computed once per metric.
+
+        Parameters:
+            sort_by (str): 'lift' or 'confidence'.
+
+        Returns:
+            list: rank of each rule, indexed by rule position.
+        """
+        ranks = self.ranks.get(sort_by)
+        if ranks is None:
+            order = sorted(range(len(self.rules)), key=lambda position: -self.rules[position][sort_by])
+            ranks = [0] * len(order)
+            for rank, position in enumerate(order):
+                ranks[position] = rank
+            self.ranks[sort_by] = ranks
+        return ranks
+
+    def collect(self, fired, basket, top_n, sort_by):
+        """
+        Method that turns the fired rules of a basket into its top-N recommendations. Shared by
+        'recommend' and the batch scorer (see app/batch_scoring.py).
+
+        Parameters:
+            fired (list): positions of the rules whose antecedent is in the basket, best rank first.
+            basket (set): items in the basket, which are never recommended.
+            top_n (int): maximum number of items returned.
+            sort_by (str): 'lift' or 'confidence'.
+
+        Returns:
+            list: dicts containing 'item', 'score', 'confidence', 'lift', 'support' and 'rule', best first.
+        """
+        recommendations = []
+        recommended = set()
+        for position in fired:
+            rule = self.rules[position]
+            for item in sorted(self.consequents[position] - basket - recommended):
+                recommended.add(item)
+                recommendations.append({
+                    'item': item,
+                    'score': rule[sort_by],
+                    'confidence': rule['confidence'],
+                    'lift': rule['lift'],
+                    'support': rule['support'],
+                    'rule': rule['rule'],
+                })
+                if len(recommendations) == top_n:
+                    return recommendations
+        return recommendations
+
+class RuleIndexCache:
+    def __init__(self, max_size=32):
+        """
+        Constructor method to initialise a RuleIndexCache. Rule indexes are kept per result id with
+        least recently used eviction so hot results are served from memory and the process does not
+        grow with the number of stored results. A lock guards the cache as Flask may serve requests
+        on several threads. Indexes are built outside the lock, so every invalidate() bumps a
+        generation counter of the result, and an index whose generation changed while it was being
+        built is returned but not cached.
+
+        Parameters:
+            max_size (int): maximum number of result indexes kept in memory.
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # result id -> number of invalidations, 'cleared' counts clear() calls
+        self.generations = {}
+        self.cleared = 0
+
+    def get(self, result_id, loader=None):
+        """
+        Method that returns the index of a result, building it with 'loader' on a miss. Lookups are
+        recorded in the arm_cache_requests_total metric.
+
+        Parameters:
+            result_id (str): id of the result.
+            loader (callable, optional): builds the index from the result id. Defaults to RuleIndex.from_result.
+
+        Returns:
+            RuleIndex | None: the index, or None if the loader returned None (missing results are not cached).
+        """
+        with self.lock:
+            index = self.entries.get(result_id)
+            if index is not None:
+                self.entries.move_to_end(result_id)
+                metrics.cache_requests_total.inc(cache="rule_index", result="hit")
+                return index
+            generation = (self.cleared, self.generations.get(result_id, 0))
+
+        metrics.cache_requests_total.inc(cache="rule_index", result="miss")
+        index = (loader or RuleIndex.from_result)(result_id)
+        if index is None or self.max_size <= 0:
+            return index
+
+        with self.lock:
+            # The result was invalidated while its index was built, the index may be stale
+            if generation != (self.cleared, self.generations.get(result_id, 0)):
+                return index
+            self.entries[result_id] = index
+            self.entries.move_to_end(result_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return index
+
+    def invalidate(self, result_id):
+        """
+        Method that drops the index of a result, ie. after the result was deleted.
+        """
+        with self.lock:
+            self.entries.pop(result_id, None)
+            self.generations[result_id] = self.generations.get(result_id, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generations.clear()
+            self.cleared += 1
+
+# Shared by every request of the process, sized by RULE_INDEX_CACHE_SIZE in init_app
+rule_index_cache = RuleIndexCache()
+
+def init_app(app):
+    """
+    Sizes the shared rule index cache from the app config.
+
+    Parameters:
+        app (Flask): The Flask application instance.
+    """
+    rule_index_cache.max_size = app.config.get("RULE_INDEX_CACHE_SIZE", 32)
+    rule_index_cache.clear()
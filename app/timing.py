@@ -0,0 +1,121 @@
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+class StageTimer:
+    def __init__(self):
+        """
+        Constructor method to initialise a StageTimer object. The timer records how long each
+        phase (stage) of a request takes so slow requests can be broken down into parsing,
+        validation, mining, rule formatting, DB inserts and serialisation.
+
+        Example:
+            timer = StageTimer()
+            with timer.stage("parse"):
+                data = request.get_json()
+
+            timer.to_dict() // {"stages": {"parse": 0.21}, "total_ms": 0.21}
+        """
+        self.stages = {} # stage name -> duration (ms), kept in the order the stages first ran
+        self.details = {} # extra values recorded by the stages ie. per-level candidate counts
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager that times the code inside it and adds the duration to the stage 'name'.
+        Running the same stage more than once adds the durations together.
+
+        Parameters:
+            name (str): Name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + duration_ms
+
+    def record(self, name, value):
+        """
+        Method that records an extra value alongside the stage timings.
+
+        Parameters:
+            name (str): Key the value is returned under in 'to_dict'.
+            value (Any): JSON compatible value.
+        """
+        self.details[name] = value
+
+    def to_dict(self):
+        """
+        Method that returns the recorded timings in a format that is JSON compatible.
+
+        Returns:
+            dict: containing 'stages' (ms per stage), 'total_ms' and any recorded details.
+        """
+        stages = {name: round(duration, 3) for name, duration in self.stages.items()}
+        result = {
+            "stages": stages,
+            "total_ms": round(sum(duration for name, duration in self.stages.items() if "." not in name), 3),
+        }
+        result.update(self.details)
+        return result
+
+    def server_timing_header(self):
+        """
+        Method that formats the recorded timings as a 'Server-Timing' HTTP header value.
+        Nested stage names (ie. 'mining.rules') are written with '-' as '.' is not a valid token.
+
+        Returns:
+            str: ie. 'parse;dur=0.210, validate;dur=1.022'
+        """
+        return ", ".join(f"{name.replace('.', '-')};dur={duration:.3f}" for name, duration in self.stages.items())
+
+@contextmanager
+def profile_request(directory, name, profiler="cprofile"):
+    """
+    Context manager that profiles the code inside it and writes the result to 'directory'.
+    cProfile is used by default and writes a '.prof' file that can be opened with 'pstats'
+    or snakeviz. If 'profiler' is 'pyinstrument' and the package is installed an '.html'
+    report is written instead.
+
+    Parameters:
+        directory (str): Local directory the profile is written to (created if missing).
+        name (str): Prefix of the file name ie. 'mine'.
+        profiler (str): 'cprofile' or 'pyinstrument'.
+
+    Returns:
+        dict: Populated with the 'path' of the written profile once the block exits.
+    """
+    os.makedirs(directory, exist_ok=True)
+    file_stem = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    capture = {"path": None}
+
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            profiler = "cprofile"
+
+    if profiler == "pyinstrument":
+        instrument = Profiler()
+        instrument.start()
+        try:
+            yield capture
+        finally:
+            instrument.stop()
+            path = os.path.join(directory, f"{file_stem}.html")
+            with open(path, "w") as output:
+                output.write(instrument.output_html())
+            capture["path"] = path
+    else:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield capture
+        finally:
+            profile.disable()
+            path = os.path.join(directory, f"{file_stem}.prof")
+            profile.dump_stats(path)
+            capture["path"] = path
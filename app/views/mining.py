@@ -1,11 +1,24 @@
-from flask import Blueprint, request
+from flask import Blueprint, request, current_app, stream_with_context
 from app import db
 from app.response import Response
 from app.miner import Miner
-from app.models.db_daos import Result, Itemset, Rule, LHS, RHS
+from app.ingestion import EncodedDataset, TransactionValidationError
+from app.apriori_ceri import AprioriCeri
+from app.budget import MiningBudget, BudgetExceededError
+from app.timing import StageTimer, profile_request
+from app.rule_index import RuleIndex, rule_index_cache
+from app import metrics
+from app.models.db_daos import Result, Itemset, Rule, LHS, RHS, ResultBlob
+from app.result_codec import encode_result, hash_rule_key
+from app.result_export import EXPORT_FORMATS, export_result
+from app.result_diff import DIFF_METRICS, diff_results
+from app.retention import delete_results
 
 mining = Blueprint('mining', __name__)
 
+# Ways a mined result can be stored, see Result.storage
+RESULT_STORAGE_MODES = ('rows', 'blob')
+
 @mining.route('/mine', methods=["POST"])
 def mine():
     """
@@ -24,108 +37,231 @@ def mine():
     - Error: If all required data has not been sent in request body.
     - Error: If all required data is not present in request.
     - Error: If required data in request is not of the correct type and format.
-    - Error: If data types in transactions list are not of same type (should all be str).
+    - Error: If data types in transactions list are not of same type (should all be str). The message
+      contains the index of the first invalid transaction.
+    - Error: If the optional 'budget' object is not of the correct format.
+    - Error: If mining goes over its time/candidate/itemset/memory budget and partial results are not allowed.
 
     Note:
+    - support_threshold is a fraction of the number of transactions sent, for every algorithm (0.2 keeps
+      itemsets found in 20% of the transactions). Earlier versions of the API multiplied it by 10 for
+      fpgrowth and apriori-ceri, so it was only a fraction for requests of exactly 10 transactions. Requests with
+      more transactions now get fewer itemsets, requests with fewer get more.
+    - An optional 'budget' object can be sent with the keys max_seconds, max_candidates, max_itemsets,
+      max_rss_mb and allow_partial. Defaults come from the MINING_* app config and can only be tightened.
+      allow_partial (true/false) is only supported by apriori-ceri, which returns the levels mined so far
+      with "truncated": true when a limit is hit. The rules of those levels are generated within a quarter
+      of max_seconds more. MINING_ALLOW_PARTIAL is ignored by the other algorithms.
+    - Optional "timings": true returns per-stage durations (and per-level counts for apriori-ceri) in a
+      'timings' block. The same durations are always sent in the 'Server-Timing' header.
+    - Optional "counting": "trie" (default), "subset" or "bitmap" selects how apriori-ceri counts candidates.
+      "bitmap" splits big levels across MINING_PROCESSES worker processes.
+    - Optional "storage": "rows" or "blob" stores the result as normalised rows or as one compressed
+      blob. Defaults to RESULT_STORAGE. Both return the same JSON.
+    - Optional "profile": true writes a cProfile/pyinstrument capture to PROFILE_DIR if it is configured.
     - More information on this API endpoint can be found in the API documentation and report
       that accompanies this code.
     """
 
+    timer = StageTimer()
+
     # Get JSON data from request
-    data = request.get_json()
+    with timer.stage("parse"):
+        data = request.get_json()
 
-    # Checking all required data has been sent
-    required_keys = ["algorithm", "transactions", "support_threshold", "confidence_threshold"]
-    
-    # Validating all required data is present in request
-    if not all(key in data for key in required_keys):
-        response_obj_err = Response("You are missing data in the request body. Please ensure all keys are present.")
-        return response_obj_err.return_error_response()
-    
-    # Validating all required data in request is of the correct type and format
-    if not isinstance(data["algorithm"], str) or not isinstance(data["transactions"], list) or not isinstance(data["support_threshold"], float) or not isinstance(data["confidence_threshold"], float):
-        response_obj_err = Response("Data sent in the request is not of the corrrect format.")
-        return response_obj_err.return_error_response()
-    
-    # Validating data types in transactions list are of same type (should all be str).
-    for transaction in data["transactions"]: 
-        if not all(isinstance(item, str) for item in transaction):
-            response_obj_err = Response("All transactions in the list should be of data type string.")
+    # Opt-in cProfile/pyinstrument capture, only honoured when a PROFILE_DIR is configured
+    profile_dir = current_app.config.get("PROFILE_DIR")
+    if profile_dir and isinstance(data, dict) and data.get("profile") is True:
+        with profile_request(profile_dir, "mine", current_app.config.get("PROFILER", "cprofile")) as capture:
+            response = mine_transactions(data, timer)
+        current_app.logger.info("Profile for /mine written to %s", capture["path"])
+        return response
+
+    return mine_transactions(data, timer)
+
+def mine_transactions(data, timer):
+    """
+    Validates the request body of the 'mine' view, mines association rules and saves the result to
+    the database. Every phase is timed on 'timer' and the timings are returned in the 'Server-Timing'
+    header and, if the request sets "timings": true, in a 'timings' block of the response data.
+
+    Parameters:
+        data (dict): JSON body of the request.
+        timer (StageTimer): timer the request stages are recorded on.
+
+    Returns:
+        tuple: JSON response and HTTP status code.
+    """
+    with timer.stage("validate"):
+        # Checking all required data has been sent
+        required_keys = ["algorithm", "transactions", "support_threshold", "confidence_threshold"]
+        
+        # Validating all required data is present in request
+        if not all(key in data for key in required_keys):
+            response_obj_err = Response("You are missing data in the request body. Please ensure all keys are present.")
             return response_obj_err.return_error_response()
-    
+        
+        # Validating all required data in request is of the correct type and format
+        if not isinstance(data["algorithm"], str) or not isinstance(data["transactions"], list) or not isinstance(data["support_threshold"], float) or not isinstance(data["confidence_threshold"], float):
+            response_obj_err = Response("Data sent in the request is not of the corrrect format.")
+            return response_obj_err.return_error_response()
+        
+        # Validating data types in transactions list are of same type (should all be str). The items are
+        # interned to integer ids in the same pass and the encoded dataset is shared by the engines.
+        try:
+            dataset = EncodedDataset.from_transactions(data["transactions"])
+        except TransactionValidationError as e:
+            response_obj_err = Response(str(e))
+            return response_obj_err.return_error_response()
+        
+        # Validating the optional candidate counting method used by apriori-ceri
+        counting = data.get("counting", "trie")
+        if counting not in AprioriCeri.COUNTING_METHODS:
+            response_obj_err = Response(f"Counting method should be one of: {', '.join(AprioriCeri.COUNTING_METHODS)}.")
+            return response_obj_err.return_error_response()
+
+        # Validating the optional storage mode of the result
+        storage = data.get("storage", current_app.config.get("RESULT_STORAGE", "rows"))
+        if storage not in RESULT_STORAGE_MODES:
+            response_obj_err = Response(f"Storage should be one of: {', '.join(RESULT_STORAGE_MODES)}.")
+            return response_obj_err.return_error_response()
+
+        # Building the per-request mining budget so one bad request cannot take down the service
+        try:
+            budget = MiningBudget.from_dict(data.get("budget"), MiningBudget.limits_from_config(current_app.config))
+        except ValueError as e:
+            response_obj_err = Response(str(e))
+            return response_obj_err.return_error_response()
+
+        # Only apriori-ceri mines level by level and can return a partial result
+        if data.get("budget") and data["budget"].get("allow_partial") and data["algorithm"] != "apriori-ceri":
+            response_obj_err = Response("Budget value 'allow_partial' is only supported by the apriori-ceri algorithm.")
+            return response_obj_err.return_error_response()
+
     # Creating miner object to handle association rule mining
     algorithm=data["algorithm"]
+    algorithm_label = algorithm if algorithm in Miner.ALGORITHMS else "unknown" # Keeps metric label cardinality bounded
     miner = Miner(
         algorithm=algorithm, 
-        data=data["transactions"], 
+        data=dataset, 
         support_threshold=data["support_threshold"],
         confidence_threshold=data["confidence_threshold"],
+        budget=budget,
+        timer=timer,
+        counting=counting,
+        processes=current_app.config.get("MINING_PROCESSES", 1),
     )
 
-    mine_results = miner.mine_association_rules()
+    try:
+        with timer.stage("mining"), metrics.mining_jobs_in_flight.track_inprogress(), metrics.mining_duration_seconds.time(algorithm=algorithm_label):
+            mine_results = miner.mine_association_rules()
+    except BudgetExceededError as e:
+        metrics.mine_requests_total.inc(algorithm=algorithm_label, outcome="budget_exceeded")
+        response_obj_err = Response(str(e))
+        return response_obj_err.return_error_response()
+    except ValueError as e:
+        metrics.mine_requests_total.inc(algorithm=algorithm_label, outcome="error")
+        raise
+
+    metrics.itemsets_produced.observe(len(mine_results["itemsets"]), algorithm=algorithm_label)
+    metrics.rules_produced.observe(len(mine_results["rules"]), algorithm=algorithm_label)
 
-    data = mine_results
-    itemsets = data["itemsets"]
-    rules = data["rules"]
+    data_mined = mine_results
+    itemsets = data_mined["itemsets"]
+    rules = data_mined["rules"]
 
     result_obj = ''
 
     # Begin a new SQLAlchemy transaction and adding result to DB
-    with db.session.begin():
+    with timer.stage("db_insert"), metrics.db_write_duration_seconds.time(operation="insert_result"), db.session.begin():
 
         result = Result(
             count = 10,
-            algorithm = algorithm
+            algorithm = algorithm,
+            storage = storage,
         )
         db.session.add(result)
-        
-        # Itemsets
-        for key, value in itemsets.items():
-            itemset = Itemset(
-              items = key, 
-              count = value, 
-              result = result, # Setting foreign key 
-            )
-            db.session.add(itemset)
-
-        # Rules
-        for r in rules:               
-            rule = Rule(
-                confidence = r["confidence"], 
-                conviction = r["conviction"], 
-                lift = r["lift"], 
-                support = r["support"],
-                rule = r["rule"],
-                result = result,
-            )
-            db.session.add(rule)
-
-            for x in r["rhs"]:
-                rhs = RHS(
-                    item = x,
-                    rule = rule,
-                )
-                db.session.add(rhs)
 
+        # Blob storage writes the itemsets and rules as one compressed row instead of one row each
+        if storage == "blob":
+            result.blob = ResultBlob(data=encode_result(itemsets, rules))
+        else:
+            # Itemsets
+            for key, value in itemsets.items():
+                itemset = Itemset(
+                  items = key, 
+                  count = value, 
+                  result = result, # Setting foreign key 
+                )
+                db.session.add(itemset)
 
-            for x in r["lhs"]:
-                lhs = LHS(
-                    item = x,
-                    rule = rule,
+            # Rules
+            for r in rules:               
+                rule = Rule(
+                    confidence = r["confidence"], 
+                    conviction = r["conviction"], 
+                    lift = r["lift"], 
+                    support = r["support"],
+                    rule = r["rule"],
+                    rule_key = hash_rule_key(r["lhs"], r["rhs"]),
+                    result = result,
                 )
-                db.session.add(lhs)
+                db.session.add(rule)
+
+                for x in r["rhs"]:
+                    rhs = RHS(
+                        item = x,
+                        rule = rule,
+                    )
+                    db.session.add(rhs)
+
+
+                for x in r["lhs"]:
+                    lhs = LHS(
+                        item = x,
+                        rule = rule,
+                    )
+                    db.session.add(lhs)
 
         result_obj = result
+
+    metrics.db_rows_written_total.inc(1, table="result")
+    if storage == "blob":
+        metrics.db_rows_written_total.inc(1, table="result_blob")
+    else:
+        metrics.db_rows_written_total.inc(len(itemsets), table="itemset")
+        metrics.db_rows_written_total.inc(len(rules), table="rule")
+        metrics.db_rows_written_total.inc(sum(len(r["lhs"]) for r in rules), table="lhs")
+        metrics.db_rows_written_total.inc(sum(len(r["rhs"]) for r in rules), table="rhs")
     
     # Returning JSON body with results from request
-    response_obj = Response("Data mined successfully!", data=result_obj.to_dict())
-    return response_obj.return_success_response()
+    with timer.stage("to_dict"):
+        result_data = result_obj.to_dict()
+
+    message = "Data mined successfully!"
+    if miner.truncated:
+        result_data["truncated"] = True
+        message = "Mining budget exceeded. Returning the levels mined so far."
+
+    if data.get("timings") is True:
+        result_data["timings"] = timer.to_dict()
+
+    response_obj = Response(message, data=result_data)
+    with timer.stage("jsonify"):
+        response, status_code = response_obj.return_success_response()
+
+    if current_app.config.get("SERVER_TIMING_HEADER", True):
+        response.headers["Server-Timing"] = timer.server_timing_header()
+
+    metrics.mine_requests_total.inc(algorithm=algorithm_label, outcome="truncated" if miner.truncated else "success")
+    metrics.mine_request_duration_seconds.observe(sum(duration for name, duration in timer.stages.items() if "." not in name) / 1000, algorithm=algorithm_label)
+    return response, status_code
 
 @mining.route('/results/<string:id>', methods=["GET"])
 def read_result(id):
 
     # Check if result exists in DB based on id
-    result = Result.query.filter_by(id=id).first()
+    result = Result.query.filter_by(uuid=id).first()
     if not result: 
         response_obj_err = Response("Could not find result based on that id.")
         return response_obj_err.return_error_response()
@@ -137,17 +273,202 @@ def read_result(id):
 def delete_result(id):
 
     # Check if result exists in DB based on id
-    result = Result.query.filter_by(id=id).first()
+    result = Result.query.filter_by(uuid=id).first()
     if not result: 
         response_obj_err = Response("Could not find result based on that id.")
         return response_obj_err.return_error_response()
     
-    db.session.delete(result)
-    db.session.commit()
+    # Set-based delete of the result and its rows, also drops its cached rule index
+    delete_results([result.id])
     
     response_obj = Response("Result deleted successfully!")
     return response_obj.return_success_response()
 
+@mining.route('/results/<string:id>/export', methods=["GET"])
+def export_result_table(id):
+    """
+    Exports the rules or itemsets of a stored result as a flat, typed table for analytics tools.
+
+    Request:
+    - Query parameters 'format' ('csv' (default), 'arrow' or 'parquet') and 'table' ('rules' (default)
+      or 'itemsets').
+
+    Returns:
+    - HttpResponse: the table as a file download, streamed. Rules have 'lhs' and 'rhs' list columns
+      (JSON arrays in CSV), otherwise returns an error message.
+
+    Raises:
+    - Error: If the format or table is not supported, or pyarrow is not installed for 'arrow'/'parquet'.
+    - Error: If the result does not exist.
+
+    Note:
+    - Rows are read from the DB in chunks of EXPORT_CHUNK_SIZE (default 10000) and written while the
+      response is streamed, each chunk is one Arrow record batch or Parquet row group.
+    """
+    file_format = request.args.get("format", "csv")
+    table = request.args.get("table", "rules")
+
+    # Check if result exists in DB based on id
+    result = Result.query.filter_by(uuid=id).first()
+    if not result: 
+        response_obj_err = Response("Could not find result based on that id.")
+        return response_obj_err.return_error_response()
+
+    try:
+        output = export_result(result, table=table, file_format=file_format, chunk_size=current_app.config.get("EXPORT_CHUNK_SIZE", 10000))
+    except (ValueError, ImportError) as e:
+        response_obj_err = Response(str(e))
+        return response_obj_err.return_error_response()
+
+    mimetype, extension = EXPORT_FORMATS[file_format]
+    response = current_app.response_class(stream_with_context(output), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{id}-{table}.{extension}"'
+    return response
+
+@mining.route('/results/<string:id>/diff/<string:other_id>', methods=["GET"])
+def diff_result(id, other_id):
+    """
+    Compares the rules of two stored results, ie. last week's and this week's mining run.
+
+    Request:
+    - Optional query parameters 'min_confidence_change', 'min_conviction_change', 'min_lift_change'
+      and 'min_support_change' (non-negative floats). A rule in both results is only reported as
+      changed if one of the given metrics changed by at least that much.
+
+    Returns:
+    - HttpResponse: JSON object containing a 'summary' (number of added, removed, changed and
+      unchanged rules) and the 'added' and 'removed' rules and the 'changed' rules with their metrics
+      'before', 'after' and their 'change', otherwise returns an error message.
+
+    Raises:
+    - Error: If a threshold is not a non-negative number.
+    - Error: If either result does not exist.
+
+    Note:
+    - Rules are matched on their sorted lhs and rhs items using the rule keys stored when the results
+      were written, so only the keys and metrics are read for the join and items are only read for
+      the rules in the delta. Results stored as rows and as blobs can be compared.
+    """
+    # Validating the optional thresholds on metric changes
+    thresholds = {}
+    for metric in DIFF_METRICS:
+        value = request.args.get(f"min_{metric}_change")
+        if value is None:
+            continue
+        try:
+            threshold = float(value)
+        except ValueError:
+            threshold = None
+        if threshold is None or not threshold >= 0: # 'not >=' also rejects nan
+            response_obj_err = Response(f"min_{metric}_change should be a non-negative number.")
+            return response_obj_err.return_error_response()
+        thresholds[metric] = threshold
+
+    # Check if both results exist in DB based on id
+    result_a = Result.query.filter_by(uuid=id).first()
+    result_b = Result.query.filter_by(uuid=other_id).first()
+    if not result_a or not result_b:
+        response_obj_err = Response("Could not find result based on that id.")
+        return response_obj_err.return_error_response()
+
+    diff = diff_results(result_a, result_b, thresholds=thresholds)
+
+    response_obj = Response("Results compared successfully!", data={'a': id, 'b': other_id, **diff})
+    return response_obj.return_success_response()
+
+@mining.route('/results/<string:id>/recommend', methods=["POST"])
+def recommend(id):
+    """
+    Returns the top-N items to recommend for a basket from the rules of a stored result.
+
+    Request:
+    - HttpRequest (JSON): JSON object containing 'basket' (list of str) and optionally 'top_n' (int,
+      default 5) and 'sort_by' ('lift' (default) or 'confidence').
+
+    Returns:
+    - HttpResponse: JSON object containing the recommended items, each with the score and the rule
+      that recommended it, otherwise returns an error message.
+
+    Raises:
+    - Error: If the basket is missing or is not a list of strings.
+    - Error: If 'top_n' or 'sort_by' are not of the correct format.
+    - Error: If the result does not exist.
+
+    Note:
+    - Lookups use an inverted item -> rule index of the result that is cached in memory (LRU, sized
+      by RULE_INDEX_CACHE_SIZE), so only the first request for a result reads its rules from the DB.
+    """
+    data = request.get_json()
+
+    # Validating the basket and options
+    if not isinstance(data, dict) or not isinstance(data.get("basket"), list) or not all(isinstance(item, str) for item in data["basket"]):
+        response_obj_err = Response("The basket should be a list of items of data type string.")
+        return response_obj_err.return_error_response()
+
+    top_n = data.get("top_n", 5)
+    sort_by = data.get("sort_by", "lift")
+    if not isinstance(top_n, int) or isinstance(top_n, bool) or top_n < 1:
+        response_obj_err = Response("top_n should be a positive integer.")
+        return response_obj_err.return_error_response()
+    if sort_by not in RuleIndex.SORT_KEYS:
+        response_obj_err = Response(f"sort_by should be one of: {', '.join(RuleIndex.SORT_KEYS)}.")
+        return response_obj_err.return_error_response()
+
+    # Check if result exists in DB based on id (the index is only built once per cached result)
+    index = rule_index_cache.get(id)
+    if index is None:
+        response_obj_err = Response("Could not find result based on that id.")
+        return response_obj_err.return_error_response()
+
+    recommendations = index.recommend(data["basket"], top_n=top_n, sort_by=sort_by)
+
+    response_obj = Response("Recommendations retrieved successfully!", data=recommendations)
+    return response_obj.return_success_response()
+
+@mining.route('/results/<string:id>/recommend/batch', methods=["POST"])
+def recommend_batch(id):
+    """
+    Scores many baskets against the rules of a stored result in one request.
+
+    Request:
+    - HttpRequest (NDJSON): one basket per line, either a list of items or an object with a 'basket'
+      list and an optional 'id'. Query parameters 'top_n' (default 5) and 'sort_by' ('lift' (default)
+      or 'confidence') apply to every basket.
+
+    Returns:
+    - HttpResponse (NDJSON): streamed, one line per basket containing 'id' and 'recommendations',
+      or 'id' and 'error' for a line that is not a valid basket. Errors with the request itself
+      (options, unknown result) are returned in the JSON error format.
+
+    Note:
+    - Baskets are read and scored in chunks while the response is streamed, so the batch is never
+      held in memory. BATCH_SCORING_PROCESSES sets the number of worker processes (default 1).
+      For very large batches the 'python -m app.commands score-baskets' command can be used instead.
+    """
+    top_n = request.args.get("top_n", 5, type=int)
+    sort_by = request.args.get("sort_by", "lift")
+    if top_n is None or top_n < 1:
+        response_obj_err = Response("top_n should be a positive integer.")
+        return response_obj_err.return_error_response()
+    if sort_by not in RuleIndex.SORT_KEYS:
+        response_obj_err = Response(f"sort_by should be one of: {', '.join(RuleIndex.SORT_KEYS)}.")
+        return response_obj_err.return_error_response()
+
+    # Check if result exists in DB based on id
+    index = rule_index_cache.get(id)
+    if index is None:
+        response_obj_err = Response("Could not find result based on that id.")
+        return response_obj_err.return_error_response()
+
+    # Imported here as numpy is only needed once a batch is scored
+    from app.batch_scoring import get_scorer, score_baskets
+
+    scorer = get_scorer(index, top_n=top_n, sort_by=sort_by)
+    processes = current_app.config.get("BATCH_SCORING_PROCESSES", 1)
+
+    output = score_baskets(scorer, request.stream, processes=processes)
+    return current_app.response_class(stream_with_context(output), mimetype="application/x-ndjson")
+
 @mining.route('/results', methods=["GET"])
 def read_results():
     # Retrieve all results
@@ -0,0 +1,17 @@
+from flask import Blueprint
+
+from app.metrics import registry
+
+monitoring = Blueprint('monitoring', __name__)
+
+@monitoring.route('/metrics', methods=["GET"])
+def read_metrics():
+    """
+    Returns the in-process metrics of the API in the Prometheus text exposition format. Covers
+    request counts and latency per route and per algorithm, mining duration, itemset/rule counts,
+    DB write duration, rows written, cache hits and in-flight jobs.
+
+    Returns:
+    - HttpResponse (text/plain): metrics body that can be scraped by Prometheus.
+    """
+    return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
@@ -0,0 +1,100 @@
+import math
+import random
+
+def generate_quest_transactions(num_transactions, avg_transaction_length, num_items, num_patterns=50, avg_pattern_length=4, correlation=0.5, seed=0):
+    """
+    Function that generates a synthetic transactional data set in the style of the IBM Quest
+    market basket generator (Agrawal & Srikant, 1994). A pool of 'potential frequent patterns'
+    is created first, each with a weight and a corruption level. Transactions are then filled by
+    picking patterns by weight and dropping some of their items, so the data set contains real
+    frequent itemsets instead of uniform noise. The same arguments always produce the same data.
+
+    Parameters:
+        num_transactions (int): number of transactions (|D|).
+        avg_transaction_length (float): average number of items in a transaction (|T|).
+        num_items (int): number of distinct items (N). Density is roughly avg_transaction_length / num_items.
+        num_patterns (int): number of potential frequent patterns (|L|).
+        avg_pattern_length (float): average number of items in a potential frequent pattern (|I|).
+        correlation (float): fraction of each pattern's items taken from the previous pattern.
+        seed (int): seed of the random number generator.
+
+    Returns:
+        list: 2d list of transactions containing item strings ie. [['i12', 'i40'], ...]
+
+    Example:
+        transactions = generate_quest_transactions(1000, 8, 200, seed=1)
+    """
+    rng = random.Random(seed)
+    items = [f"i{number}" for number in range(num_items)]
+
+    # 1) Potential frequent patterns, each sharing some items with the previous one
+    patterns = []
+    previous_pattern = []
+    for _ in range(num_patterns):
+        length = min(max(1, poisson(rng, avg_pattern_length)), num_items)
+        number_shared = min(len(previous_pattern), int(round(length * min(1.0, rng.expovariate(1 / correlation)))) if correlation > 0 else 0)
+        pattern = set(rng.sample(previous_pattern, number_shared)) if number_shared else set()
+        while len(pattern) < length:
+            pattern.add(rng.choice(items))
+        pattern = sorted(pattern) # sorted so the data does not depend on string hash randomisation
+        patterns.append(pattern)
+        previous_pattern = pattern
+
+    # 2) Pattern weights (exponential, normalised) and corruption levels (normal, clipped to [0, 1])
+    weights = [rng.expovariate(1) for _ in patterns]
+    corruption = [min(1.0, max(0.0, rng.gauss(0.5, 0.1))) for _ in patterns]
+
+    # 3) Transactions are filled with corrupted patterns until they reach their target size
+    transactions = []
+    for _ in range(num_transactions):
+        size = max(1, poisson(rng, avg_transaction_length))
+        transaction = set()
+        attempts = 0
+        while len(transaction) < size and attempts < size * 4:
+            attempts += 1
+            index = rng.choices(range(len(patterns)), weights)[0]
+            pattern_items = [item for item in patterns[index] if rng.random() >= corruption[index]]
+            if len(transaction) + len(pattern_items) > size and transaction and rng.random() < 0.5:
+                break
+            transaction.update(pattern_items)
+        if not transaction:
+            transaction.add(rng.choice(items))
+        transactions.append(sorted(transaction))
+
+    return transactions
+
+def describe_transactions(transactions):
+    """
+    Function that returns the size, item count, average basket length and density of a data set.
+
+    Parameters:
+        transactions (2d list)
+
+    Returns:
+        dict: containing 'transactions', 'items', 'avg_length' and 'density'.
+    """
+    unique_items = set()
+    total_items = 0
+    for transaction in transactions:
+        unique_items.update(transaction)
+        total_items += len(transaction)
+
+    avg_length = total_items / len(transactions) if transactions else 0
+    return {
+        "transactions": len(transactions),
+        "items": len(unique_items),
+        "avg_length": round(avg_length, 3),
+        "density": round(avg_length / len(unique_items), 5) if unique_items else 0,
+    }
+
+def poisson(rng, mean):
+    """
+    Function that samples a Poisson distributed integer using Knuth's algorithm.
+    """
+    limit = math.exp(-mean)
+    k = 0
+    p = rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
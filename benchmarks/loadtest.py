@@ -0,0 +1,339 @@
+"""
+End-to-end HTTP load test for the Flask API.
+
+Replays a configurable mix of '/arm/api/mine', '/arm/api/results' and '/arm/api/results/<id>'
+requests from concurrent client threads against a real server. By default a test app instance is
+created with 'create_app' on a fresh SQLite file and served on a local port, so the database
+grows during the run exactly as it would in production. Reports p50/p95/p99 latency and
+requests/sec per route, and flags lock contention and error spikes as the database grows.
+
+Usage:
+    python -m benchmarks.loadtest --clients 8 --requests 2000
+    python -m benchmarks.loadtest --mix mine=1,results=1,result=6 --duration 60 --output load.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:5000 --clients 16 --duration 30
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.datagen import generate_quest_transactions
+
+DEFAULT_MIX = {"mine": 1, "results": 1, "result": 4}
+
+class LoadTestClient:
+    def __init__(self, base_url, mix, transactions, algorithms, support_threshold, confidence_threshold, seed=0, timeout=60):
+        """
+        Constructor method to initialise a LoadTestClient. The client picks requests at random from
+        the weighted 'mix' and records the latency, status and error of every request. Ids of the
+        results it mines are kept so '/results/<id>' reads hit real rows.
+
+        Parameters:
+            base_url (str): ie. 'http://127.0.0.1:5000/arm/api'
+            mix (dict): request kind ('mine', 'results', 'result') -> weight.
+            transactions (2d list): transactions sent in '/mine' requests.
+            algorithms (list): algorithms '/mine' requests are spread over.
+            support_threshold (float)
+            confidence_threshold (float)
+            seed (int): seed of the random request mix.
+            timeout (float): timeout of a single request in seconds.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.transactions = transactions
+        self.algorithms = algorithms
+        self.support_threshold = support_threshold
+        self.confidence_threshold = confidence_threshold
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.result_ids = []
+        self.samples = []
+
+    def run(self, clients, total_requests=None, duration=None):
+        """
+        Method that runs 'clients' concurrent threads until 'total_requests' requests have been
+        sent or 'duration' seconds have passed.
+
+        Parameters:
+            clients (int)
+            total_requests (int, optional)
+            duration (float, optional)
+
+        Returns:
+            float: wall time of the run in seconds.
+        """
+        counter = {"sent": 0}
+        start = time.perf_counter()
+        deadline = start + duration if duration else None
+
+        def next_request():
+            with self.lock:
+                if total_requests is not None and counter["sent"] >= total_requests:
+                    return None
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return None
+                counter["sent"] += 1
+                kind = self.rng.choices(self.kinds, self.weights)[0]
+                if kind == "result" and not self.result_ids:
+                    kind = "mine"
+                result_id = self.rng.choice(self.result_ids) if kind == "result" else None
+                algorithm = self.rng.choice(self.algorithms)
+                results_in_db = len(self.result_ids)
+            return kind, result_id, algorithm, results_in_db
+
+        def worker():
+            while True:
+                request = next_request()
+                if request is None:
+                    return
+                self.send(*request, started_at=start)
+
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            futures = [executor.submit(worker) for _ in range(clients)]
+            for future in futures:
+                future.result()
+
+        return time.perf_counter() - start
+
+    def send(self, kind, result_id, algorithm, results_in_db, started_at):
+        """
+        Method that sends a single request and records a sample for it.
+        """
+        if kind == "mine":
+            body = json.dumps({
+                "algorithm": algorithm,
+                "transactions": self.transactions,
+                "support_threshold": self.support_threshold,
+                "confidence_threshold": self.confidence_threshold,
+            }).encode()
+            http_request = urllib.request.Request(f"{self.base_url}/mine", data=body, method="POST", headers={"Content-Type": "application/json"})
+        elif kind == "results":
+            http_request = urllib.request.Request(f"{self.base_url}/results")
+        else:
+            http_request = urllib.request.Request(f"{self.base_url}/results/{result_id}")
+
+        error = None
+        status = None
+        request_start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+                status = response.status
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as http_error:
+            status = http_error.code
+            try:
+                payload = json.loads(http_error.read())
+            except ValueError:
+                payload = {"error": {"message": str(http_error)}}
+        except Exception as exception:
+            payload = {"error": {"message": str(exception)}}
+        latency = time.perf_counter() - request_start
+
+        # The API returns errors in the 'error' key of the body, not always with an error status code
+        if "error" in payload:
+            error = payload["error"].get("message", "error")
+            # '/results' on an empty database is not a failure of the service
+            if kind == "results" and error == "No results found.":
+                error = None
+        elif kind == "mine":
+            with self.lock:
+                self.result_ids.append(payload["success"]["data"]["id"])
+
+        with self.lock:
+            self.samples.append({
+                "kind": kind,
+                "latency": latency,
+                "status": status,
+                "error": error,
+                "results_in_db": results_in_db,
+                "at": request_start - started_at,
+            })
+
+def percentile(values, fraction):
+    """
+    Function that returns the 'fraction' percentile (0.95 = p95) of a list of values using the
+    nearest-rank method.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarise(samples, elapsed):
+    """
+    Function that summarises samples into requests/sec, error counts and latency percentiles (ms).
+    """
+    latencies = [sample["latency"] for sample in samples]
+    errors = [sample for sample in samples if sample["error"]]
+    return {
+        "requests": len(samples),
+        "requests_per_sec": round(len(samples) / elapsed, 2) if elapsed else None,
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(samples), 4) if samples else 0,
+        "lock_errors": sum(1 for sample in errors if "locked" in sample["error"].lower()),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+def build_report(samples, elapsed, bucket_size, error_spike_rate, latency_growth):
+    """
+    Function that builds the load test report. Samples are grouped per route and per database
+    size bucket (number of results mined before the request was sent) so degradation as the
+    database grows can be seen. A bucket is flagged if it has lock errors, an error rate above
+    'error_spike_rate', or a p95 more than 'latency_growth' times the first bucket's p95.
+
+    Parameters:
+        samples (list)
+        elapsed (float): wall time of the run in seconds.
+        bucket_size (int): number of results per database size bucket.
+        error_spike_rate (float)
+        latency_growth (float)
+
+    Returns:
+        dict: report with 'overall', 'routes', 'db_growth' and 'flags'.
+    """
+    routes = {}
+    for kind in sorted({sample["kind"] for sample in samples}):
+        routes[kind] = summarise([sample for sample in samples if sample["kind"] == kind], elapsed)
+
+    buckets = {}
+    for sample in samples:
+        buckets.setdefault(sample["results_in_db"] // bucket_size, []).append(sample)
+
+    db_growth = []
+    flags = []
+    first_p95 = {}
+    for index in sorted(buckets):
+        bucket_samples = buckets[index]
+        bucket_elapsed = max(sample["at"] + sample["latency"] for sample in bucket_samples) - min(sample["at"] for sample in bucket_samples)
+        entry = {"results_in_db": f"{index * bucket_size}-{(index + 1) * bucket_size - 1}", **summarise(bucket_samples, bucket_elapsed)}
+        entry["routes"] = {}
+        for kind in sorted({sample["kind"] for sample in bucket_samples}):
+            entry["routes"][kind] = summarise([sample for sample in bucket_samples if sample["kind"] == kind], bucket_elapsed)
+            p95 = entry["routes"][kind]["p95_ms"]
+            first_p95.setdefault(kind, p95)
+            if first_p95[kind] and p95 > first_p95[kind] * latency_growth:
+                flags.append(f"{kind} p95 grew from {first_p95[kind]}ms to {p95}ms with {entry['results_in_db']} results in the database")
+        if entry["lock_errors"]:
+            flags.append(f"{entry['lock_errors']} database lock errors with {entry['results_in_db']} results in the database")
+        if entry["error_rate"] > error_spike_rate:
+            flags.append(f"error rate {entry['error_rate'] * 100:.1f}% with {entry['results_in_db']} results in the database")
+        db_growth.append(entry)
+
+    error_messages = {}
+    for sample in samples:
+        if sample["error"]:
+            error_messages[sample["error"]] = error_messages.get(sample["error"], 0) + 1
+
+    return {
+        "overall": summarise(samples, elapsed),
+        "routes": routes,
+        "db_growth": db_growth,
+        "errors": error_messages,
+        "flags": flags,
+    }
+
+def parse_mix(value):
+    """
+    Function that parses a request mix ie. 'mine=1,results=1,result=4'.
+    """
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown request kind '{kind}', expected one of {sorted(DEFAULT_MIX)}.")
+        mix[kind] = float(weight or 1)
+    return mix
+
+def serve_test_app(database_path):
+    """
+    Function that creates a test app instance with 'create_app' on its own SQLite file and serves
+    it from a background thread on a free local port.
+
+    Returns:
+        tuple: the server (call 'shutdown' when done) and the base url of the API.
+    """
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    # Per-request access logs would dominate the output and the timings
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    app = create_app({
+        "DEBUG": False,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database_path}",
+        "INIT_DB_ON_STARTUP": True,
+    })
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}/arm/api"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the association rule mining API.")
+    parser.add_argument("--url", help="base url of a running server, ie. http://127.0.0.1:5000. A test app is started if not set.")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=1000, help="total number of requests (ignored if --duration is set)")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of a fixed number of requests")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="weighted request mix, ie. mine=1,results=1,result=4")
+    parser.add_argument("--algorithms", nargs="+", default=["apriori", "fpgrowth", "apriori-ceri"])
+    parser.add_argument("--transactions", type=int, default=200, help="transactions sent in each /mine request")
+    parser.add_argument("--support", type=float, default=0.1)
+    parser.add_argument("--confidence", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bucket-size", type=int, default=50, help="number of results per database size bucket in the report")
+    parser.add_argument("--error-spike-rate", type=float, default=0.01)
+    parser.add_argument("--latency-growth", type=float, default=3.0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/") + "/arm/api"
+    else:
+        database_path = os.path.join(tempfile.mkdtemp(prefix="arm-loadtest-"), "loadtest.db")
+        server, base_url = serve_test_app(database_path)
+        print(f"Serving test app on {base_url} with database {database_path}", file=sys.stderr)
+
+    transactions = generate_quest_transactions(args.transactions, 6, 60, seed=args.seed)
+    client = LoadTestClient(base_url, args.mix, transactions, args.algorithms, args.support, args.confidence, args.seed)
+
+    try:
+        elapsed = client.run(args.clients, None if args.duration else args.requests, args.duration)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = build_report(client.samples, elapsed, args.bucket_size, args.error_spike_rate, args.latency_growth)
+    report["config"] = {key: value for key, value in vars(args).items()}
+    body = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(body + "\n")
+
+    overall = report["overall"]
+    print(f"{overall['requests']} requests in {elapsed:.1f}s ({overall['requests_per_sec']} req/s), {overall['errors']} errors", file=sys.stderr)
+    for kind, summary in report["routes"].items():
+        print(f"  {kind:<8} p50 {summary['p50_ms']}ms  p95 {summary['p95_ms']}ms  p99 {summary['p99_ms']}ms  {summary['errors']} errors", file=sys.stderr)
+    for flag in report["flags"]:
+        print(f"FLAG {flag}", file=sys.stderr)
+
+    if not args.output:
+        print(body)
+    return 1 if report["flags"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
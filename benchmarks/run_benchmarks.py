@@ -0,0 +1,243 @@
+"""
+Reproducible benchmark suite for the mining algorithms supported by 'Miner'.
+
+Every algorithm in 'Miner.ALGORITHMS' is run through 'Miner.mine_association_rules' on synthetic
+IBM-Quest-style data sets. Wall time, peak memory, itemset count and rule count are recorded and
+written as JSON. Results can be compared against a stored baseline to catch regressions.
+
+Usage:
+    python -m benchmarks.run_benchmarks --suite small
+    python -m benchmarks.run_benchmarks --suite small --output bench.json --baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --suite small --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from app.budget import MiningBudget, BudgetExceededError
+from app.miner import Miner
+from benchmarks.datagen import generate_quest_transactions, describe_transactions
+
+# Data sets are described by the arguments of 'generate_quest_transactions'
+SUITES = {
+    "small": [
+        {"name": "T5.N100.D1K", "num_transactions": 1000, "avg_transaction_length": 5, "num_items": 100, "support_threshold": 0.05, "confidence_threshold": 0.6},
+        {"name": "T10.N200.D2K", "num_transactions": 2000, "avg_transaction_length": 10, "num_items": 200, "support_threshold": 0.1, "confidence_threshold": 0.6},
+    ],
+    "medium": [
+        {"name": "T10.N500.D10K", "num_transactions": 10000, "avg_transaction_length": 10, "num_items": 500, "support_threshold": 0.02, "confidence_threshold": 0.6},
+        {"name": "T20.N1K.D10K", "num_transactions": 10000, "avg_transaction_length": 20, "num_items": 1000, "support_threshold": 0.03, "confidence_threshold": 0.6},
+    ],
+    "large": [
+        {"name": "T10.N1K.D100K", "num_transactions": 100000, "avg_transaction_length": 10, "num_items": 1000, "support_threshold": 0.01, "confidence_threshold": 0.6},
+    ],
+}
+
+def run_case(dataset, transactions, algorithm, repeats, max_seconds, options=None):
+    """
+    Function that benchmarks one algorithm on one data set. The run is repeated 'repeats'
+    times and the median wall time is kept. Peak memory is measured on a separate run with
+    tracemalloc so the tracing overhead does not inflate the timings.
+
+    Parameters:
+        dataset (dict): data set config from SUITES.
+        transactions (2d list)
+        algorithm (str)
+        repeats (int)
+        max_seconds (float): mining budget for a single run, None for no limit.
+        options (dict, optional): extra keyword arguments passed to 'Miner'.
+
+    Returns:
+        dict: benchmark result for the case.
+    """
+    options = options or {}
+    case = {
+        "dataset": dataset["name"],
+        "algorithm": algorithm,
+        "support_threshold": dataset["support_threshold"],
+        "confidence_threshold": dataset["confidence_threshold"],
+    }
+    case.update(options)
+
+    def mine():
+        miner = Miner(
+            algorithm=algorithm,
+            data=transactions,
+            support_threshold=dataset["support_threshold"],
+            confidence_threshold=dataset["confidence_threshold"],
+            budget=MiningBudget(max_seconds=max_seconds) if max_seconds else None,
+            **options,
+        )
+        return miner.mine_association_rules()
+
+    try:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = mine()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            mine()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    except BudgetExceededError as error:
+        case["status"] = "budget_exceeded"
+        case["error"] = str(error)
+        return case
+
+    case.update({
+        "status": "ok",
+        "wall_time_s": round(statistics.median(timings), 6),
+        "wall_time_min_s": round(min(timings), 6),
+        "peak_memory_mb": round(peak_memory / (1024 * 1024), 3),
+        "itemsets": len(result["itemsets"]),
+        "rules": len(result["rules"]),
+    })
+    return case
+
+def run_suite(suite, algorithms, repeats=7, max_seconds=None, seed=0, counting_methods=("trie",), processes=1):
+    """
+    Function that runs every algorithm on every data set of a suite.
+
+    Parameters:
+        suite (str): name of the suite in SUITES.
+        algorithms (list): algorithms to benchmark.
+        repeats (int)
+        max_seconds (float): mining budget for a single run.
+        seed (int): seed used to generate the data sets.
+        counting_methods (tuple): candidate counting methods 'apriori-ceri' is benchmarked with.
+        processes (int): worker processes used by 'bitmap' counting.
+
+    Returns:
+        dict: 'meta' describing the run and the list of 'results'.
+    """
+    results = []
+    datasets = []
+    for dataset in SUITES[suite]:
+        transactions = generate_quest_transactions(
+            dataset["num_transactions"],
+            dataset["avg_transaction_length"],
+            dataset["num_items"],
+            seed=seed,
+        )
+        datasets.append({"name": dataset["name"], **describe_transactions(transactions)})
+
+        for algorithm in algorithms:
+            # apriori-ceri is run once per counting method so 'trie' can be compared against the 'subset' loop
+            variants = [{"counting": method} for method in counting_methods] if algorithm == "apriori-ceri" else [{}]
+            # 'bitmap' counting is the only one that uses worker processes
+            variants = [dict(options, processes=processes) if options.get("counting") == "bitmap" and processes > 1 else options for options in variants]
+            for options in variants:
+                case = run_case(dataset, transactions, algorithm, repeats, max_seconds, options)
+                results.append(case)
+                print(format_case(case), file=sys.stderr)
+
+    return {
+        "meta": {
+            "suite": suite,
+            "seed": seed,
+            "repeats": repeats,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "datasets": datasets,
+        },
+        "results": results,
+    }
+
+def compare_to_baseline(report, baseline, tolerance, min_time_delta=0.05):
+    """
+    Function that compares a benchmark report against a stored baseline. A case regresses if
+    its wall time or peak memory grows by more than 'tolerance' (0.25 = 25%), or if it produces
+    a different number of itemsets or rules (a correctness change). Wall time changes smaller
+    than 'min_time_delta' seconds are ignored: a case of 0.1s varies by 30% between two runs on
+    a busy machine, which the median of the repeats alone does not absorb.
+
+    Parameters:
+        report (dict): report returned by 'run_suite'.
+        baseline (dict): report loaded from the baseline file.
+        tolerance (float)
+        min_time_delta (float)
+
+    Returns:
+        list: regression messages, empty if there are none.
+    """
+    def key(case):
+        return (case["dataset"], case["algorithm"], case.get("counting"))
+
+    baseline_cases = {key(case): case for case in baseline["results"]}
+    regressions = []
+    for case in report["results"]:
+        previous = baseline_cases.get(key(case))
+        if previous is None or previous.get("status") != "ok":
+            continue
+        name = "/".join(part for part in (case["dataset"], case["algorithm"], case.get("counting")) if part)
+        if case.get("status") != "ok":
+            regressions.append(f"{name}: {case.get('error', case.get('status'))}")
+            continue
+        for count in ("itemsets", "rules"):
+            if case[count] != previous[count]:
+                regressions.append(f"{name}: {count} changed from {previous[count]} to {case[count]}")
+        for metric in ("wall_time_s", "peak_memory_mb"):
+            if metric == "wall_time_s" and case[metric] - previous[metric] < min_time_delta:
+                continue
+            if previous[metric] > 0 and case[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {case[metric]} (+{(case[metric] / previous[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+def format_case(case):
+    algorithm = f"{case['algorithm']}/{case['counting']}" if case.get("counting") else case["algorithm"]
+    name = f"{case['dataset']:<16} {algorithm:<20}"
+    if case.get("status") != "ok":
+        return f"{name} {case.get('status')}"
+    return f"{name} {case['wall_time_s']:>9.4f}s {case['peak_memory_mb']:>9.2f}MB {case['itemsets']:>7} itemsets {case['rules']:>7} rules"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the association rule mining algorithms.")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="small")
+    parser.add_argument("--algorithms", nargs="+", default=list(Miner.ALGORITHMS))
+    parser.add_argument("--counting", nargs="+", default=["trie"], help="candidate counting methods to benchmark apriori-ceri with, ie. trie subset bitmap")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes used by 'bitmap' counting")
+    parser.add_argument("--repeats", type=int, default=7, help="runs per case, the median wall time is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-seconds", type=float, default=300, help="mining budget of a single run")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="compare against this JSON report and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/memory growth against the baseline")
+    parser.add_argument("--min-time-delta", type=float, default=0.05, help="ignore wall time changes smaller than this many seconds")
+    parser.add_argument("--save-baseline", help="write the JSON report to this file as the new baseline")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.suite, args.algorithms, args.repeats, args.max_seconds, args.seed, args.counting, args.processes)
+    body = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(body + "\n")
+    else:
+        print(body)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as output:
+            output.write(body + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_to_baseline(report, baseline, args.tolerance, args.min_time_delta)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Cold start benchmark for the API. Every run starts a fresh Python process that imports 'app',
+calls 'create_app' and serves one request with the test client, so nothing is shared between
+runs. The median of each phase is reported together with the heavy modules that were imported
+on boot, which should only be loaded once a request needs them.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 20 --max-ms 800
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that are only needed by some requests and should not be imported by create_app
+LAZY_MODULES = ("numpy", "pyfpgrowth", "efficient_apriori")
+
+# Runs in the child process, prints one JSON line
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1], "RETENTION_INTERVAL_SECONDS": None})
+created = time.perf_counter()
+app.test_client().get("/arm/api/metrics")
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (served - created) * 1000,
+    "total_ms": (served - start) * 1000,
+    "modules": len(sys.modules),
+    "lazy_modules_loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+def run_once(database_uri):
+    """
+    Function that measures one cold start in a new interpreter.
+
+    Parameters:
+        database_uri (str): database the app is pointed at.
+
+    Returns:
+        dict: timings in milliseconds, number of loaded modules and the LAZY_MODULES that were loaded.
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT % (LAZY_MODULES,), database_uri],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def run_benchmark(runs):
+    """
+    Function that runs 'runs' cold starts against a temporary SQLite database and keeps the median
+    of every phase. The database is created up front as in a deploy (init-db), so the app does not
+    create it.
+
+    Returns:
+        dict: benchmark report.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        database_uri = f"sqlite:///{os.path.join(directory, 'startup.db')}"
+        subprocess.run(
+            [sys.executable, "-c", "import sys; from app import create_app; create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'INIT_DB_ON_STARTUP': True, 'RETENTION_INTERVAL_SECONDS': None})", database_uri],
+            cwd=ROOT, check=True,
+        )
+        samples = [run_once(database_uri) for _ in range(runs)]
+
+    report = {"runs": runs, "python": sys.version.split()[0]}
+    for phase in ("import_ms", "create_app_ms", "first_request_ms", "total_ms"):
+        report[phase] = round(statistics.median(sample[phase] for sample in samples), 1)
+    report["modules"] = samples[-1]["modules"]
+    report["lazy_modules_loaded"] = sorted({name for sample in samples for name in sample["lazy_modules_loaded"]})
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold start time of the API.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, help="exit 1 if the median total time is above this")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.runs)
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if report["lazy_modules_loaded"]:
+        failures.append(f"modules loaded on startup: {', '.join(report['lazy_modules_loaded'])}")
+    if args.max_ms is not None and report["total_ms"] > args.max_ms:
+        failures.append(f"total_ms {report['total_ms']} > {args.max_ms}")
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,10 @@
-from app import create_app
+from app import create_app, db
+from app import migrations
 
 app = create_app()
+
+# The development server creates or upgrades the schema itself, deployments run 'python -m app.commands init-db'
+with app.app_context():
+    migrations.init_db(db)
     
-app.run(debug=True) # ONLY in test mode include this!
\ No newline at end of file
+app.run(debug=True) # ONLY in test mode include this!
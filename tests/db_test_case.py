@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from flask import Flask
+
+from app import db
+from app.models.db_daos import Result, Itemset, Rule, LHS, RHS, ResultBlob
+from app.result_codec import encode_result, hash_rule_key
+from app.views.mining import mining
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Test case with a Flask app on a temporary SQLite database, the mining blueprint mounted at
+    /arm/api and an app context pushed for every test. 'config' is added to the app config.
+    """
+    config = {}
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(self.directory.name, 'test.db')}"
+        self.app.config.update(self.config)
+        db.init_app(self.app)
+        self.app.register_blueprint(mining, url_prefix='/arm/api')
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        self.context.pop()
+        self.directory.cleanup()
+
+    def add_result(self, itemsets, rules, storage='rows', rule_keys=True):
+        """
+        Stores a result the same way as /mine does and returns it.
+
+        Parameters:
+            itemsets (dict): itemset string -> count.
+            rules (list): rule dicts as returned by the Miner class.
+            storage (str): 'rows' or 'blob'.
+            rule_keys (bool): False stores rows without their rule key, like rules written before keys existed.
+        """
+        if storage == 'blob':
+            result = Result(algorithm='apriori', storage='blob', blob=ResultBlob(data=encode_result(itemsets, rules)))
+        else:
+            result = Result(algorithm='apriori', storage='rows')
+            for items, count in itemsets.items():
+                result.itemsets.append(Itemset(items=items, count=count))
+            for r in rules:
+                rule = Rule(confidence=r['confidence'], conviction=r['conviction'], lift=r['lift'], support=r['support'], rule=r['rule'],
+                            rule_key=hash_rule_key(r['lhs'], r['rhs']) if rule_keys else None)
+                rule.lhs.extend(LHS(item=item) for item in r['lhs'])
+                rule.rhs.extend(RHS(item=item) for item in r['rhs'])
+                result.rules.append(rule)
+        db.session.add(result)
+        db.session.commit()
+        return result
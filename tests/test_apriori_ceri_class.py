@@ -0,0 +1,138 @@
+import random
+import unittest
+from itertools import combinations
+from unittest import mock
+
+import numpy as np
+
+from app.apriori_ceri import AprioriCeri
+from app.preprocessing import compress_transactions
+from app.candidate_trie import CandidateTrie
+from app import bitmap_counting
+from app.bitmap_counting import BitmapCounter
+from app.budget import MiningBudget, BudgetExceededError
+
+class TestAprioriCeriClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.transactions = [
+            ['Milk', 'Bread', 'Butter'],
+            ['Beer', 'Diapers'],
+            ['Milk', 'Diapers', 'Beer', 'Cola'],
+            ['Bread', 'Butter', 'Milk'],
+            ['Bread', 'Milk'],
+            ['Beer', 'Diapers'],
+            ['Milk', 'Diapers', 'Bread', 'Butter'],
+            ['Butter', 'Bread', 'Milk'],
+            ['Beer', 'Cola'],
+            ['Butter', 'Bread']
+        ]
+
+    def brute_force_itemsets(self, minimum_support):
+        # Counts every possible itemset of every transaction, used as the expected result
+        counts = {}
+        for transaction in self.transactions:
+            items = sorted(set(transaction))
+            for length in range(1, len(items) + 1):
+                for itemset in combinations(items, length):
+                    counts[itemset] = counts.get(itemset, 0) + 1
+        return {itemset: count for itemset, count in counts.items() if count >= minimum_support}
+
+    def test_mine_matches_brute_force(self):
+        transactions, weights = compress_transactions(self.transactions)
+
+        for counting in AprioriCeri.COUNTING_METHODS:
+            for minimum_support in (1, 2, 3, 5):
+                apriori_ceri = AprioriCeri(transactions, minimum_support, 0.8, weights=weights, counting=counting)
+                self.assertEqual(apriori_ceri.mine(), self.brute_force_itemsets(minimum_support))
+
+    def test_transactions_trimmed_between_levels(self):
+        transactions, weights = compress_transactions(self.transactions)
+        apriori_ceri = AprioriCeri(transactions, 2, 0.8, weights=weights)
+        itemsets = apriori_ceri.mine()
+
+        self.assertEqual(itemsets[('Bread', 'Butter', 'Milk')], 4)
+        self.assertEqual(itemsets[('Beer', 'Diapers')], 3)
+
+        # Each level scans fewer transactions than the last
+        scanned = [level["transactions"] for level in apriori_ceri.level_stats]
+        self.assertEqual(scanned, sorted(scanned, reverse=True))
+        self.assertLess(scanned[-1], scanned[0])
+
+        # No duplicate candidates are generated for a level
+        self.assertEqual([level["candidates"] for level in apriori_ceri.level_stats], [6, 15, 1])
+
+    def test_candidate_trie_count(self):
+        candidates = [frozenset({'Bread', 'Milk'}), frozenset({'Beer', 'Diapers'}), frozenset({'Butter', 'Milk'})]
+        trie = CandidateTrie(candidates)
+
+        matched = trie.count(('Bread', 'Butter', 'Milk'), 2)
+        trie.count(('Beer', 'Cola'), 1)
+
+        self.assertEqual(sorted(matched), [0, 2])
+        self.assertEqual(trie.get_counts(), {candidates[0]: 2, candidates[1]: 0, candidates[2]: 2})
+
+    def test_bitmap_counter(self):
+        # More than 64 transactions so the bitmaps span several words, weights up to 9 use several bit planes
+        rng = random.Random(1)
+        transactions = [frozenset(rng.sample(range(12), rng.randint(1, 6))) for _ in range(300)]
+        weights = [rng.randint(1, 9) for _ in transactions]
+        candidates = [frozenset(candidate) for candidate in combinations(range(12), 2)]
+        expected = [sum(weight for transaction, weight in zip(transactions, weights) if candidate <= transaction) for candidate in candidates]
+
+        # Every level is sent to the worker pool when the parallel threshold is lowered
+        for processes, parallel_min_words in ((1, bitmap_counting.PARALLEL_MIN_WORDS), (2, 1)):
+            with mock.patch.object(bitmap_counting, 'PARALLEL_MIN_WORDS', parallel_min_words), BitmapCounter(transactions, weights, processes=processes) as counter:
+                self.assertEqual(counter.count(candidates), expected)
+                self.assertEqual(counter.count([]), [])
+        bitmap_counting.shutdown_pool()
+
+    def test_worker_detaches_old_blocks(self):
+        # count_worker_block run in-process, as a worker would run it for two mining runs in a row
+        rows = np.array([[0, 1]], dtype=np.int32)
+        try:
+            for transactions in ([frozenset({1, 2}), frozenset({2})], [frozenset({1, 2}), frozenset({1, 2, 3})]):
+                with BitmapCounter(transactions, [1, 2]) as counter:
+                    self.assertEqual(bitmap_counting.count_worker_block((counter.layout, rows)).tolist(), [counter.count([frozenset({1, 2})])[0]])
+                    self.assertEqual(list(bitmap_counting.attached), [counter.layout[0]])
+        finally:
+            bitmap_counting.detach()
+        self.assertEqual(bitmap_counting.attached, {})
+
+    def test_bitmaps_of_frequent_items(self):
+        transactions, weights = compress_transactions(self.transactions)
+        built = []
+        def build(counter, transactions, weights, **options):
+            original_init(counter, transactions, weights, **options)
+            built.append(set(counter.rows))
+
+        # Level 1 is counted before the bitmaps are built, 'Cola' is infrequent and gets no bitmap
+        original_init = BitmapCounter.__init__
+        with mock.patch.object(BitmapCounter, '__init__', autospec=True, side_effect=build):
+            itemsets = AprioriCeri(transactions, 3, 0.8, weights=weights, counting='bitmap').mine()
+        self.assertEqual(itemsets, self.brute_force_itemsets(3))
+        self.assertEqual(built, [{'Beer', 'Bread', 'Butter', 'Diapers', 'Milk'}])
+
+    def test_bitmap_counter_memory_budget(self):
+        # The size of the shared block is checked before it is created
+        budget = MiningBudget(max_rss_mb=1000)
+        with mock.patch('app.budget.current_rss_mb', return_value=999.5), mock.patch.object(bitmap_counting.shared_memory, 'SharedMemory') as shared_memory:
+            with self.assertRaises(BudgetExceededError):
+                BitmapCounter([frozenset(range(100))] * 64000, [1] * 64000, budget=budget) # 0.8 MB
+        shared_memory.assert_not_called()
+
+        # The itemsets of level 1 are kept when the budget allows partial results
+        budget = MiningBudget(max_rss_mb=1000, allow_partial=True)
+        transactions, weights = compress_transactions(self.transactions)
+        apriori_ceri = AprioriCeri(transactions, 3, 0.8, budget=budget, weights=weights, counting='bitmap')
+        with mock.patch('app.budget.current_rss_mb', return_value=1000.0):
+            itemsets = apriori_ceri.mine()
+        self.assertTrue(apriori_ceri.truncated)
+        self.assertEqual(itemsets, {itemset: count for itemset, count in self.brute_force_itemsets(3).items() if len(itemset) == 1})
+
+    def test_invalid_counting_method(self):
+        with self.assertRaises(ValueError):
+            AprioriCeri([], 2, 0.8, counting='hash')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import random
+import unittest
+
+from app.rule_index import RuleIndex
+from app import batch_scoring
+from app.batch_scoring import BasketScorer, get_scorer, score_baskets
+
+class TestBatchScoring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # More than 64 antecedent items so the bitsets span several words
+        rng = random.Random(1)
+        cls.items = [f"i{number}" for number in range(100)]
+        rules = []
+        for number in range(300):
+            lhs = rng.sample(cls.items, rng.randint(1, 3))
+            rhs = rng.sample([item for item in cls.items if item not in lhs], rng.randint(1, 2))
+            rules.append({'lhs': lhs, 'rhs': rhs, 'confidence': round(rng.random(), 1), 'lift': round(rng.uniform(1, 3), 1), 'support': 0.1, 'conviction': 1.0, 'rule': str(number)})
+        cls.index = RuleIndex(rules)
+        cls.baskets = [rng.sample(cls.items, rng.randint(0, 12)) + ['unknown'] for _ in range(200)]
+
+    def test_score_matches_recommend(self):
+        for sort_by in RuleIndex.SORT_KEYS:
+            scorer = BasketScorer(self.index, top_n=4, sort_by=sort_by)
+            expected = [self.index.recommend(basket, top_n=4, sort_by=sort_by) for basket in self.baskets]
+            self.assertEqual(scorer.score(self.baskets), expected)
+
+    def test_score_baskets_stream(self):
+        lines = ['["i1", "i2"]', '', '{"id": "c-7", "basket": ["i3"]}', 'not json', '{"basket": [1]}']
+        scorer = BasketScorer(self.index, top_n=2)
+
+        for processes in (1, 2):
+            output = ''.join(score_baskets(scorer, lines, processes=processes, chunk_size=2))
+            records = [json.loads(line) for line in output.splitlines()]
+            self.assertEqual([record['id'] for record in records], [1, 'c-7', 4, 5])
+            self.assertEqual(records[0]['recommendations'], self.index.recommend(['i1', 'i2'], top_n=2))
+            self.assertEqual(records[1]['recommendations'], self.index.recommend(['i3'], top_n=2))
+            self.assertIn('error', records[2])
+            self.assertIn('error', records[3])
+        batch_scoring.shutdown_pool()
+
+    def test_invalid_utf8_line(self):
+        # An invalid line gets an error record, the lines after it are still scored
+        lines = [b'["i1"]\n', b'["caf\xe9"]\n', b'["i3"]\n']
+        scorer = BasketScorer(self.index, top_n=2)
+        records = [json.loads(line) for line in ''.join(score_baskets(scorer, lines)).splitlines()]
+        self.assertEqual(records[1], {'id': 2, 'error': "Line is not valid UTF-8."})
+        self.assertEqual(records[2]['recommendations'], self.index.recommend(['i3'], top_n=2))
+
+    def test_worker_pool_reused(self):
+        lines = ['["i1", "i2"]', '["i3"]', '["i4"]']
+        pools = []
+        try:
+            # The pool outlives a batch, every scorer is sent to a worker with the first chunk it scores there
+            for top_n in (1, 2, 1):
+                scorer = get_scorer(self.index, top_n=top_n)
+                output = ''.join(score_baskets(scorer, lines, processes=2, chunk_size=1))
+                self.assertEqual([json.loads(line)['recommendations'] for line in output.splitlines()], [self.index.recommend(basket, top_n=top_n) for basket in (['i1', 'i2'], ['i3'], ['i4'])])
+                pools.append(batch_scoring.pool)
+            self.assertTrue(pools[0] is pools[1] is pools[2])
+            self.assertIs(get_scorer(self.index, top_n=1), scorer)
+            self.assertIsNotNone(scorer.payload)
+        finally:
+            batch_scoring.shutdown_pool()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+from app import database
+
+class TestDatabase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config.update({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(self.directory.name, 'test.db')}",
+            "SQLITE_JOURNAL_MODE": "WAL",
+            "SQLITE_SYNCHRONOUS": "NORMAL",
+            "SQLITE_BUSY_TIMEOUT_MS": "2500",
+            "SQLITE_MMAP_SIZE": None,
+            "SQLITE_CACHE_SIZE": "-4000",
+        })
+        self.db = SQLAlchemy()
+        self.db.init_app(self.app)
+
+    def tearDown(self):
+        with self.app.app_context():
+            self.db.engine.dispose()
+        self.directory.cleanup()
+
+    def test_sqlite_pragmas_applied_on_connect(self):
+        database.init_app(self.app, self.db)
+
+        with self.app.app_context(), self.db.engine.connect() as connection:
+            pragma = lambda name: connection.execute(text(f"PRAGMA {name}")).scalar()
+            self.assertEqual(pragma("journal_mode"), "wal")
+            self.assertEqual(pragma("synchronous"), 1) # NORMAL
+            self.assertEqual(pragma("busy_timeout"), 2500)
+            self.assertEqual(pragma("cache_size"), -4000)
+            self.assertEqual(pragma("mmap_size"), 0) # None keeps the SQLite default
+
+    def test_invalid_pragma_value(self):
+        self.app.config["SQLITE_JOURNAL_MODE"] = "WAL; DROP TABLE result"
+        with self.assertRaises(ValueError):
+            database.init_app(self.app, self.db)
+
+if __name__ == '__main__':
+    unittest.main()
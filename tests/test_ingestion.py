@@ -0,0 +1,24 @@
+import unittest
+
+from app.ingestion import EncodedDataset, TransactionValidationError
+
+class TestIngestion(unittest.TestCase):
+    def test_from_transactions(self):
+        dataset = EncodedDataset.from_transactions([['Milk', 'Bread', 'Milk'], ['Beer', 'Diapers'], [], ['Diapers', 'Milk']])
+
+        # Ids follow the sort order of the items, duplicates are dropped and the item order is kept
+        self.assertEqual(dataset.items, ['Beer', 'Bread', 'Diapers', 'Milk'])
+        self.assertEqual(dataset.transactions, [(3, 1), (0, 2), (), (2, 3)])
+        self.assertEqual(dataset.decode((2, 3)), ['Diapers', 'Milk'])
+        self.assertEqual(len(dataset), 4)
+        self.assertEqual(dataset.compress(), ([frozenset({1, 3}), frozenset({0, 2}), frozenset(), frozenset({2, 3})], [1, 1, 1, 1]))
+
+    def test_invalid_transactions(self):
+        for transactions in ([['Milk'], ['Beer', 3]], [['Milk'], 'Beer'], [['Milk'], ['Beer', ['Cola']]], [['Milk'], None]):
+            with self.assertRaises(TransactionValidationError) as context:
+                EncodedDataset.from_transactions(transactions + [['Cola', 4.5]])
+            self.assertEqual(context.exception.index, 1)
+            self.assertEqual(str(context.exception), "All transactions in the list should be of data type string. Invalid transaction at index 1.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from unittest import mock
+
+from app import db, metrics
+from app.metrics import Counter, Gauge, Histogram, MetricsRegistry
+from app.miner import Miner
+from app.views.monitoring import monitoring
+from tests.db_test_case import DatabaseTestCase
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_and_gauge_render(self):
+        counter = Counter("arm_test_total", "Test counter.", ("route", "status"))
+        counter.inc(route='/mine', status=200)
+        counter.inc(2, route='/mine', status=200)
+        counter.inc(route='a "quoted"\\path\nnext', status=500)
+
+        self.assertEqual(counter.render(), [
+            "# HELP arm_test_total Test counter.",
+            "# TYPE arm_test_total counter",
+            'arm_test_total{route="/mine",status="200"} 3',
+            'arm_test_total{route="a \\"quoted\\"\\\\path\\nnext",status="500"} 1',
+        ])
+        with self.assertRaises(ValueError):
+            counter.inc(route='/mine')
+
+        gauge = Gauge("arm_test_in_flight", "Test gauge.")
+        gauge.set(0)
+        with self.assertRaises(RuntimeError), gauge.track_inprogress():
+            self.assertEqual(gauge.render()[-1], "arm_test_in_flight 1")
+            raise RuntimeError()
+        self.assertEqual(gauge.render()[-1], "arm_test_in_flight 0")
+
+    def test_histogram_render(self):
+        histogram = Histogram("arm_test_seconds", "Test histogram.", ("algorithm",), buckets=(0.5, 0.1))
+        for value in (0.05, 0.1, 0.3, 7.0):
+            histogram.observe(value, algorithm='fpgrowth')
+
+        # Buckets are sorted and cumulative, a value on a bound falls in that bucket
+        self.assertEqual(histogram.render()[2:], [
+            'arm_test_seconds_bucket{algorithm="fpgrowth",le="0.1"} 2',
+            'arm_test_seconds_bucket{algorithm="fpgrowth",le="0.5"} 3',
+            'arm_test_seconds_bucket{algorithm="fpgrowth",le="+Inf"} 4',
+            'arm_test_seconds_sum{algorithm="fpgrowth"} 7.45',
+            'arm_test_seconds_count{algorithm="fpgrowth"} 4',
+        ])
+
+    def test_registry_render(self):
+        registry = MetricsRegistry()
+        registry.counter("arm_a_total", "A.").inc()
+        registry.gauge("arm_b", "B.").set(2.5)
+        self.assertEqual(registry.render(), "# HELP arm_a_total A.\n# TYPE arm_a_total counter\narm_a_total 1\n# HELP arm_b B.\n# TYPE arm_b gauge\narm_b 2.5\n")
+
+class TestMetricsView(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app.register_blueprint(monitoring, url_prefix='/arm/api')
+        metrics.init_app(self.app)
+        self.client = self.app.test_client()
+
+    def mine(self):
+        body = {'algorithm': 'apriori-ceri', 'transactions': [['Beer', 'Diapers'], ['Beer', 'Diapers'], ['Milk']], 'support_threshold': 0.5, 'confidence_threshold': 0.6}
+        response = self.client.post('/arm/api/mine', json=body)
+        # Requests run in the app context of the test, so the session is not removed after each one
+        db.session.remove()
+        return response
+
+    def read_metrics(self):
+        response = self.client.get('/arm/api/metrics')
+        self.assertTrue(response.content_type.startswith("text/plain; version=0.0.4"))
+        samples = {}
+        for line in response.get_data(as_text=True).splitlines():
+            if not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_metrics_after_mine(self):
+        before = self.read_metrics()
+        self.mine()
+        after = self.read_metrics()
+
+        def increase(name):
+            return after.get(name, 0) - before.get(name, 0)
+
+        self.assertEqual(increase('arm_mine_requests_total{algorithm="apriori-ceri",outcome="success"}'), 1)
+        self.assertEqual(increase('arm_http_requests_total{route="/arm/api/mine",method="POST",status="200"}'), 1)
+        self.assertEqual(increase('arm_mining_duration_seconds_count{algorithm="apriori-ceri"}'), 1)
+        self.assertEqual(increase('arm_db_rows_written_total{table="result"}'), 1)
+        self.assertEqual(after['arm_mining_jobs_in_flight'], 0)
+
+    def test_in_flight_gauges_after_error(self):
+        with mock.patch.object(Miner, "mine_association_rules", side_effect=RuntimeError("engine failed")):
+            response = self.mine()
+        self.assertEqual(response.status_code, 500)
+
+        # The /metrics request itself is the only request in flight
+        samples = self.read_metrics()
+        self.assertEqual(samples['arm_mining_jobs_in_flight'], 0)
+        self.assertEqual(samples['arm_http_requests_in_flight'], 1)
+        self.assertEqual(metrics.http_requests_in_flight.render()[-1], "arm_http_requests_in_flight 0")
+
+if __name__ == '__main__':
+    unittest.main()
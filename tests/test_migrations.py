@@ -0,0 +1,145 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, event, inspect, text
+
+from app import migrations
+from app import db
+from app.result_codec import hash_rule_key
+from tests.db_test_case import DatabaseTestCase
+
+# Schema before versioning was added (version 0), with uuid primary keys
+VERSION_0_SCHEMA = """
+CREATE TABLE result (id VARCHAR(36) NOT NULL, count INTEGER NOT NULL, algorithm VARCHAR(100) NOT NULL, date_added VARCHAR(100) NOT NULL, PRIMARY KEY (id));
+CREATE TABLE itemset (id VARCHAR(36) NOT NULL, items VARCHAR(1000) NOT NULL, count INTEGER NOT NULL, result_id INTEGER NOT NULL, PRIMARY KEY (id), FOREIGN KEY(result_id) REFERENCES result (id));
+CREATE TABLE rule (id VARCHAR(36) NOT NULL, confidence FLOAT NOT NULL, conviction FLOAT NOT NULL, lift FLOAT NOT NULL, support FLOAT NOT NULL, rule VARCHAR(1000) NOT NULL, result_id INTEGER NOT NULL, PRIMARY KEY (id), FOREIGN KEY(result_id) REFERENCES result (id));
+CREATE TABLE lhs (id VARCHAR(36) NOT NULL, item VARCHAR(200) NOT NULL, rule_id INTEGER NOT NULL, PRIMARY KEY (id), FOREIGN KEY(rule_id) REFERENCES rule (id));
+CREATE TABLE rhs (id VARCHAR(36) NOT NULL, item VARCHAR(200) NOT NULL, rule_id INTEGER NOT NULL, PRIMARY KEY (id), FOREIGN KEY(rule_id) REFERENCES rule (id));
+INSERT INTO result VALUES ('r-1', 10, 'apriori', '01/01/2024, 10:00:00'), ('r-2', 10, 'fpgrowth', '02/01/2024, 10:00:00');
+INSERT INTO itemset VALUES ('i-1', "('Beer',)", 3, 'r-1'), ('i-2', "('Milk',)", 5, 'r-2'), ('i-3', "('Cola',)", 1, 'r-deleted');
+INSERT INTO rule VALUES ('u-1', 0.9, 2.0, 1.5, 0.3, '{Beer} -> {Diapers}', 'r-1'), ('u-2', 0.8, 1.5, 1.2, 0.4, '{Bread} -> {Milk}', 'r-2'), ('u-3', 0.8, 1.0, 1.0, 0.1, '{Cola} -> {Beer}', 'r-deleted');
+INSERT INTO lhs VALUES ('l-1', 'Beer', 'u-1'), ('l-2', 'Bread', 'u-2'), ('l-3', 'Cola', 'u-3');
+INSERT INTO rhs VALUES ('h-1', 'Diapers', 'u-1'), ('h-2', 'Milk', 'u-2'), ('h-3', 'Beer', 'u-3');
+"""
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.engine = create_engine(f"sqlite:///{self.path}")
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def test_upgrade_integer_keys(self):
+        connection = sqlite3.connect(self.path)
+        connection.executescript(VERSION_0_SCHEMA)
+        connection.close()
+
+        self.assertEqual(migrations.upgrade(self.engine), [version for version, _, _ in migrations.MIGRATIONS])
+        self.assertEqual(migrations.upgrade(self.engine), [])
+
+        connection = sqlite3.connect(self.path)
+        self.assertEqual(connection.execute("PRAGMA user_version").fetchone()[0], migrations.SCHEMA_VERSION)
+        self.assertEqual(connection.execute("SELECT id, uuid, storage FROM result ORDER BY id").fetchall(), [(1, 'r-1', 'rows'), (2, 'r-2', 'rows')])
+
+        # Foreign keys point at the new integer ids and rows of deleted results are not copied
+        rules = connection.execute(
+            "SELECT result.uuid, rule.rule, lhs.item, rhs.item FROM rule JOIN result ON result.id = rule.result_id "
+            "JOIN lhs ON lhs.rule_id = rule.id JOIN rhs ON rhs.rule_id = rule.id ORDER BY rule.id"
+        ).fetchall()
+        self.assertEqual(rules, [('r-1', '{Beer} -> {Diapers}', 'Beer', 'Diapers'), ('r-2', '{Bread} -> {Milk}', 'Bread', 'Milk')])
+        self.assertEqual(connection.execute("SELECT items, result_id FROM itemset ORDER BY id").fetchall(), [("('Beer',)", 1), ("('Milk',)", 2)])
+
+        # Rule keys are filled in from the lhs/rhs rows
+        keys = connection.execute("SELECT rule_key FROM rule ORDER BY id").fetchall()
+        self.assertEqual(keys, [(hash_rule_key(['Beer'], ['Diapers']),), (hash_rule_key(['Bread'], ['Milk']),)])
+
+        indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({'ix_itemset_result_id', 'ix_rule_result_id', 'ix_lhs_rule_id', 'ix_rhs_rule_id'} <= indexes)
+        connection.close()
+
+    def test_upgrade_after_create_all(self):
+        from app.models.db_daos import ResultBlob
+
+        connection = sqlite3.connect(self.path)
+        connection.executescript(VERSION_0_SCHEMA)
+        connection.close()
+        with mock.patch.object(migrations, "MIGRATIONS", migrations.MIGRATIONS[:1]):
+            self.assertEqual(migrations.upgrade(self.engine), [1])
+
+        # db.create_all() on a version 1 database creates result_blob before migration 2 runs
+        ResultBlob.__table__.create(self.engine)
+        self.assertEqual(migrations.upgrade(self.engine), [2, 3])
+
+        columns = {column["name"] for column in inspect(self.engine).get_columns("result")}
+        self.assertIn("storage", columns)
+        indexes = {index["name"] for index in inspect(self.engine).get_indexes("result_blob")}
+        self.assertEqual(indexes, {"ix_result_blob_result_id"})
+
+    def test_init_db(self):
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{self.path}"
+        db = SQLAlchemy(app)
+        db.Table("result", db.Column("id", db.Integer, primary_key=True))
+
+        with app.app_context():
+            self.assertEqual(migrations.init_db(db), [])
+            self.assertTrue(inspect(db.engine).has_table("result"))
+            with db.engine.connect() as connection:
+                self.assertEqual(migrations.get_schema_version(connection), migrations.SCHEMA_VERSION)
+            db.engine.dispose()
+
+    def test_init_db_other_backend(self):
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{self.path}"
+        db = SQLAlchemy(app)
+        db.Table("result", db.Column("id", db.Integer, primary_key=True))
+
+        with app.app_context(), mock.patch.object(db.engine.dialect, "name", "postgresql"):
+            statements = []
+            event.listen(db.engine, "before_cursor_execute", lambda connection, cursor, statement, *args: statements.append(statement))
+
+            # The version is kept in a 'schema_version' table instead of the SQLite pragma
+            self.assertEqual(migrations.init_db(db), [])
+            with db.engine.connect() as connection:
+                self.assertEqual(connection.execute(text("SELECT version FROM schema_version")).scalars().all(), [migrations.SCHEMA_VERSION])
+
+            # Migrations run in a normal transaction, without explicit BEGIN/COMMIT or VACUUM
+            applied = []
+            with mock.patch.object(migrations, "MIGRATIONS", migrations.MIGRATIONS + [(migrations.SCHEMA_VERSION + 1, "Test", lambda connection: applied.append(True))]):
+                self.assertEqual(migrations.upgrade(db.engine), [migrations.SCHEMA_VERSION + 1])
+            self.assertEqual(applied, [True])
+            with db.engine.connect() as connection:
+                self.assertEqual(migrations.get_schema_version(connection), migrations.SCHEMA_VERSION + 1)
+
+            self.assertFalse([statement for statement in statements if "user_version" in statement or statement in ("BEGIN", "COMMIT", "VACUUM")])
+            db.engine.dispose()
+
+    def test_upgrade_empty_database(self):
+        # Empty databases are created at the latest version, so nothing is applied
+        self.assertEqual(migrations.upgrade(self.engine), [])
+        with self.engine.connect() as connection:
+            self.assertEqual(migrations.get_schema_version(connection), migrations.SCHEMA_VERSION)
+
+class TestCreateAll(DatabaseTestCase):
+    def test_create_all_stamps_version(self):
+        # DatabaseTestCase runs db.create_all() without migrations.upgrade()
+        with db.engine.connect() as connection:
+            self.assertEqual(migrations.get_schema_version(connection), migrations.SCHEMA_VERSION)
+
+        # Existing tables are not created again, so their version is left alone
+        with db.engine.begin() as connection:
+            migrations.set_schema_version(connection, 1)
+        db.create_all()
+        with db.engine.connect() as connection:
+            self.assertEqual(migrations.get_schema_version(connection), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,25 @@
+import random
 import unittest
 import pdb
+from itertools import combinations
+from unittest import mock
 
+import pyfpgrowth
+
+from app import db
+from app.apriori_ceri import AprioriCeri
 from app.miner import Miner
+from app.budget import MiningBudget, BudgetExceededError
+from tests.db_test_case import DatabaseTestCase
+
+original_mine = AprioriCeri.mine
+
+def mine_until_time_is_up(apriori_ceri):
+    # Levels 1 and 2 are mined, then the time budget runs out as the 3-itemsets are counted
+    itemsets = original_mine(apriori_ceri)
+    apriori_ceri.truncated = True
+    apriori_ceri.budget.started_at -= apriori_ceri.budget.max_seconds + 1
+    return {itemset: count for itemset, count in itemsets.items() if len(itemset) <= 2}
 
 class TestMinerClass(unittest.TestCase):
     @classmethod
@@ -18,6 +36,7 @@ class TestMinerClass(unittest.TestCase):
             ['Beer', 'Cola'],
             ['Butter', 'Bread']
         ]
+        cls.transactions = transactions
 
         cls.miner_fpgrowth = Miner(
             algorithm='fpgrowth',
@@ -91,6 +110,26 @@ class TestMinerClass(unittest.TestCase):
         # Testing number of rules returned
         self.assertEqual(len(result['rules']), 10)
 
+    def test_support_threshold_relative_to_transactions(self):
+        # The support threshold is a fraction of the number of transactions, checked on more than 10
+        rng = random.Random(3)
+        items = ['Milk', 'Bread', 'Butter', 'Beer', 'Diapers', 'Cola']
+        transactions = [rng.sample(items, rng.randint(1, 4)) for _ in range(37)]
+        support_threshold = 0.25 # 9.25 transactions
+
+        counts = {}
+        for transaction in transactions:
+            for length in range(1, len(transaction) + 1):
+                for itemset in combinations(sorted(transaction), length):
+                    counts[itemset] = counts.get(itemset, 0) + 1
+        expected = {','.join(itemset): count for itemset, count in counts.items() if count >= support_threshold * len(transactions)}
+
+        for algorithm in ('fpgrowth', 'apriori-ceri'):
+            miner = Miner(algorithm=algorithm, data=transactions, support_threshold=support_threshold, confidence_threshold=0.5)
+            # apriori-ceri joins the items with ', ', fpgrowth with ','
+            itemsets = {items.replace(', ', ','): count for items, count in miner.mine_association_rules()['itemsets'].items()}
+            self.assertEqual(itemsets, expected, algorithm)
+
     def test_calculate_support_values(self):
         itemsets = {
             ('Cola',): 2,
@@ -131,6 +170,112 @@ class TestMinerClass(unittest.TestCase):
         self.assertEqual(conviction, 2.0000000000000004)
         self.assertNotEqual(conviction, 10)
 
+    def test_mine_apriori_ceri_budget_exceeded(self):
+        miner = Miner(
+            algorithm='apriori-ceri',
+            data=self.transactions,
+            support_threshold=0.2,
+            confidence_threshold=0.8,
+            budget=MiningBudget(max_candidates=5),
+        )
+
+        with self.assertRaises(BudgetExceededError):
+            miner.mine_association_rules()
+
+    def test_mine_apriori_ceri_budget_partial(self):
+        miner = Miner(
+            algorithm='apriori-ceri',
+            data=self.transactions,
+            support_threshold=0.2,
+            confidence_threshold=0.8,
+            budget=MiningBudget(max_candidates=10, allow_partial=True),
+        )
+
+        result = miner.mine_association_rules()
+
+        # Only the single items are mined before the 2-itemset candidates go over the budget
+        self.assertTrue(miner.truncated)
+        self.assertEqual(result['itemsets'].get("Milk"), 6)
+        self.assertEqual(len(result['itemsets']), 6)
+        self.assertEqual(result['rules'], [])
+
+    def test_mine_apriori_ceri_budget_partial_rules(self):
+        # Time is used up when mining stops, formatting the rules must not check it again
+        budget = MiningBudget(max_seconds=5, allow_partial=True, check_interval=1)
+        miner = Miner(algorithm='apriori-ceri', data=self.transactions, support_threshold=0.2, confidence_threshold=0.8, budget=budget)
+        with mock.patch.object(AprioriCeri, "mine", autospec=True, side_effect=mine_until_time_is_up):
+            result = miner.mine_association_rules()
+
+        self.assertTrue(miner.truncated)
+        self.assertTrue(result['rules'])
+        self.assertTrue(all(len(rule['lhs']) + len(rule['rhs']) == 2 for rule in result['rules']))
+        self.assertEqual(budget.max_seconds, 5 * MiningBudget.PARTIAL_TIME_FRACTION)
+
+    def test_generate_association_rules_budget(self):
+        miner = Miner(algorithm='fpgrowth', data=self.transactions, support_threshold=0.2, confidence_threshold=0.6)
+        itemsets = pyfpgrowth.find_frequent_patterns(miner.dataset.transactions, 2)
+        self.assertEqual(miner.generate_association_rules(itemsets), pyfpgrowth.generate_association_rules(itemsets, 0.6))
+
+        # Rule generation stops when the budget is used up, a truncated run keeps the rules found so far
+        miner.budget = MiningBudget(max_seconds=1, check_interval=1)
+        miner.budget.start()
+        miner.budget.started_at -= 2
+        with self.assertRaises(BudgetExceededError):
+            miner.generate_association_rules(itemsets)
+        miner.truncated = True
+        self.assertEqual(miner.generate_association_rules(itemsets), {})
+
+    def test_budget_allow_partial_format(self):
+        self.assertTrue(MiningBudget.from_dict({"allow_partial": True}).allow_partial)
+        self.assertTrue(MiningBudget.from_dict({}, {"allow_partial": True}).allow_partial)
+        self.assertFalse(MiningBudget.from_dict({"allow_partial": False}, {"allow_partial": True}).allow_partial)
+        for value in ("false", 1, [True]):
+            with self.assertRaises(ValueError):
+                MiningBudget.from_dict({"allow_partial": value})
+
+    def test_register_algorithm(self):
+        engines = dict(Miner.ENGINES)
+        try:
+            Miner.register_algorithm('single-items', lambda miner: {"itemsets": {"Milk": 6}, "rules": []})
+            miner = Miner(algorithm='single-items', data=self.transactions, support_threshold=0.2)
+
+            self.assertEqual(Miner.ALGORITHMS, ('apriori', 'fpgrowth', 'apriori-ceri', 'single-items'))
+            self.assertEqual(miner.mine_association_rules(), {"itemsets": {"Milk": 6}, "rules": []})
+        finally:
+            Miner.ENGINES.clear()
+            Miner.ENGINES.update(engines)
+            Miner.ALGORITHMS = tuple(engines)
+
+        with self.assertRaises(ValueError):
+            miner.mine_association_rules()
+
+class TestMineBudget(DatabaseTestCase):
+    def mine(self, algorithm, budget):
+        body = {'algorithm': algorithm, 'transactions': TestMinerClass.transactions, 'support_threshold': 0.2, 'confidence_threshold': 0.8, 'budget': budget}
+        response = self.app.test_client().post('/arm/api/mine', json=body)
+        # Requests run in the app context of the test, so the session is not removed after each one
+        db.session.remove()
+        return response.get_json()
+
+    @classmethod
+    def setUpClass(cls):
+        TestMinerClass.setUpClass()
+
+    def test_truncated_result(self):
+        with mock.patch.object(AprioriCeri, "mine", autospec=True, side_effect=mine_until_time_is_up):
+            response = self.mine('apriori-ceri', {'max_seconds': 5, 'allow_partial': True})
+
+        data = response['success']['data']
+        self.assertTrue(data['truncated'])
+        self.assertTrue(data['rules'])
+
+    def test_allow_partial_other_algorithms(self):
+        for algorithm in ('apriori', 'fpgrowth'):
+            response = self.mine(algorithm, {'allow_partial': True})
+            self.assertEqual(response['error']['message'], "Budget value 'allow_partial' is only supported by the apriori-ceri algorithm.")
+        response = self.mine('apriori-ceri', {'allow_partial': 'false'})
+        self.assertEqual(response['error']['message'], "Budget value 'allow_partial' should be true or false.")
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,50 @@
+import unittest
+
+from app.preprocessing import compress_transactions, drop_duplicate_items
+from app.apriori_ceri import AprioriCeri
+
+class TestPreprocessing(unittest.TestCase):
+    def test_compress_transactions(self):
+        transactions = [
+            ['Beer', 'Diapers'],
+            ['Diapers', 'Beer'],
+            ['Milk', 'Bread', 'Milk'],
+            ['Bread', 'Milk'],
+            ['Cola'],
+        ]
+
+        unique_transactions, weights = compress_transactions(transactions)
+
+        self.assertEqual(unique_transactions, [frozenset({'Beer', 'Diapers'}), frozenset({'Bread', 'Milk'}), frozenset({'Cola'})])
+        self.assertEqual(weights, [2, 2, 1])
+        self.assertEqual(sum(weights), len(transactions))
+
+    def test_drop_duplicate_items(self):
+        transactions = [['Milk', 'Bread', 'Milk'], ['Beer']]
+
+        self.assertEqual(drop_duplicate_items(transactions), [['Milk', 'Bread'], ['Beer']])
+
+        # Transactions without duplicates are not copied
+        unique_transactions = [['Beer', 'Cola']]
+        self.assertIs(drop_duplicate_items(unique_transactions), unique_transactions)
+
+    def test_weighted_apriori_ceri_matches_unweighted(self):
+        transactions = [
+            ['Milk', 'Bread', 'Butter'],
+            ['Beer', 'Diapers'],
+            ['Bread', 'Butter', 'Milk'],
+            ['Beer', 'Diapers'],
+            ['Butter', 'Bread', 'Milk'],
+            ['Beer', 'Cola'],
+        ]
+
+        unweighted = AprioriCeri([set(transaction) for transaction in transactions], 2, 0.8).mine()
+        unique_transactions, weights = compress_transactions(transactions)
+        weighted = AprioriCeri(unique_transactions, 2, 0.8, weights=weights).mine()
+
+        self.assertEqual(weighted, unweighted)
+        self.assertEqual(weighted[('Bread', 'Butter', 'Milk')], 3)
+        self.assertEqual(weighted[('Beer', 'Diapers')], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from app.result_codec import encode_result, decode_columns, decode_result, hash_rule_key
+
+class TestResultCodec(unittest.TestCase):
+    def test_round_trip(self):
+        itemsets = {'Beer': 4, 'Diapers': 3, 'Beer,Diapers': 3, 'Ölflasche,Bread, sliced': 2}
+        rules = [
+            {'lhs': ['Beer'], 'rhs': ['Diapers'], 'rule': '{Beer} -> {Diapers}', 'confidence': 0.75, 'conviction': 1.6, 'lift': 1.25, 'support': 0.3},
+            {'lhs': ['Ölflasche'], 'rhs': ['Bread, sliced', 'Beer'], 'rule': '{Ölflasche} -> {Bread, sliced, Beer}', 'confidence': 1.0, 'conviction': 1, 'lift': 2.5, 'support': 0.2},
+        ]
+
+        decoded = decode_result(encode_result(itemsets, rules))
+
+        self.assertEqual(decoded['itemsets'], [
+            {'id': 1, 'items': 'Beer', 'count': 4},
+            {'id': 2, 'items': 'Diapers', 'count': 3},
+            {'id': 3, 'items': 'Beer,Diapers', 'count': 3},
+            {'id': 4, 'items': 'Ölflasche,Bread, sliced', 'count': 2},
+        ])
+        self.assertEqual(decoded['rules'][1], {
+            'id': 2, 'confidence': 1.0, 'conviction': 1.0, 'lift': 2.5, 'support': 0.2,
+            'rule': '{Ölflasche} -> {Bread, sliced, Beer}',
+            'lhs': [{'id': 2, 'item': 'Ölflasche'}],
+            'rhs': [{'id': 2, 'item': 'Bread, sliced'}, {'id': 3, 'item': 'Beer'}],
+        })
+
+    def test_rule_keys(self):
+        rules = [{'lhs': ['Milk', 'Bread'], 'rhs': ['Butter'], 'rule': '{Milk, Bread} -> {Butter}', 'confidence': 0.9, 'conviction': 2.0, 'lift': 1.5, 'support': 0.3}]
+
+        # Keys ignore item order but not the side an item is on
+        self.assertEqual(hash_rule_key(['Milk', 'Bread'], ['Butter']), hash_rule_key(['Bread', 'Milk'], ['Butter']))
+        self.assertNotEqual(hash_rule_key(['Milk'], ['Bread']), hash_rule_key(['Bread'], ['Milk']))
+        self.assertEqual(decode_columns(encode_result({}, rules))[1]["rule_keys"].tolist(), [hash_rule_key(['Bread', 'Milk'], ['Butter'])])
+
+    def test_empty_result(self):
+        self.assertEqual(decode_result(encode_result({}, [])), {'itemsets': [], 'rules': []})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+from app.result_diff import diff_results
+from tests.db_test_case import DatabaseTestCase
+
+def make_rule(lhs, rhs, lift, confidence=0.8):
+    return {'lhs': lhs, 'rhs': rhs, 'rule': f"{{{', '.join(lhs)}}} -> {{{', '.join(rhs)}}}", 'confidence': confidence, 'conviction': 1.5, 'lift': lift, 'support': 0.2}
+
+RULES_A = [
+    make_rule(['Beer'], ['Diapers'], 1.5),
+    make_rule(['Bread', 'Milk'], ['Butter'], 2.0),
+    make_rule(['Cola'], ['Beer'], 1.1),
+]
+RULES_B = [
+    make_rule(['Milk', 'Bread'], ['Butter'], 2.6), # same rule, items in another order
+    make_rule(['Beer'], ['Diapers'], 1.6, confidence=0.85),
+    make_rule(['Wine'], ['Cheese'], 3.0),
+]
+
+class TestResultDiff(DatabaseTestCase):
+    def add_rules(self, rules, storage, keys=True):
+        return self.add_result({}, rules, storage=storage, rule_keys=keys)
+
+    def test_diff_results(self):
+        # Rows without stored keys are keyed from their items, so every storage gives the same diff
+        for storage_a, storage_b, keys in (('rows', 'rows', True), ('rows', 'blob', False), ('blob', 'blob', True)):
+            diff = diff_results(self.add_rules(RULES_A, storage_a, keys), self.add_rules(RULES_B, storage_b))
+
+            self.assertEqual(diff['summary'], {'added': 1, 'removed': 1, 'changed': 2, 'unchanged': 0})
+            self.assertEqual(diff['added'], [{'rule': '{Wine} -> {Cheese}', 'lhs': ['Wine'], 'rhs': ['Cheese'], 'confidence': 0.8, 'conviction': 1.5, 'lift': 3.0, 'support': 0.2}])
+            self.assertEqual([rule['rule'] for rule in diff['removed']], ['{Cola} -> {Beer}'])
+            self.assertEqual([rule['lhs'] for rule in diff['changed']], [['Milk', 'Bread'], ['Beer']])
+            self.assertEqual(diff['changed'][0]['before']['lift'], 2.0)
+            self.assertEqual(diff['changed'][0]['after']['lift'], 2.6)
+            self.assertAlmostEqual(diff['changed'][0]['change']['lift'], 0.6)
+
+        # Only rules whose lift changed by at least 0.5 are reported as changed
+        diff = diff_results(self.add_rules(RULES_A, 'rows'), self.add_rules(RULES_B, 'blob'), thresholds={'lift': 0.5})
+        self.assertEqual(diff['summary'], {'added': 1, 'removed': 1, 'changed': 1, 'unchanged': 1})
+        self.assertEqual(diff['changed'][0]['rule'], '{Milk, Bread} -> {Butter}')
+
+    def test_diff_view(self):
+        client = self.app.test_client()
+        result_a, result_b = self.add_rules(RULES_A, 'rows'), self.add_rules(RULES_B, 'rows')
+
+        response = client.get(f'/arm/api/results/{result_a.uuid}/diff/{result_b.uuid}?min_confidence_change=0.01')
+        data = response.get_json()['success']['data']
+        self.assertEqual((data['a'], data['b']), (result_a.uuid, result_b.uuid))
+        self.assertEqual(data['summary'], {'added': 1, 'removed': 1, 'changed': 1, 'unchanged': 1})
+        self.assertEqual(data['changed'][0]['rule'], '{Beer} -> {Diapers}')
+
+        response = client.get(f'/arm/api/results/{result_a.uuid}/diff/{result_b.uuid}?min_lift_change=-1')
+        self.assertEqual(response.get_json()['error']['message'], "min_lift_change should be a non-negative number.")
+
+        response = client.get(f'/arm/api/results/{result_a.uuid}/diff/unknown')
+        self.assertEqual(response.get_json()['error']['message'], "Could not find result based on that id.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import csv
+import io
+import unittest
+from unittest import mock
+
+from app.result_export import export_result, get_pyarrow
+from tests.db_test_case import DatabaseTestCase
+
+ITEMSETS = {'Beer': 4, 'Diapers': 3, 'Beer,Diapers': 3}
+RULES = [
+    {'lhs': ['Beer'], 'rhs': ['Diapers'], 'rule': '{Beer} -> {Diapers}', 'confidence': 0.75, 'conviction': 1.6, 'lift': 1.25, 'support': 0.3},
+    {'lhs': ['Diapers', 'Bread, sliced'], 'rhs': ['Beer'], 'rule': '{Diapers, Bread, sliced} -> {Beer}', 'confidence': 1.0, 'conviction': 1.0, 'lift': 2.5, 'support': 0.2},
+]
+
+class TestResultExport(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rows_result = self.add_result(ITEMSETS, RULES, storage='rows')
+        self.blob_result = self.add_result(ITEMSETS, RULES, storage='blob')
+
+    def export_csv(self, result, table, chunk_size=1):
+        return list(csv.reader(io.StringIO("".join(export_result(result, table=table, file_format="csv", chunk_size=chunk_size)))))
+
+    def test_csv_export(self):
+        for result in (self.rows_result, self.blob_result):
+            rules = self.export_csv(result, "rules")
+            self.assertEqual(rules[0], ["id", "rule", "lhs", "rhs", "confidence", "conviction", "lift", "support"])
+            self.assertEqual(rules[2][1:], ['{Diapers, Bread, sliced} -> {Beer}', '["Diapers", "Bread, sliced"]', '["Beer"]', '1.0', '1.0', '2.5', '0.2'])
+
+            itemsets = self.export_csv(result, "itemsets", chunk_size=2)
+            self.assertEqual([row[1:] for row in itemsets], [["items", "count"], ["Beer", "4"], ["Diapers", "3"], ["Beer,Diapers", "3"]])
+
+    @unittest.skipUnless(get_pyarrow(), "pyarrow is not installed")
+    def test_arrow_and_parquet_export(self):
+        pyarrow = get_pyarrow()
+        for result in (self.rows_result, self.blob_result):
+            data = b"".join(export_result(result, table="rules", file_format="arrow", chunk_size=1))
+            table = pyarrow.ipc.open_stream(data).read_all()
+            self.assertEqual(table.column("lhs").to_pylist(), [['Beer'], ['Diapers', 'Bread, sliced']])
+            self.assertEqual(table.column("lift").to_pylist(), [1.25, 2.5])
+
+            data = b"".join(export_result(result, table="itemsets", file_format="parquet", chunk_size=2))
+            parquet = pyarrow.parquet.ParquetFile(pyarrow.BufferReader(data))
+            self.assertEqual(parquet.metadata.num_row_groups, 2)
+            self.assertEqual(parquet.read().column("count").to_pylist(), [4, 3, 3])
+
+    @unittest.skipUnless(get_pyarrow(), "pyarrow is not installed")
+    def test_pyarrow_writer_closed_on_disconnect(self):
+        pyarrow = get_pyarrow()
+        writers, closed = [], []
+        class ParquetWriter(pyarrow.parquet.ParquetWriter):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                writers.append(self) # kept alive so __del__ does not close it instead
+            def close(self):
+                closed.append(True)
+                super().close()
+
+        # Closing the generator after the first chunk is what a client disconnect does
+        with mock.patch.object(pyarrow.parquet, "ParquetWriter", ParquetWriter):
+            output = export_result(self.rows_result, table="rules", file_format="parquet", chunk_size=1)
+            next(output)
+            output.close()
+        self.assertEqual(closed, [True])
+
+    def test_export_view(self):
+        client = self.app.test_client()
+        response = client.get(f'/arm/api/results/{self.rows_result.uuid}/export?table=itemsets')
+        self.assertEqual(response.mimetype, "text/csv")
+        self.assertIn(f'filename="{self.rows_result.uuid}-itemsets.csv"', response.headers["Content-Disposition"])
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 4)
+
+        response = client.get(f'/arm/api/results/{self.rows_result.uuid}/export?format=xlsx')
+        self.assertEqual(response.get_json()['error']['message'], "Format should be one of: csv, arrow, parquet.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from app import create_app, db
+from app.models.db_daos import Result, Itemset, Rule, LHS, RHS, ResultBlob
+from app.result_codec import encode_result
+from app.retention import delete_results, find_expired_results, purge_results
+
+class TestRetention(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(cls.directory.name, 'test.db')}",
+            "RETENTION_INTERVAL_SECONDS": None,
+            "INIT_DB_ON_STARTUP": True,
+        })
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            db.engine.dispose()
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.context = self.app.app_context()
+        self.context.push()
+        for model in (LHS, RHS, Rule, Itemset, ResultBlob, Result):
+            db.session.execute(db.delete(model))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def add_result(self, date_added, storage='rows'):
+        result = Result(count=10, algorithm='apriori', date_added=date_added, storage=storage)
+        if storage == 'blob':
+            result.blob = ResultBlob(data=encode_result({'Beer': 3}, []))
+        else:
+            rule = Rule(confidence=0.9, conviction=2.0, lift=1.5, support=0.3, rule='{Beer} -> {Diapers}', result=result)
+            rule.lhs.append(LHS(item='Beer'))
+            rule.rhs.append(RHS(item='Diapers'))
+            result.itemsets.append(Itemset(items='Beer', count=3))
+        db.session.add(result)
+        db.session.commit()
+        return result.id
+
+    def count(self, model):
+        return db.session.execute(db.select(db.func.count()).select_from(model)).scalar()
+
+    def test_delete_results(self):
+        kept = self.add_result('01/01/2024, 10:00:00')
+        deleted = [self.add_result('02/01/2024, 10:00:00'), self.add_result('03/01/2024, 10:00:00', storage='blob')]
+
+        summary = delete_results(deleted)
+
+        self.assertEqual(summary, {'lhs': 1, 'rhs': 1, 'rule': 1, 'itemset': 1, 'result_blob': 1, 'result': 2})
+        self.assertEqual(db.session.execute(db.select(Result.id)).scalars().all(), [kept])
+        self.assertEqual([self.count(model) for model in (Rule, LHS, RHS, Itemset, ResultBlob)], [1, 1, 1, 1, 0])
+
+    def test_find_expired_results(self):
+        old = self.add_result('15/01/2024, 09:00:00')
+        middle = self.add_result('30/01/2024, 09:00:00')
+        new = self.add_result('31/01/2024, 09:00:00')
+        now = datetime(2024, 2, 1, 9, 0, 0)
+
+        self.assertEqual(find_expired_results(max_age_days=7, now=now), [old])
+        self.assertEqual(find_expired_results(max_results=1, now=now), [middle, old])
+        self.assertEqual(find_expired_results(max_age_days=30, max_results=2, now=now), [old])
+        self.assertEqual(find_expired_results(), [])
+
+        self.assertEqual(purge_results(max_results=1, dry_run=True)['results'], 2)
+        self.assertEqual(purge_results(max_results=1)['results'], 2)
+        self.assertEqual(db.session.execute(db.select(Result.id)).scalars().all(), [new])
+
+if __name__ == '__main__':
+    unittest.main()
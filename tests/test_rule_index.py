@@ -0,0 +1,72 @@
+import unittest
+
+from app.rule_index import RuleIndex, RuleIndexCache
+
+def make_rule(lhs, rhs, confidence, lift):
+    return {'lhs': lhs, 'rhs': rhs, 'confidence': confidence, 'lift': lift, 'support': 0.3, 'conviction': 2.0, 'rule': f"{lhs} -> {rhs}"}
+
+class TestRuleIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.rules = [
+            make_rule(['Bread'], ['Butter'], 0.8, 1.6),
+            make_rule(['Bread', 'Butter'], ['Milk'], 0.9, 1.2),
+            make_rule(['Beer'], ['Diapers'], 0.75, 2.5),
+            make_rule(['Milk'], ['Butter', 'Bread'], 0.7, 1.9),
+        ]
+        cls.index = RuleIndex(cls.rules)
+
+    def test_recommend(self):
+        # Only rules whose whole antecedent is in the basket fire, and basket items are not recommended
+        recommendations = self.index.recommend(['Bread', 'Butter'], sort_by='confidence')
+        self.assertEqual([r['item'] for r in recommendations], ['Milk'])
+
+        # An item recommended by several rules keeps its best score
+        recommendations = self.index.recommend(['Bread', 'Milk'], sort_by='lift')
+        self.assertEqual([(r['item'], r['score']) for r in recommendations], [('Butter', 1.9)])
+
+        recommendations = self.index.recommend(['Beer', 'Milk'], top_n=2)
+        self.assertEqual([r['item'] for r in recommendations], ['Diapers', 'Bread'])
+        self.assertEqual(self.index.recommend(['Cola']), [])
+
+    def test_cache_lru_eviction(self):
+        loads = []
+        def loader(result_id):
+            loads.append(result_id)
+            return None if result_id == 'missing' else RuleIndex(self.rules)
+
+        cache = RuleIndexCache(max_size=2)
+        cache.get('a', loader)
+        cache.get('b', loader)
+        cache.get('a', loader) # hit, 'b' becomes least recently used
+        cache.get('c', loader) # evicts 'b'
+        cache.get('b', loader)
+        self.assertEqual(loads, ['a', 'b', 'c', 'b'])
+        self.assertEqual(list(cache.entries), ['c', 'b'])
+
+        # Missing results are not cached and invalidated results are reloaded
+        self.assertIsNone(cache.get('missing', loader))
+        self.assertNotIn('missing', cache.entries)
+        cache.invalidate('c')
+        cache.get('c', loader)
+        self.assertEqual(loads[-2:], ['missing', 'c'])
+
+    def test_cache_invalidate_during_load(self):
+        cache = RuleIndexCache()
+        def loader(result_id):
+            # The result is deleted, or the cache cleared, while its index is being built
+            index = RuleIndex(self.rules)
+            invalidate(result_id)
+            return index
+
+        for invalidate in (cache.invalidate, lambda result_id: cache.clear()):
+            index = cache.get('a', loader)
+            self.assertIsNotNone(index)
+            self.assertNotIn('a', cache.entries)
+
+        # Loads that do not race an invalidation are cached again
+        index = cache.get('a', lambda result_id: RuleIndex(self.rules))
+        self.assertIs(cache.get('a'), index)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import unittest
+from unittest import mock
+
+from app import db
+from app.timing import StageTimer
+from tests.db_test_case import DatabaseTestCase
+
+TRANSACTIONS = [
+    ['Milk', 'Bread', 'Butter'],
+    ['Beer', 'Diapers'],
+    ['Milk', 'Diapers', 'Beer', 'Cola'],
+    ['Bread', 'Butter', 'Milk'],
+    ['Bread', 'Milk'],
+]
+
+class TestStageTimer(unittest.TestCase):
+    def test_to_dict(self):
+        timer = StageTimer()
+        # perf_counter values of the start and end of each stage, in seconds
+        with mock.patch("app.timing.time.perf_counter", side_effect=[0.0, 0.002, 1.0, 1.0001, 1.0006, 2.001, 3.0, 3.0004]):
+            with timer.stage("parse"):
+                pass
+            with timer.stage("mining"):
+                with timer.stage("mining.rules"):
+                    pass
+            with timer.stage("parse"):
+                pass
+        timer.record("levels", [{"level": 1}])
+
+        # Running a stage twice adds the durations, nested stages are not counted in the total
+        self.assertEqual(timer.to_dict(), {
+            "stages": {"parse": 2.4, "mining.rules": 0.5, "mining": 1001.0},
+            "total_ms": 1003.4,
+            "levels": [{"level": 1}],
+        })
+
+    def test_server_timing_header(self):
+        timer = StageTimer()
+        timer.stages = {"parse": 0.2104, "mining.rules": 12.5}
+        self.assertEqual(timer.server_timing_header(), "parse;dur=0.210, mining-rules;dur=12.500")
+
+class TestMineTimings(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile_dir = os.path.join(self.directory.name, "profiles")
+        self.app.config["PROFILE_DIR"] = self.profile_dir
+        self.client = self.app.test_client()
+
+    def mine(self, **options):
+        body = {'algorithm': 'apriori-ceri', 'transactions': TRANSACTIONS, 'support_threshold': 0.4, 'confidence_threshold': 0.6, **options}
+        response = self.client.post('/arm/api/mine', json=body)
+        # Requests run in the app context of the test, so the session is not removed after each one
+        db.session.remove()
+        return response
+
+    def test_timings_and_server_timing_header(self):
+        response = self.mine(timings=True)
+        timings = response.get_json()['success']['data']['timings']
+
+        for stage in ("parse", "validate", "mining", "db_insert", "to_dict"):
+            self.assertIn(stage, timings["stages"])
+        self.assertEqual(timings["levels"][0]["level"], 1) # per-level counts of apriori-ceri
+
+        # Every recorded stage is in the header, 'jsonify' runs after the timings block is built
+        header = dict(entry.split(";dur=") for entry in response.headers["Server-Timing"].split(", "))
+        self.assertIn("jsonify", header)
+        self.assertTrue(set(name.replace(".", "-") for name in timings["stages"]) <= set(header))
+
+        # Without "timings": true only the header is sent
+        response = self.mine()
+        self.assertNotIn('timings', response.get_json()['success']['data'])
+        self.assertIn("Server-Timing", response.headers)
+
+    def test_profile_written_to_profile_dir(self):
+        self.mine()
+        self.assertFalse(os.path.exists(self.profile_dir))
+
+        self.mine(profile=True)
+        files = os.listdir(self.profile_dir)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].startswith("mine-") and files[0].endswith(".prof"))
+
+if __name__ == '__main__':
+    unittest.main()